@@ -21,24 +21,66 @@ It follows the ADK pattern for deploying agents as web services.
 """
 
 import asyncio
+import itertools
 import json
 import logging
 import os
-from typing import Any, Dict, Optional
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional, Tuple
 
 import uvicorn
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from google.adk.agents.llm_agent import LlmAgent
 from google.adk.runners import InMemoryRunner
-from google.genai import types
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError, field_validator
+from starlette.background import BackgroundTask
 
-from essay_analyzer.agent import root_agent
-
-# Load environment variables
+# Load environment variables before importing essay_analyzer: the root agent
+# and the output budget presets are built from them at import time
 load_dotenv()
 
+from essay_analyzer.agent import (
+    analysis_message,
+    batch_message,
+    build_batch_analyzer,
+    build_coordinator,
+    normalize_dimensions,
+    overall_score_from_ratings,
+    upstream_call_prompts,
+)
+from essay_analyzer.batching import MicroBatcher, split_batch_response, split_usage
+from essay_analyzer.budgets import BudgetPreset, get_preset, presets
+from essay_analyzer.degradation import CircuitOpenError, UnparseableResponseError, get_breaker
+from essay_analyzer.events import collect_analysis, sub_agent_output_keys
+from essay_analyzer.fair_queue import QuotaExceeded, add_metered_usage, get_fair_scheduler, metered_usage
+from essay_analyzer.grammar_rules import default_engine
+from essay_analyzer.jobs import Job, JobQueue, JobWorkerPool, WebhookRejected, check_webhook_url
+from essay_analyzer.lifecycle import ClientDisconnected, InFlightTracker, ServerDraining, install_drain_signal
+from essay_analyzer.live import LiveSession
+from essay_analyzer import analytics, replay, tracing
+from essay_analyzer.metrics import metrics
+from essay_analyzer.models import open_connections
+from essay_analyzer.prompt import DIMENSIONS
+from essay_analyzer.rate_limiter import (
+    BATCH,
+    DEFAULT_OUTPUT_TOKENS,
+    INTERACTIVE,
+    RateLimitTimeout,
+    estimate_tokens,
+    get_scheduler,
+    is_quota_error,
+)
+from essay_analyzer.result_cache import ResultCache
+from essay_analyzer.results_store import ResultsStore, result_record
+from essay_analyzer.serialization import EncodingSettings, encode_body
+from essay_analyzer.uploads import UnsupportedUpload, UploadTooLarge, read_upload
+from essay_analyzer.warmup import WARMUP_ESSAY, WarmUp, prebuild_agents
+from simple_analyzer import analyze_essay_simple, extract_features
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -59,78 +101,466 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Upstream rate limiting: how long an interactive request may queue for
+# capacity, and how often a quota rejection is retried after backing off.
+UPSTREAM_MAX_WAIT_SECONDS = float(os.getenv("UPSTREAM_MAX_WAIT_SECONDS", "60"))
+UPSTREAM_QUOTA_RETRIES = int(os.getenv("UPSTREAM_QUOTA_RETRIES", "2"))
+UPSTREAM_QUOTA_BACKOFF_SECONDS = float(os.getenv("UPSTREAM_QUOTA_BACKOFF_SECONDS", "10"))
+
+# Graceful degradation: upstream runs longer than the timeout count as
+# failures, and with the fallback enabled, requests the circuit breaker turns
+# away (or that fail upstream) are answered by the local heuristic analyzer
+UPSTREAM_TIMEOUT_SECONDS = float(os.getenv("UPSTREAM_TIMEOUT_SECONDS", "45"))
+DEGRADED_FALLBACK_ENABLED = os.getenv("DEGRADED_FALLBACK_ENABLED", "true").lower() == "true"
+
+# Asynchronous job processing
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "essay_jobs.sqlite3")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_VISIBILITY_TIMEOUT_SECONDS = float(os.getenv("JOB_VISIBILITY_TIMEOUT_SECONDS", "600"))
+# Webhook hosts trusted even on private addresses (comma separated); any
+# other webhook must be a public http(s) URL
+WEBHOOK_ALLOWED_HOSTS = [h.strip() for h in os.getenv("WEBHOOK_ALLOWED_HOSTS", "").split(",") if h.strip()]
+
+# Columnar store of finished analyses for /analytics (empty disables it)
+RESULTS_DB_PATH = os.getenv("RESULTS_DB_PATH", "essay_results.sqlite3")
+
+# Startup warm-up before /health reports ready: keep-alive connections to
+# open, whether to run a small synthetic analysis, and the overall deadline
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", "4"))
+WARMUP_SYNTHETIC_ANALYSIS = os.getenv("WARMUP_SYNTHETIC_ANALYSIS", "false").lower() == "true"
+WARMUP_TIMEOUT_SECONDS = float(os.getenv("WARMUP_TIMEOUT_SECONDS", "60"))
+
+# Largest essay accepted, in bytes of upload (characters for JSON requests)
+# and in words; 0 disables a limit
+MAX_ESSAY_BYTES = int(os.getenv("MAX_ESSAY_BYTES", str(2 * 1024 * 1024)))
+MAX_ESSAY_WORDS = int(os.getenv("MAX_ESSAY_WORDS", "50000"))
+
+# Live drafting over /live: quiet seconds before changed paragraphs are sent
+# to the model, the shortest paragraph worth analyzing, the preset used for
+# paragraph runs and the largest draft accepted
+LIVE_DEBOUNCE_SECONDS = float(os.getenv("LIVE_DEBOUNCE_SECONDS", "1.5"))
+LIVE_MIN_PARAGRAPH_WORDS = int(os.getenv("LIVE_MIN_PARAGRAPH_WORDS", "8"))
+LIVE_OUTPUT_BUDGET = os.getenv("LIVE_OUTPUT_BUDGET", "brief")
+LIVE_MAX_CHARS = int(os.getenv("LIVE_MAX_CHARS", "100000"))
+
+# Micro-batching: essays of at most BATCH_MAX_WORDS words that arrive within
+# BATCH_MAX_WAIT_SECONDS of each other (same dimensions and output budget)
+# are analyzed together in one model call, up to BATCH_MAX_SIZE at a time
+BATCH_ENABLED = os.getenv("BATCH_ENABLED", "false").lower() == "true"
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "8"))
+BATCH_MAX_WAIT_SECONDS = float(os.getenv("BATCH_MAX_WAIT_SECONDS", "0.05"))
+BATCH_MAX_WORDS = int(os.getenv("BATCH_MAX_WORDS", "300"))
+
+# Completed analyses kept per replica for resubmitted essays (0 disables)
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+
+# Response bodies of at least RESPONSE_COMPRESS_MIN_BYTES are compressed with
+# brotli or gzip, whichever the client accepts (0 disables compression)
+RESPONSE_ENCODING = EncodingSettings(
+    min_size=int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", "1024")),
+    gzip_level=int(os.getenv("RESPONSE_GZIP_LEVEL", "6")),
+    brotli_quality=int(os.getenv("RESPONSE_BROTLI_QUALITY", "4")),
+)
+
+# Seconds in-flight analyses get to finish on shutdown before being cancelled
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "30"))
+# Seconds /health answers 503 after SIGTERM before the server stops accepting
+# connections; at least the load balancer's health check interval
+DRAIN_NOTICE_SECONDS = float(os.getenv("DRAIN_NOTICE_SECONDS", "5"))
+
 # Request/Response models
 class EssayAnalysisRequest(BaseModel):
     text: str
     user_id: Optional[str] = "anonymous"
+    priority: Literal["interactive", "batch"] = INTERACTIVE
+    # Class or group the essay belongs to, for cohort analytics
+    cohort: Optional[str] = None
+    # Subset of grammar/structure/content/spelling to analyze; None runs all
+    dimensions: Optional[List[str]] = None
+    # Output budget preset (brief/standard/deep); None uses OUTPUT_BUDGET_PRESET
+    output_budget: Optional[str] = None
+
+    @field_validator("dimensions")
+    @classmethod
+    def validate_dimensions(cls, value: Optional[List[str]]) -> Optional[List[str]]:
+        if value is None:
+            return None
+        return list(normalize_dimensions(value))
+
+    @field_validator("output_budget")
+    @classmethod
+    def validate_output_budget(cls, value: Optional[str]) -> Optional[str]:
+        if value is None:
+            return None
+        return get_preset(value).name
 
 class EssayAnalysisResponse(BaseModel):
-    grammarFeedback: str
-    grammarRating: int
-    structureFeedback: str
-    structureRating: int
-    contentFeedback: str
-    contentRating: int
-    spellingFeedback: str
-    spellingRating: int
+    grammarFeedback: Optional[str] = None
+    grammarRating: Optional[int] = None
+    structureFeedback: Optional[str] = None
+    structureRating: Optional[int] = None
+    contentFeedback: Optional[str] = None
+    contentRating: Optional[int] = None
+    spellingFeedback: Optional[str] = None
+    spellingRating: Optional[int] = None
     overallScore: int
+    dimensions: List[str] = list(DIMENSIONS)
+    output_budget: Optional[str] = None
     session_id: Optional[str] = None
+    # True when the result was answered from the replica's result cache
+    cached: bool = False
+    # True when the result comes from the local heuristic analyzer
+    degraded: bool = False
+    degraded_reason: Optional[str] = None
+
+class JobRequest(EssayAnalysisRequest):
+    priority: Literal["interactive", "batch"] = BATCH
+    webhook_url: Optional[str] = None
+
+    @field_validator("webhook_url")
+    @classmethod
+    def validate_webhook_url(cls, value: Optional[str]) -> Optional[str]:
+        if value is None:
+            return None
+        # Scheme and literal addresses only; host names are resolved in
+        # create_job, off the event loop
+        return check_webhook_url(value, WEBHOOK_ALLOWED_HOSTS, resolve=False)
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str
+    attempts: int
+    created_at: float
+    updated_at: float
+    result: Optional[EssayAnalysisResponse] = None
+    error: Optional[str] = None
 
 class HealthResponse(BaseModel):
     status: str
     service: str
     version: str
+    upstream: Optional[Dict[str, Any]] = None
+    warmup: Optional[Dict[str, Any]] = None
 
-# Global runner instance
+# Global runner instance and the output budget it was built with
 runner: Optional[InMemoryRunner] = None
+runner_preset: Optional[BudgetPreset] = None
+
+# Runners for other dimension sets and output budgets, built on first use
+partial_runners: Dict[Tuple[Tuple[str, ...], str], InMemoryRunner] = {}
+
+def get_runner(dimensions: Tuple[str, ...], preset: Optional[BudgetPreset] = None) -> InMemoryRunner:
+    """Return the runner whose agent graph contains only the given dimensions."""
+    preset = preset or get_preset()
+    if dimensions == DIMENSIONS and preset == runner_preset:
+        return runner
+    key = (dimensions, preset.name)
+    if key not in partial_runners:
+        partial_runners[key] = InMemoryRunner(
+            agent=build_coordinator(dimensions, preset),
+            app_name="essay_analyzer_api"
+        )
+        logger.info(
+            f"Built agent graph for dimensions: {', '.join(dimensions)} "
+            f"({preset.name} output budget)"
+        )
+    return partial_runners[key]
+
+# Replica-local analysis results; the router sends repeats of an essay here
+result_cache = ResultCache(RESULT_CACHE_SIZE)
+
+# In-flight analyses, cancelled on client disconnect and drained on shutdown
+in_flight = InFlightTracker()
+
+# Asynchronous job queue and the workers draining it
+job_queue: Optional[JobQueue] = None
+job_workers: Optional[JobWorkerPool] = None
+
+async def initialize_jobs():
+    """Open the persistent job queue and start the in-process workers."""
+    global job_queue, job_workers
+    job_queue = JobQueue(
+        db_path=JOBS_DB_PATH,
+        visibility_timeout=JOB_VISIBILITY_TIMEOUT_SECONDS,
+        max_attempts=JOB_MAX_ATTEMPTS,
+    )
+    job_workers = JobWorkerPool(
+        job_queue,
+        process_job,
+        concurrency=JOB_WORKERS,
+        webhook_allowed_hosts=WEBHOOK_ALLOWED_HOSTS,
+    )
+    job_workers.start()
+    logger.info(f"Job queue ready at {JOBS_DB_PATH}: {job_queue.counts()}")
+
+# Stored results for cohort analytics
+results_store: Optional[ResultsStore] = None
+
+def initialize_results_store():
+    """Open the results store and load stored results into memory."""
+    global results_store
+    if not RESULTS_DB_PATH:
+        return
+    results_store = ResultsStore(RESULTS_DB_PATH)
+    logger.info(f"Results store ready at {RESULTS_DB_PATH}: {len(results_store)} results")
+
+async def record_result(request: EssayAnalysisRequest, response: EssayAnalysisResponse) -> None:
+    """
+    Append a finished analysis and the essay's text features to the results store.
+    
+    Feature extraction takes about a second on the largest essays, so it and
+    the insert run in a worker thread.
+    """
+    if results_store is None or response.cached:
+        # A cached answer was recorded when it was first analyzed
+        return
+    
+    def record() -> None:
+        results_store.add(result_record(
+            response.model_dump(), extract_features(request.text), request.user_id, request.cohort
+        ))
+    
+    try:
+        await asyncio.to_thread(record)
+    except Exception as e:
+        # Analytics must never fail the analysis itself
+        logger.warning(f"Failed to record analysis result: {e}")
 
 async def initialize_runner():
     """Initialize the ADK runner with the essay analyzer agent."""
-    global runner
+    global runner, runner_preset
     try:
+        runner_preset = get_preset()
         runner = InMemoryRunner(
-            agent=root_agent,
+            agent=build_coordinator(DIMENSIONS, runner_preset),
             app_name="essay_analyzer_api"
         )
-        logger.info("ADK runner initialized successfully")
+        logger.info(f"ADK runner initialized successfully ({runner_preset.name} output budget)")
     except Exception as e:
         logger.error(f"Failed to initialize ADK runner: {e}")
         raise
 
+# Startup warm-up; /health is not ready until it completes
+warmup = WarmUp()
+warmup_task: Optional[asyncio.Task] = None
+
+def prebuild_runners() -> None:
+    """Build the runner for every dimension combination with the default preset."""
+    prebuild_agents(presets().values())
+    preset = get_preset()
+    for size in range(1, len(DIMENSIONS) + 1):
+        for combo in itertools.combinations(DIMENSIONS, size):
+            get_runner(combo, preset)
+
+async def synthetic_analysis() -> None:
+    """Run one small analysis through every agent (uses a little quota)."""
+    await asyncio.wait_for(
+        run_analysis(WARMUP_ESSAY, "warmup", DIMENSIONS, get_preset("brief")),
+        timeout=UPSTREAM_TIMEOUT_SECONDS,
+    )
+
+def start_warmup() -> None:
+    """Queue the warm-up steps and run them in the background."""
+    global warmup_task
+    if not WARMUP_ENABLED:
+        warmup.skip()
+        return
+    warmup.add("agent_graphs", prebuild_runners)
+    warmup.add("grammar_rules", default_engine)
+    warmup.add("local_analyzer", lambda: analyze_essay_simple(WARMUP_ESSAY))
+    # Replayed fixtures never reach the backend
+    if not replay.is_replaying():
+        warmup.add("connections", lambda: open_connections(WARMUP_CONNECTIONS))
+        if WARMUP_SYNTHETIC_ANALYSIS:
+            warmup.add("synthetic_analysis", synthetic_analysis)
+    warmup_task = asyncio.ensure_future(warmup.run(WARMUP_TIMEOUT_SECONDS))
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize the application on startup."""
     logger.info("Starting ADK Essay Analyzer API...")
+    replay.install_from_env()
+    tracing.configure_from_env()
     await initialize_runner()
+    initialize_results_store()
+    await initialize_jobs()
+    start_warmup()
+    # Report draining on /health before uvicorn stops accepting connections
+    if not install_drain_signal(in_flight, DRAIN_NOTICE_SECONDS):
+        logger.warning("No SIGTERM handler to chain; /health will not report draining")
     logger.info("ADK Essay Analyzer API started successfully")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Clean up resources on shutdown."""
     logger.info("Shutting down ADK Essay Analyzer API...")
-    # Add any cleanup logic here
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
+    # Let in-flight analyses and jobs finish within the deadline; jobs still
+    # running after it are released back to the queue for the next start
+    drains = [in_flight.drain(SHUTDOWN_DRAIN_SECONDS)]
+    if job_workers:
+        drains.append(job_workers.stop(SHUTDOWN_DRAIN_SECONDS))
+    await asyncio.gather(*drains)
+    await batcher.close()
     logger.info("ADK Essay Analyzer API shut down successfully")
 
 @app.get("/health", response_model=HealthResponse)
-async def health_check():
+async def health_check(response: Response):
     """Health check endpoint."""
+    if in_flight.draining:
+        # Take the instance out of rotation while it drains
+        response.status_code = 503
+        return HealthResponse(
+            status="draining",
+            service="adk-essay-analyzer",
+            version="1.0.0"
+        )
+    if not warmup.ready:
+        # Keep traffic away until connections and agent graphs are warm
+        response.status_code = 503
+        return HealthResponse(
+            status="warming_up",
+            service="adk-essay-analyzer",
+            version="1.0.0",
+            warmup=warmup.snapshot(),
+        )
+    # Still serving (possibly degraded) while the upstream circuit is open
+    upstream = get_breaker().snapshot()
     return HealthResponse(
-        status="healthy",
+        status="healthy" if upstream["state"] == "closed" else "degraded",
         service="adk-essay-analyzer",
-        version="1.0.0"
+        version="1.0.0",
+        upstream=upstream,
+        warmup=warmup.snapshot(),
     )
 
 @app.post("/analyze", response_model=EssayAnalysisResponse)
-async def analyze_essay(request: EssayAnalysisRequest):
+async def analyze_essay(request: EssayAnalysisRequest, http_request: Request):
     """
     Analyze an essay using the ADK essay analysis agents.
     
+    The run is cancelled, including any sub-agent calls in flight, if the
+    client disconnects before it finishes.
+    
     Args:
         request: EssayAnalysisRequest containing the essay text and optional user_id
+        http_request: The underlying HTTP request, polled for disconnects
         
     Returns:
         EssayAnalysisResponse with detailed analysis feedback
     """
+    check_essay_size(request.text)
+    return await serve_analysis(request, http_request, "POST /analyze")
+
+@app.post("/analyze/upload", response_model=EssayAnalysisResponse)
+async def analyze_upload(
+    http_request: Request,
+    user_id: str = "anonymous",
+    priority: Literal["interactive", "batch"] = INTERACTIVE,
+    cohort: Optional[str] = None,
+    dimensions: Optional[str] = None,
+    output_budget: Optional[str] = None,
+):
+    """
+    Analyze an essay uploaded as a plain-text body or a multipart file.
+    
+    The body is streamed: it is decoded and whitespace-normalized chunk by
+    chunk, and rejected with 413 as soon as it crosses MAX_ESSAY_BYTES or
+    MAX_ESSAY_WORDS, without buffering the rest. Options that /analyze takes
+    in its JSON body are query parameters here.
+    
+    Args:
+        http_request: The upload request
+        user_id, priority, cohort, output_budget: As in EssayAnalysisRequest
+        dimensions: Comma-separated dimensions to analyze (default: all)
+        
+    Returns:
+        EssayAnalysisResponse with detailed analysis feedback
+    """
+    declared = http_request.headers.get("content-length", "")
+    if MAX_ESSAY_BYTES and declared.isdigit() and int(declared) > MAX_ESSAY_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds the {MAX_ESSAY_BYTES} bytes limit")
+    try:
+        with tracing.span("upload.read") as upload_span:
+            upload = await read_upload(
+                http_request.stream(),
+                http_request.headers.get("content-type", ""),
+                MAX_ESSAY_BYTES,
+                MAX_ESSAY_WORDS,
+            )
+            if upload_span:
+                upload_span.set_attribute("upload.bytes", upload.bytes_read)
+                upload_span.set_attribute("upload.words", upload.words)
+    except UploadTooLarge as e:
+        metrics.increment("uploads_rejected", reason=e.limit)
+        raise HTTPException(status_code=413, detail=str(e))
+    except UnsupportedUpload as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        request = EssayAnalysisRequest(
+            text=upload.text,
+            user_id=user_id,
+            priority=priority,
+            cohort=cohort,
+            dimensions=dimensions.split(",") if dimensions else None,
+            output_budget=output_budget,
+        )
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    return await serve_analysis(request, http_request, "POST /analyze/upload")
+
+def encoded_response(
+    content: Any,
+    http_request: Request,
+    status_code: int = 200,
+    background: Optional[BackgroundTask] = None,
+) -> Response:
+    """
+    Serialize a response body once, as the client negotiated.
+    
+    Returning the Response directly skips FastAPI's re-validation and
+    generic encoding of the response model. The body is JSON, or
+    MessagePack for clients that ask for application/msgpack, compressed
+    above RESPONSE_COMPRESS_MIN_BYTES.
+    """
+    encoded = encode_body(
+        content,
+        http_request.headers.get("accept"),
+        http_request.headers.get("accept-encoding"),
+        RESPONSE_ENCODING,
+    )
+    return Response(
+        content=encoded.body,
+        status_code=status_code,
+        media_type=encoded.media_type,
+        headers=encoded.headers,
+        background=background,
+    )
+
+def check_essay_size(text: str) -> None:
+    """Reject an essay over MAX_ESSAY_BYTES characters or MAX_ESSAY_WORDS words with 413."""
+    if MAX_ESSAY_BYTES and len(text) > MAX_ESSAY_BYTES:
+        raise HTTPException(status_code=413, detail=f"Essay exceeds the {MAX_ESSAY_BYTES} characters limit")
+    if MAX_ESSAY_WORDS and len(text.split()) > MAX_ESSAY_WORDS:
+        raise HTTPException(status_code=413, detail=f"Essay exceeds the {MAX_ESSAY_WORDS} words limit")
+
+async def serve_analysis(
+    request: EssayAnalysisRequest,
+    http_request: Request,
+    span_name: str,
+) -> EssayAnalysisResponse:
+    """
+    Run an analysis for an HTTP request and map failures to HTTP errors.
+    
+    The run is cancelled, including any sub-agent calls in flight, if the
+    client disconnects before it finishes.
+    """
     if not runner:
         raise HTTPException(status_code=503, detail="ADK runner not initialized")
     
@@ -138,50 +568,651 @@ async def analyze_essay(request: EssayAnalysisRequest):
         raise HTTPException(status_code=400, detail="Essay text cannot be empty")
     
     try:
-        # Create a session for this analysis
-        session = await runner.session_service.create_session(
-            app_name="essay_analyzer_api",
-            user_id=request.user_id
+        with tracing.span(span_name, **{"user.id": request.user_id}):
+            response = await in_flight.run(
+                perform_analysis(request),
+                is_disconnected=http_request.is_disconnected,
+            )
+        # Recorded once the response is sent, off the event loop
+        return encoded_response(
+            response, http_request, background=BackgroundTask(record_result, request, response)
+        )
+    except ClientDisconnected:
+        # Nobody is listening; nginx-style "client closed request"
+        return Response(status_code=499)
+    except (ServerDraining, CircuitOpenError) as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except QuotaExceeded as e:
+        raise quota_exceeded_error(e)
+    except UnparseableResponseError as e:
+        logger.error(str(e))
+        raise HTTPException(status_code=502, detail="Upstream returned an unusable analysis")
+    except RateLimitTimeout as e:
+        logger.warning(f"Rate limit wait exceeded for user {request.user_id}: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="Analysis capacity is temporarily exhausted, please retry shortly",
+            headers={"Retry-After": str(int(e.retry_after) + 1)},
+        )
+    except Exception as e:
+        if is_quota_error(e):
+            logger.warning(f"Upstream quota exhausted after retries: {e}")
+            raise HTTPException(
+                status_code=429,
+                detail="Upstream model quota exhausted, please retry shortly",
+                headers={"Retry-After": str(int(UPSTREAM_QUOTA_BACKOFF_SECONDS))},
+            )
+        logger.error(f"Error during essay analysis: {e}")
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+
+def quota_exceeded_error(e: QuotaExceeded) -> HTTPException:
+    """429 response telling the client whose quota ran out and when it resets."""
+    logger.warning(str(e))
+    return HTTPException(
+        status_code=429,
+        detail={
+            "error": "daily_token_quota_exceeded",
+            "message": str(e),
+            "tenant": e.tenant,
+            "used_tokens": e.used,
+            "requested_tokens": e.requested,
+            "daily_token_quota": e.limit,
+            "resets_at": e.resets_at,
+        },
+        headers={"Retry-After": str(int(e.retry_after) + 1)},
+    )
+
+@app.websocket("/live")
+async def live_feedback(
+    websocket: WebSocket,
+    user_id: str = "anonymous",
+    dimensions: Optional[str] = None,
+    output_budget: Optional[str] = None,
+):
+    """
+    Live feedback while drafting.
+    
+    The client sends {"type": "update", "text": ..., "revision": n} with the
+    full draft after each batch of keystrokes. Every update is answered with a
+    "local" message of heuristic metrics. Once the draft has been quiet for
+    LIVE_DEBOUNCE_SECONDS, paragraphs not analyzed before are run through the
+    agents (superseded runs are cancelled), and "analysis" messages carry the
+    per-paragraph results and their combined ratings.
+    
+    Args:
+        websocket: The client connection
+        user_id: User the paragraph runs are queued and billed for
+        dimensions: Comma-separated dimensions to analyze (default: all)
+        output_budget: Preset for paragraph runs (default: LIVE_OUTPUT_BUDGET)
+    """
+    try:
+        template = EssayAnalysisRequest(
+            text="",
+            user_id=user_id,
+            dimensions=dimensions.split(",") if dimensions else None,
+            output_budget=output_budget or LIVE_OUTPUT_BUDGET,
         )
+    except ValidationError as e:
+        await websocket.close(code=1008, reason=str(e.errors()[0]["msg"])[:120])
+        return
+    if not runner or in_flight.draining:
+        await websocket.close(code=1013, reason="Analyzer not available")
+        return
+    await websocket.accept()
+    
+    selected = normalize_dimensions(template.dimensions)
+    send_lock = asyncio.Lock()
+    
+    async def send(message: Dict[str, Any]) -> None:
+        async with send_lock:
+            try:
+                await websocket.send_json(message)
+            except (WebSocketDisconnect, RuntimeError):
+                # Closed while a paragraph run was finishing
+                pass
+    
+    async def analyze_paragraph(paragraph: str) -> Dict[str, Any]:
+        request = template.model_copy(update={"text": paragraph})
+        response = await in_flight.run(perform_analysis(request))
+        return response.model_dump(exclude_none=True)
+    
+    def local_metrics(text: str) -> Dict[str, Any]:
+        local = analyze_essay_simple(text)
+        result = {"features": local["features"]}
+        for dimension in selected:
+            result[f"{dimension}Feedback"] = local[f"{dimension}Feedback"]
+            result[f"{dimension}Rating"] = local[f"{dimension}Rating"]
+        result["overallScore"] = overall_score_from_ratings(result, selected)
+        return result
+    
+    session = LiveSession(
+        analyze_paragraph,
+        send,
+        local_metrics,
+        selected,
+        debounce=LIVE_DEBOUNCE_SECONDS,
+        min_paragraph_words=LIVE_MIN_PARAGRAPH_WORDS,
+    )
+    metrics.increment("live_sessions")
+    logger.info(f"Live session opened for user {user_id}")
+    try:
+        while True:
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+            if frame.get("text") is None:
+                await send({"type": "error", "detail": "Messages must be JSON text frames"})
+                continue
+            try:
+                message = json.loads(frame["text"])
+            except ValueError:
+                await send({"type": "error", "detail": "Messages must be JSON"})
+                continue
+            if not isinstance(message, dict) or message.get("type") != "update":
+                await send({"type": "error", "detail": "Expected an update message"})
+                continue
+            text = message.get("text")
+            if not isinstance(text, str):
+                await send({"type": "error", "detail": "Update text must be a string"})
+                continue
+            if len(text) > LIVE_MAX_CHARS:
+                await send({"type": "error", "detail": f"Draft exceeds {LIVE_MAX_CHARS} characters"})
+                continue
+            revision = message.get("revision")
+            await session.update(text, revision if isinstance(revision, int) else None)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await session.close()
+        logger.info(f"Live session closed for user {user_id} at revision {session.revision}")
+
+@app.post("/jobs", response_model=JobStatusResponse, status_code=202)
+async def create_job(request: JobRequest, http_request: Request):
+    """
+    Queue an essay analysis and return its job id immediately.
+    
+    Args:
+        request: JobRequest with the essay and an optional completion webhook
+        http_request: The HTTP request, for response content negotiation
+        
+    Returns:
+        JobStatusResponse for the newly queued job
+    """
+    if not job_queue:
+        raise HTTPException(status_code=503, detail="Job queue not initialized")
+    
+    if not request.text.strip():
+        raise HTTPException(status_code=400, detail="Essay text cannot be empty")
+    check_essay_size(request.text)
+    if request.webhook_url:
+        try:
+            await asyncio.to_thread(check_webhook_url, request.webhook_url, WEBHOOK_ALLOWED_HOSTS)
+        except WebhookRejected as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    
+    # Refuse work the user's quota cannot cover instead of failing it later
+    prompts = upstream_call_prompts(
+        build_coordinator(normalize_dimensions(request.dimensions), get_preset(request.output_budget))
+    )
+    try:
+        await get_fair_scheduler().check_quota(request.user_id, estimate_tokens(request.text, prompts))
+    except QuotaExceeded as e:
+        raise quota_exceeded_error(e)
+    
+    payload = request.model_dump(exclude={"webhook_url"})
+    job = await asyncio.to_thread(job_queue.enqueue, payload, webhook_url=request.webhook_url)
+    logger.info(f"Queued job {job.id} for user {request.user_id}")
+    return encoded_response(job_status_response(job), http_request, status_code=202)
+
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str, http_request: Request):
+    """Return the status of a queued analysis and its result once finished."""
+    if not job_queue:
+        raise HTTPException(status_code=503, detail="Job queue not initialized")
+    
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return encoded_response(job_status_response(job), http_request)
+
+def job_status_response(job: Job) -> JobStatusResponse:
+    """Convert a queued Job into its API representation."""
+    return JobStatusResponse(
+        job_id=job.id,
+        status=job.status,
+        attempts=job.attempts,
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+        result=EssayAnalysisResponse(**job.result) if job.result else None,
+        error=job.error,
+    )
+
+async def process_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Job worker handler: run one queued analysis and return its result."""
+    # Jobs are not latency sensitive: while upstream is unavailable they fail
+    # and are retried with backoff instead of settling for a degraded result
+    request = EssayAnalysisRequest(**payload)
+    with tracing.span("job", **{"user.id": request.user_id}):
+        response = await perform_analysis(request, allow_degraded=False)
+    await record_result(request, response)
+    return response.model_dump()
+
+async def perform_analysis(
+    request: EssayAnalysisRequest,
+    allow_degraded: bool = True,
+) -> EssayAnalysisResponse:
+    """
+    Run a rate-limited analysis, retrying upstream quota rejections.
+    
+    Upstream outcomes feed the circuit breaker; an answer that cannot be
+    parsed counts as a failure. With DEGRADED_FALLBACK_ENABLED, requests
+    arriving while it is open, and runs that fail, time out or return an
+    unparseable answer, are answered by the local analyzer and marked
+    degraded.
+    
+    Args:
+        request: The validated analysis request
+        allow_degraded: Whether a local result may stand in for upstream
         
-        logger.info(f"Created session {session.id} for user {request.user_id}")
+    Returns:
+        EssayAnalysisResponse with the parsed analysis
+    
+    Raises:
+        CircuitOpenError: If the breaker is open and degrading is not allowed
+        UnparseableResponseError: If the answer cannot be parsed and
+            degrading is not allowed
+    """
+    dimensions = normalize_dimensions(request.dimensions)
+    preset = get_preset(request.output_budget)
+    scheduler = get_scheduler()
+    # A batched essay shares one model call with the user's other short
+    # essays; the batch takes upstream capacity once for all of them
+    batched = is_batchable(request.text)
+    prompts = upstream_call_prompts(
+        batch_analyzer(dimensions, preset) if batched else build_coordinator(dimensions, preset)
+    )
+    estimated_tokens = estimate_tokens(request.text, prompts)
+    max_wait = UPSTREAM_MAX_WAIT_SECONDS if request.priority == INTERACTIVE else None
+    degrade = DEGRADED_FALLBACK_ENABLED and allow_degraded
+    # Replayed fixtures never reach upstream, so they skip the rate limiter
+    # and neither consult nor train the breaker
+    breaker = None if replay.is_replaying() else get_breaker()
+    
+    with tracing.span(
+        "analysis",
+        **{
+            "essay.chars": len(request.text),
+            "essay.words": len(request.text.split()),
+            "analysis.dimensions": list(dimensions),
+            "analysis.priority": request.priority,
+            "analysis.output_budget": preset.name,
+            "llm.estimated_tokens": estimated_tokens,
+            "llm.expected_calls": len(prompts),
+        },
+    ) as analysis_span:
+        # Over-quota users get an error, not even a degraded or cached result
+        fair_scheduler = get_fair_scheduler()
+        await fair_scheduler.check_quota(request.user_id, estimated_tokens)
         
-        # Prepare the content for analysis
-        content = types.Content(
-            role='user',
-            parts=[types.Part.from_text(text=f"Please analyze this essay:\n\n{request.text}")]
-        )
+        # A resubmitted essay costs nothing upstream. The cache is shared by
+        # all users, so the hit does not carry the original session.
+        cache_key = result_cache.key(request.text, dimensions, preset.name)
+        cached = result_cache.get(cache_key)
+        if analysis_span:
+            analysis_span.set_attribute("analysis.cache_hit", cached is not None)
+        if cached is not None:
+            return EssayAnalysisResponse(**cached, cached=True)
         
-        # Run the analysis
-        response_text = ""
-        async for event in runner.run_async(
-            user_id=request.user_id,
-            session_id=session.id,
-            new_message=content,
-        ):
-            if event.content.parts and event.content.parts[0].text:
-                response_text += event.content.parts[0].text
+        if breaker is not None and not breaker.allow_request():
+            if not degrade:
+                raise CircuitOpenError(f"Upstream circuit is {breaker.state}")
+            return await degraded_response(request.text, dimensions, "circuit_open")
         
-        # Parse the response
-        analysis_result = parse_analysis_response(response_text)
-        analysis_result["session_id"] = session.id
+        ticket = None
+        reported = False
+        # Model-reported tokens, to correct the estimate charged to the quota
+        usage_meter = None
+        try:
+            # Take a runner slot in weighted fair order across users
+            with tracing.span("fair_queue.wait") as queue_span:
+                ticket = await fair_scheduler.acquire(request.user_id, estimated_tokens, max_wait=max_wait)
+                if queue_span:
+                    queue_span.set_attribute("fair_queue.tenant", ticket.tenant)
+                    queue_span.set_attribute("fair_queue.waited_seconds", ticket.waited)
+            with metered_usage() as usage_meter:
+                for attempt in range(UPSTREAM_QUOTA_RETRIES + 1):
+                    # Wait for upstream capacity instead of bursting into quota errors
+                    if breaker is not None and not batched:
+                        with tracing.span("rate_limit.wait") as wait_span:
+                            waited = await scheduler.acquire(
+                                estimated_tokens,
+                                requests=len(prompts),
+                                lane=request.priority,
+                                max_wait=max_wait,
+                            )
+                            if wait_span:
+                                wait_span.set_attribute("rate_limit.waited_seconds", waited)
+                    started = time.perf_counter()
+                    try:
+                        response_text, session_id = await asyncio.wait_for(
+                            analyze_upstream(request.text, request.user_id, dimensions, preset, request.priority),
+                            timeout=UPSTREAM_TIMEOUT_SECONDS,
+                        )
+                        break
+                    except Exception as e:
+                        if not is_quota_error(e) or attempt == UPSTREAM_QUOTA_RETRIES:
+                            if breaker is not None:
+                                reason = "timeout" if isinstance(e, asyncio.TimeoutError) else type(e).__name__
+                                breaker.record_failure(time.perf_counter() - started, reason)
+                                reported = True
+                            raise
+                        await scheduler.penalize_async(UPSTREAM_QUOTA_BACKOFF_SECONDS * (attempt + 1))
+            latency = time.perf_counter() - started
+            
+            # Parse the response; an unusable answer is an upstream failure
+            try:
+                with tracing.span("parse_response", **{"response.chars": len(response_text)}):
+                    analysis_result = parse_analysis_response(response_text, dimensions)
+            except UnparseableResponseError:
+                if breaker is not None:
+                    breaker.record_failure(latency, "unparseable_response")
+                    reported = True
+                raise
+            if breaker is not None:
+                breaker.record_success(latency)
+                reported = True
+        except (RateLimitTimeout, asyncio.TimeoutError) as e:
+            if not degrade:
+                raise
+            reason = "rate_limited" if isinstance(e, RateLimitTimeout) else "upstream_timeout"
+            return await degraded_response(request.text, dimensions, reason)
+        except UnparseableResponseError as e:
+            if not degrade:
+                raise
+            logger.warning(f"Unparseable upstream analysis, serving local result: {e}")
+            return await degraded_response(request.text, dimensions, "unparseable_response")
+        except Exception as e:
+            if not degrade or isinstance(e, (replay.FixtureMissingError, QuotaExceeded)):
+                raise
+            logger.warning(f"Upstream analysis failed, serving local result: {e}")
+            return await degraded_response(
+                request.text, dimensions, "upstream_quota" if is_quota_error(e) else "upstream_error"
+            )
+        finally:
+            if ticket is not None:
+                # Batched essays are credited their share of the batch's usage
+                metered = usage_meter.tokens if usage_meter and usage_meter.calls else None
+                fair_scheduler.release(ticket, metered)
+            if breaker is not None and not reported:
+                breaker.release()
         
-        logger.info(f"Analysis completed for session {session.id}")
-        return EssayAnalysisResponse(**analysis_result)
+        if analysis_span:
+            analysis_span.set_attribute("analysis.retry_count", attempt)
+            analysis_span.set_attribute("session.id", session_id)
         
-    except Exception as e:
-        logger.error(f"Error during essay analysis: {e}")
-        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+        analysis_result["output_budget"] = preset.name
+        result_cache.put(cache_key, analysis_result)
+        analysis_result["session_id"] = session_id
+    
+    logger.info(f"Analysis completed for session {session_id}")
+    return EssayAnalysisResponse(**analysis_result)
 
-def parse_analysis_response(response_text: str) -> Dict[str, Any]:
+async def degraded_response(
+    essay_text: str,
+    dimensions: Tuple[str, ...],
+    reason: str,
+) -> EssayAnalysisResponse:
+    """Answer from the local analyzer, marked degraded, and count it."""
+    metrics.increment("analyses_degraded", reason=reason)
+    tracing.set_attribute("analysis.degraded_reason", reason)
+    logger.info(f"Serving degraded local analysis ({reason})")
+    return EssayAnalysisResponse(**await local_analysis(essay_text, dimensions, reason))
+
+async def local_analysis(
+    essay_text: str,
+    dimensions: Tuple[str, ...],
+    reason: str,
+) -> Dict[str, Any]:
+    """
+    Heuristic analysis of the requested dimensions, computed in-process.
+    
+    It takes over a second on the largest essays and runs exactly when many
+    requests degrade at once, so it runs in a worker thread.
+    
+    Args:
+        essay_text: The essay to analyze
+        dimensions: Dimensions to report
+        reason: Why the upstream analysis is not used
+        
+    Returns:
+        Dictionary in the same format as parse_analysis_response, marked degraded
+    """
+    with tracing.span("local_analysis", **{"analysis.degraded_reason": reason}):
+        local = await asyncio.to_thread(analyze_essay_simple, essay_text)
+    result = {}
+    for dimension in dimensions:
+        result[f"{dimension}Feedback"] = local[f"{dimension}Feedback"]
+        result[f"{dimension}Rating"] = local[f"{dimension}Rating"]
+    result["overallScore"] = overall_score_from_ratings(result, dimensions)
+    result["dimensions"] = list(dimensions)
+    result["degraded"] = True
+    result["degraded_reason"] = reason
+    return result
+
+def is_batchable(essay_text: str) -> bool:
+    """Whether an essay is short enough to be micro-batched."""
+    return BATCH_ENABLED and len(essay_text.split()) <= BATCH_MAX_WORDS
+
+def batch_analyzer(dimensions: Tuple[str, ...], preset: BudgetPreset) -> LlmAgent:
+    """The batch analyzer agent for a dimension set and output budget."""
+    return build_batch_analyzer(dimensions, preset, BATCH_MAX_SIZE)
+
+# Batches only ever hold one user's essays: (user, dimensions, preset, priority)
+BatchKey = Tuple[str, Tuple[str, ...], str, str]
+
+async def analyze_upstream(
+    essay_text: str,
+    user_id: str,
+    dimensions: Tuple[str, ...],
+    preset: BudgetPreset,
+    priority: str = INTERACTIVE,
+) -> Tuple[str, str]:
+    """
+    Run one analysis upstream, batched with the user's other short essays when enabled.
+    
+    Batches run in their own task; the essay's share of the batch's model
+    usage is added to the caller's usage meter.
+    
+    Returns:
+        Tuple of (raw response text, session id) as from run_analysis
+    """
+    if is_batchable(essay_text):
+        response_text, session_id, tokens = await batcher.submit(
+            (user_id, dimensions, preset.name, priority), essay_text
+        )
+        if tokens is not None:
+            add_metered_usage(tokens)
+        return response_text, session_id
+    return await run_analysis(essay_text, user_id, dimensions, preset)
+
+async def take_upstream_capacity(tokens: int, requests: int, priority: str) -> None:
+    """Wait for the upstream rate limiter on behalf of a batch or its fallback."""
+    if replay.is_replaying():
+        return
+    await get_scheduler().acquire(
+        tokens,
+        requests=requests,
+        lane=priority,
+        max_wait=UPSTREAM_MAX_WAIT_SECONDS if priority == INTERACTIVE else None,
+    )
+
+async def run_batch(key: BatchKey, essays: List[str]) -> List[Optional[Tuple[str, str, Optional[int]]]]:
+    """
+    Batcher callback: analyze a batch and check each essay's result on its own.
+    
+    The batch takes upstream capacity once, for its combined estimate, and
+    its model usage is divided among the essays by length.
+    """
+    user_id, dimensions, preset_name, priority = key
+    preset = get_preset(preset_name)
+    prompts = upstream_call_prompts(batch_analyzer(dimensions, preset))
+    estimate = estimate_tokens(
+        "\n".join(essays), prompts, output_tokens=DEFAULT_OUTPUT_TOKENS * len(essays)
+    )
+    with tracing.span("batch", **{"batch.size": len(essays), "llm.estimated_tokens": estimate}):
+        await take_upstream_capacity(estimate, 1, priority)
+        with metered_usage() as meter:
+            response_text, session_id = await run_batch_analysis(essays, dimensions, preset, user_id)
+    shares = split_usage(meter.tokens, essays) if meter.calls else [None] * len(essays)
+    results: List[Optional[Tuple[str, str, Optional[int]]]] = []
+    for result, share in zip(split_batch_response(response_text, len(essays)), shares):
+        try:
+            if result is None:
+                raise ValueError("No result for essay")
+            validate_analysis(dict(result), dimensions)
+        except (TypeError, ValueError):
+            results.append(None)
+            continue
+        # Each waiting request parses its own result as if it had run alone
+        results.append((json.dumps(result), session_id, share))
+    return results
+
+async def run_single(key: BatchKey, essay_text: str) -> Tuple[str, str, Optional[int]]:
+    """Batcher callback: analyze one essay with the full agent graph."""
+    user_id, dimensions, preset_name, priority = key
+    preset = get_preset(preset_name)
+    prompts = upstream_call_prompts(build_coordinator(dimensions, preset))
+    await take_upstream_capacity(estimate_tokens(essay_text, prompts), len(prompts), priority)
+    with metered_usage() as meter:
+        response_text, session_id = await run_analysis(essay_text, user_id, dimensions, preset)
+    return response_text, session_id, meter.tokens if meter.calls else None
+
+batcher: MicroBatcher[Tuple[str, str, Optional[int]]] = MicroBatcher(
+    run_batch,
+    run_single,
+    max_batch_size=BATCH_MAX_SIZE,
+    max_wait=BATCH_MAX_WAIT_SECONDS,
+)
+
+# Runners for the batch analyzer, per dimension set and output budget
+batch_runners: Dict[Tuple[Tuple[str, ...], str], InMemoryRunner] = {}
+
+async def run_batch_analysis(
+    essays: List[str],
+    dimensions: Tuple[str, ...],
+    preset: BudgetPreset,
+    user_id: str = "batch",
+) -> Tuple[str, str]:
+    """
+    Analyze several essays in a single model call.
+    
+    Args:
+        essays: The essays, at most BATCH_MAX_SIZE
+        dimensions: Dimensions to analyze for every essay
+        preset: Output budgets; the coordinator's applies per essay
+        user_id: User whose essays these are; the session is theirs
+        
+    Returns:
+        Tuple of (raw batch response text, session id)
+    """
+    key = (dimensions, preset.name)
+    if key not in batch_runners:
+        batch_runners[key] = InMemoryRunner(
+            agent=batch_analyzer(dimensions, preset),
+            app_name="essay_analyzer_api"
+        )
+    batch_runner = batch_runners[key]
+    session = await batch_runner.session_service.create_session(
+        app_name="essay_analyzer_api",
+        user_id=user_id
+    )
+    with tracing.span("runner.run", **{"agent.name": batch_runner.agent.name}) as run_span:
+        stream = await collect_analysis(
+            batch_runner.run_async(
+                user_id=user_id,
+                session_id=session.id,
+                new_message=batch_message(essays),
+            ),
+            coordinator=batch_runner.agent.name,
+        )
+        if run_span:
+            run_span.set_attribute("runner.events", stream.event_count)
+    logger.info(
+        f"Session {session.id}: batch of {len(essays)} essays in {stream.total_seconds:.2f}s"
+    )
+    return stream.text, session.id
+
+async def run_analysis(
+    essay_text: str,
+    user_id: str,
+    dimensions: Tuple[str, ...] = DIMENSIONS,
+    preset: Optional[BudgetPreset] = None,
+) -> Tuple[str, str]:
+    """
+    Run the essay analyzer agent once and collect its response text.
+    
+    Args:
+        essay_text: The essay to analyze
+        user_id: User the ADK session is created for
+        dimensions: Dimensions whose sub-agents take part in the run
+        preset: Output budgets for the run; the configured default if None
+        
+    Returns:
+        Tuple of (raw response text, session id)
+    """
+    dimension_runner = get_runner(dimensions, preset)
+    coordinator = dimension_runner.agent
+    
+    # Create a session for this analysis
+    with tracing.span("session.create"):
+        session = await dimension_runner.session_service.create_session(
+            app_name="essay_analyzer_api",
+            user_id=user_id
+        )
+    
+    logger.info(f"Created session {session.id} for user {user_id}")
+    
+    # Prepare the content for analysis
+    content = analysis_message(essay_text)
+    
+    # Run the analysis; the collector closes the event stream on exit
+    # (including cancellation), tearing down any tool calls in flight
+    with tracing.span("runner.run", **{"agent.name": coordinator.name}) as run_span:
+        stream = await collect_analysis(
+            dimension_runner.run_async(
+                user_id=user_id,
+                session_id=session.id,
+                new_message=content,
+            ),
+            coordinator=coordinator.name,
+            output_keys=sub_agent_output_keys(coordinator),
+        )
+        if run_span:
+            run_span.set_attribute("runner.events", stream.event_count)
+            run_span.set_attribute("runner.json_complete", stream.json_complete)
+    logger.info(
+        f"Session {session.id}: {stream.event_count} events in {stream.total_seconds:.2f}s, "
+        f"sub-agent outputs: {sorted(stream.sub_agent_outputs)}"
+    )
+    
+    return stream.text, session.id
+
+def parse_analysis_response(
+    response_text: str,
+    dimensions: Tuple[str, ...] = DIMENSIONS,
+) -> Dict[str, Any]:
     """
     Parse the response from the ADK agent into the expected format.
     
     Args:
         response_text: Raw response text from the agent
+        dimensions: Dimensions the agent was asked to analyze
         
     Returns:
         Dictionary with parsed analysis results
+    
+    Raises:
+        UnparseableResponseError: If the response is not a valid analysis
     """
     try:
         # Clean up the response to extract JSON
@@ -192,45 +1223,137 @@ def parse_analysis_response(response_text: str) -> Dict[str, Any]:
             cleaned_response = cleaned_response[:-3]
         cleaned_response = cleaned_response.strip()
         
-        result = json.loads(cleaned_response)
-        
-        # Validate required fields
-        required_fields = ["grammarFeedback", "grammarRating", "structureFeedback", 
-                           "structureRating", "contentFeedback", "contentRating", 
-                           "spellingFeedback", "spellingRating", "overallScore"]
-        for field in required_fields:
-            if field not in result:
-                raise ValueError(f"Missing required field: {field}")
-        
-        # Ensure ratings are integers between 1-5
-        rating_fields = ["grammarRating", "structureRating", "contentRating", "spellingRating"]
-        for field in rating_fields:
-            if not isinstance(result[field], (int)) or result[field] < 1 or result[field] > 5:
-                result[field] = max(1, min(5, int(round(result.get(field, 3)))))
-        
-        # Ensure overallScore is a number
-        if not isinstance(result["overallScore"], (int, float)):
-            result["overallScore"] = 50
-        
-        # Ensure it's an integer for the response model
-        result["overallScore"] = int(result["overallScore"])
+        result = validate_analysis(json.loads(cleaned_response), dimensions)
+        result["dimensions"] = list(dimensions)
         
         return result
         
     except (json.JSONDecodeError, ValueError) as e:
-        logger.warning(f"Failed to parse analysis response: {e}")
-        # Fallback response if JSON parsing fails
-        return {
-            "grammarFeedback": "Unable to parse detailed grammar feedback from analysis.",
-            "grammarRating": 3,
-            "structureFeedback": "Unable to parse detailed structure feedback from analysis.",
-            "structureRating": 3,
-            "contentFeedback": "Unable to parse detailed content feedback from analysis.",
-            "contentRating": 3,
-            "spellingFeedback": "Unable to parse detailed spelling feedback from analysis.",
-            "spellingRating": 3,
-            "overallScore": 50
-        }
+        # The caller decides between a degraded local result and failing
+        raise UnparseableResponseError(f"Failed to parse analysis response: {e}") from e
+
+def validate_analysis(result: Any, dimensions: Tuple[str, ...]) -> Dict[str, Any]:
+    """
+    Check and normalize a decoded analysis in place.
+    
+    Returns:
+        The result with clamped ratings, an integer overallScore and only the
+        requested dimensions
+    
+    Raises:
+        ValueError: If the result is not an object or a requested field is missing
+    """
+    if not isinstance(result, dict):
+        raise ValueError("Analysis is not a JSON object")
+    # Validate required fields
+    required_fields = []
+    for dimension in dimensions:
+        required_fields += [f"{dimension}Feedback", f"{dimension}Rating"]
+    for field in required_fields:
+        if field not in result:
+            raise ValueError(f"Missing required field: {field}")
+    
+    # Ensure ratings are integers between 1-5
+    rating_fields = [f"{dimension}Rating" for dimension in dimensions]
+    for field in rating_fields:
+        if not isinstance(result[field], (int)) or result[field] < 1 or result[field] > 5:
+            result[field] = max(1, min(5, int(round(result.get(field, 3)))))
+    
+    # A partial analysis is scored from the dimensions that ran; a full
+    # one keeps the model's holistic score
+    if len(dimensions) < len(DIMENSIONS) or not isinstance(result.get("overallScore"), (int, float)):
+        result["overallScore"] = overall_score_from_ratings(result, dimensions)
+    
+    # Ensure it's an integer for the response model
+    result["overallScore"] = int(result["overallScore"])
+    
+    # Drop anything the agent returned for dimensions that were not requested
+    for dimension in DIMENSIONS:
+        if dimension not in dimensions:
+            result.pop(f"{dimension}Feedback", None)
+            result.pop(f"{dimension}Rating", None)
+    return result
+
+@app.get("/usage")
+async def get_usage(http_request: Request, limit: int = 100):
+    """Today's token and request usage of the heaviest users and tenants."""
+    return encoded_response(await get_fair_scheduler().usage(limit=limit), http_request)
+
+@app.get("/usage/{user_id}")
+async def get_user_usage(user_id: str, http_request: Request):
+    """Today's usage, remaining quota and queue state for one user's tenant."""
+    return encoded_response(await get_fair_scheduler().usage(user_id), http_request)
+
+@app.get("/metrics")
+async def get_metrics(http_request: Request):
+    """In-process counters and gauges, including cancelled analyses."""
+    snapshot = metrics.snapshot()
+    if job_queue:
+        snapshot["jobs"] = await asyncio.to_thread(job_queue.counts)
+    return encoded_response(snapshot, http_request)
+
+def parse_timestamp(value: Optional[str]) -> Optional[float]:
+    """Epoch seconds from an epoch number or an ISO 8601 date/datetime."""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+@app.get("/analytics")
+async def get_analytics(
+    http_request: Request,
+    user_id: Optional[str] = None,
+    cohort: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    include_degraded: bool = False,
+    columns: Optional[str] = Query(None, alias="metrics"),
+    trend_metric: str = "overallScore",
+    interval: str = "day",
+    group_by: Optional[str] = None,
+    bins: int = 10,
+):
+    """
+    Score distributions, rating correlations and trends over stored results.
+    
+    Args:
+        http_request: The HTTP request, for response content negotiation
+        user_id: Only this user's results
+        cohort: Only this class's results
+        since: Start of the date range (ISO date or epoch seconds)
+        until: End of the date range, exclusive
+        include_degraded: Include results from the local fallback analyzer
+        columns: Comma-separated columns to describe, as ?metrics= (default: all)
+        trend_metric: Column averaged per interval and group
+        interval: day, week or month
+        group_by: cohort or user
+        bins: Histogram bins for non-rating columns, at most MAX_HISTOGRAM_BINS
+    """
+    if results_store is None:
+        raise HTTPException(status_code=503, detail="Results store not enabled")
+    
+    try:
+        # Refreshing from SQLite and aggregating the columns block, so the
+        # report runs in a worker thread
+        report = await asyncio.to_thread(
+            analytics.cohort_report,
+            results_store,
+            user_id=user_id,
+            cohort=cohort,
+            since=parse_timestamp(since),
+            until=parse_timestamp(until),
+            include_degraded=include_degraded,
+            metrics=columns.split(",") if columns else analytics.NUMERIC_COLUMNS,
+            trend_metric=trend_metric,
+            interval=interval,
+            group_by=group_by,
+            bins=bins,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return encoded_response(report, http_request)
 
 @app.get("/")
 async def root():
@@ -239,7 +1362,12 @@ async def root():
         "message": "ADK Essay Analyzer API",
         "version": "1.0.0",
         "docs": "/docs",
-        "health": "/health"
+        "health": "/health",
+        "jobs": "/jobs",
+        "live": "/live",
+        "metrics": "/metrics",
+        "usage": "/usage",
+        "analytics": "/analytics"
     }
 
 if __name__ == "__main__":
@@ -253,5 +1381,6 @@ if __name__ == "__main__":
         host=host,
         port=port,
         reload=True,
-        log_level="info"
+        log_level="info",
+        timeout_graceful_shutdown=int(SHUTDOWN_DRAIN_SECONDS) + 5,
     )
@@ -0,0 +1,826 @@
+#!/usr/bin/env python3
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+ADK Essay Analyzer Benchmarks
+
+Measures cost and latency of the analysis pipeline. Each suite is a
+subcommand, e.g.:
+
+    python adk_benchmark.py dimensions --essay test_essay.txt --runs 3
+    python adk_benchmark.py budgets --live --runs 3
+    python adk_benchmark.py warmup --replay fixtures.json --replay-speed 1
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+# Add the project root to the path so we can import our modules
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+Row = Dict[str, Any]
+
+
+def print_table(rows: List[Row]) -> None:
+    """Print benchmark rows as an aligned text table."""
+    if not rows:
+        print("(no results)")
+        return
+    columns = list(rows[0])
+    rendered = [
+        [f"{row[c]:.3f}" if isinstance(row[c], float) else str(row[c]) for c in columns]
+        for row in rows
+    ]
+    widths = [max(len(c), *(len(r[i]) for r in rendered)) for i, c in enumerate(columns)]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    print("  ".join("-" * w for w in widths))
+    for r in rendered:
+        print("  ".join(v.ljust(w) for v, w in zip(r, widths)))
+
+
+def latency_stats(samples: List[float]) -> Row:
+    """Mean, median and max of latency samples in seconds."""
+    if not samples:
+        return {"mean_s": 0.0, "p50_s": 0.0, "max_s": 0.0}
+    return {
+        "mean_s": statistics.fmean(samples),
+        "p50_s": statistics.median(samples),
+        "max_s": max(samples),
+    }
+
+
+def bench_dimensions(args: argparse.Namespace) -> List[Row]:
+    """Cost and latency for every combination of analysis dimensions."""
+    from essay_analyzer.agent import build_coordinator, upstream_call_prompts
+    from essay_analyzer.prompt import DIMENSIONS
+    from essay_analyzer.rate_limiter import estimate_tokens
+
+    essay_text = Path(args.essay).read_text(encoding="utf-8")
+    if args.live:
+        from adk_essay_cli import analyze_essay_cli
+
+    rows = []
+    for size in range(1, len(DIMENSIONS) + 1):
+        for combo in itertools.combinations(DIMENSIONS, size):
+            prompts = upstream_call_prompts(build_coordinator(combo))
+            row = {
+                "dimensions": "+".join(combo),
+                "model_calls": len(prompts),
+                "est_tokens": estimate_tokens(essay_text, prompts),
+            }
+            if args.live:
+                samples = []
+                for _ in range(args.runs):
+                    start = time.perf_counter()
+                    asyncio.run(analyze_essay_cli(essay_text, combo))
+                    samples.append(time.perf_counter() - start)
+                row.update(latency_stats(samples))
+            rows.append(row)
+    return rows
+
+
+def bench_budgets(args: argparse.Namespace) -> List[Row]:
+    """Latency/quality trade-off of the output budget presets."""
+    from essay_analyzer.agent import build_coordinator, upstream_call_prompts
+    from essay_analyzer.budgets import presets
+    from essay_analyzer.prompt import DIMENSIONS
+    from essay_analyzer.rate_limiter import estimate_tokens
+
+    essay_text = Path(args.essay).read_text(encoding="utf-8")
+    rating_fields = [f"{d}Rating" for d in DIMENSIONS]
+    feedback_fields = [f"{d}Feedback" for d in DIMENSIONS]
+    if args.live:
+        from adk_essay_cli import analyze_essay_cli
+
+    # The most generous preset is the quality reference for the others
+    ordered = sorted(presets().values(), key=lambda p: -p.total_output_tokens(DIMENSIONS))
+    reference: Dict[str, float] = {}
+    rows = []
+    for preset in ordered:
+        prompts = upstream_call_prompts(build_coordinator(DIMENSIONS, preset))
+        row: Row = {
+            "budget": preset.name,
+            "model_calls": len(prompts),
+            "max_output_tokens": preset.total_output_tokens(DIMENSIONS),
+            "est_tokens": estimate_tokens(essay_text, prompts),
+        }
+        if args.live:
+            samples, words, results = [], [], []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                result = asyncio.run(analyze_essay_cli(essay_text, DIMENSIONS, preset.name))
+                samples.append(time.perf_counter() - start)
+                words.append(sum(len(str(result.get(f, "")).split()) for f in feedback_fields))
+                results.append(result)
+            # A truncated or unparseable response is missing ratings
+            complete = [r for r in results if all(isinstance(r.get(f), (int, float)) for f in rating_fields)]
+            means = {
+                f: statistics.fmean(r[f] for r in complete)
+                for f in rating_fields + ["overallScore"]
+            } if complete else {}
+            if not reference:
+                reference = means
+            row.update(latency_stats(samples))
+            row["feedback_words"] = statistics.fmean(words)
+            row["complete_rate"] = len(complete) / len(results)
+            if means and reference:
+                row["rating_mae_vs_ref"] = statistics.fmean(
+                    abs(means[f] - reference[f]) for f in rating_fields
+                )
+                row["score_diff_vs_ref"] = means["overallScore"] - reference["overallScore"]
+            else:
+                row["rating_mae_vs_ref"] = row["score_diff_vs_ref"] = float("nan")
+        rows.append(row)
+    return rows
+
+
+def bench_batching(args: argparse.Namespace) -> List[Row]:
+    """Model calls, tokens and latency of micro-batched short essays vs. one analysis each."""
+    from essay_analyzer.agent import build_batch_analyzer, build_coordinator, upstream_call_prompts
+    from essay_analyzer.budgets import get_preset
+    from essay_analyzer.prompt import DIMENSIONS
+    from essay_analyzer.rate_limiter import DEFAULT_OUTPUT_TOKENS, estimate_tokens
+
+    texts = [Path(path).read_text(encoding="utf-8").strip() for path in args.essays]
+    preset = get_preset(args.budget)
+    prompts = upstream_call_prompts(build_coordinator(DIMENSIONS, preset))
+    rating_fields = [f"{d}Rating" for d in DIMENSIONS]
+    if args.live:
+        import adk_api_server as server
+
+        asyncio.run(server.initialize_runner())
+
+    rows = []
+    for size in args.sizes:
+        essays = [texts[i % len(texts)] for i in range(size)]
+        batch_agent = build_batch_analyzer(DIMENSIONS, preset, size)
+        row: Row = {
+            "essays": size,
+            "single_calls": size * len(prompts),
+            "batch_calls": 1,
+            "single_tokens": sum(estimate_tokens(essay, prompts) for essay in essays),
+            # One call sees every essay and writes one analysis per essay
+            "batch_tokens": estimate_tokens(
+                "\n".join(essays), [batch_agent.instruction], DEFAULT_OUTPUT_TOKENS * size
+            ),
+        }
+        if args.live:
+            async def singles():
+                return await asyncio.gather(*(
+                    server.run_analysis(essay, "benchmark", DIMENSIONS, preset) for essay in essays
+                ))
+
+            start = time.perf_counter()
+            single_results = []
+            for text, _ in asyncio.run(singles()):
+                try:
+                    single_results.append(server.parse_analysis_response(text, DIMENSIONS))
+                except ValueError:
+                    single_results.append({"degraded": True})
+            row["single_s"] = time.perf_counter() - start
+            start = time.perf_counter()
+            response_text, _ = asyncio.run(server.run_batch_analysis(essays, DIMENSIONS, preset))
+            row["batch_s"] = time.perf_counter() - start
+            batch_results = []
+            for result in server.split_batch_response(response_text, size):
+                try:
+                    batch_results.append(server.validate_analysis(result, DIMENSIONS))
+                except (TypeError, ValueError):
+                    batch_results.append(None)
+            # Essays the batch answered validly, and their rating agreement
+            # with the essay analyzed on its own
+            pairs = [
+                (b, s) for b, s in zip(batch_results, single_results)
+                if b is not None and not s.get("degraded")
+            ]
+            row["batch_valid_rate"] = sum(b is not None for b in batch_results) / size
+            row["rating_mae_vs_single"] = statistics.fmean(
+                abs(b[f] - s[f]) for b, s in pairs for f in rating_fields
+            ) if pairs else float("nan")
+        rows.append(row)
+    return rows
+
+
+def bench_upload(args: argparse.Namespace) -> List[Row]:
+    """Peak memory and throughput of the streaming upload path vs. a buffered JSON body."""
+    import tracemalloc
+
+    from essay_analyzer.uploads import read_upload
+
+    base = Path(args.essay).read_text(encoding="utf-8").strip()
+    # Ragged whitespace and CRLFs give the normalizer something to do
+    block = (base.replace(". ", ".  ").replace("\n", "\r\n") + "\r\n\r\n\r\n").encode("utf-8")
+    chunk = block * max(1, args.chunk_kb * 1024 // len(block))
+
+    async def body(size: int):
+        sent = 0
+        while sent < size:
+            piece = chunk[: size - sent]
+            sent += len(piece)
+            yield piece
+
+    def buffered(size: int) -> int:
+        # What /analyze does: the whole JSON body, the parsed string, then
+        # the prompt with the essay interpolated
+        raw = json.dumps({"text": (chunk * (size // len(chunk) + 1))[:size].decode("utf-8", "ignore")}).encode()
+        text = json.loads(raw)["text"]
+        message = f"Please analyze this essay:\n\n{text}"
+        return len(message)
+
+    # One loop for all runs: asyncio.run's teardown would show up in the peak
+    loop = asyncio.new_event_loop()
+
+    def streamed(size: int) -> int:
+        return len(loop.run_until_complete(read_upload(body(size), "text/plain", 0, 0)).text)
+
+    rows = []
+    for size_mb in args.sizes:
+        size = size_mb * 1024 * 1024
+        row: Row = {"input_mb": size_mb}
+        for name, path in (("json", buffered), ("stream", streamed)):
+            # Timed separately: tracemalloc slows allocation-heavy code down
+            start = time.perf_counter()
+            path(size)
+            row[f"{name}_s"] = time.perf_counter() - start
+            tracemalloc.start()
+            path(size)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            row[f"{name}_peak_mb_per_mb"] = peak / size
+        row["stream_mb_per_s"] = size_mb / row["stream_s"]
+        rows.append(row)
+    loop.close()
+    return rows
+
+
+def bench_grammar_rules(args: argparse.Namespace) -> List[Row]:
+    """Throughput of the grammar rule pre-pass on large essays."""
+    import re
+
+    from essay_analyzer.grammar_rules import _PATTERN_RULES, GrammarRuleEngine
+
+    base = Path(args.essay).read_text(encoding="utf-8").strip() + "\n\n"
+    compile_start = time.perf_counter()
+    engine = GrammarRuleEngine()
+    compile_s = time.perf_counter() - compile_start
+    # Baseline: one regex per rule, each scanning the whole text
+    separate = [
+        re.compile(r"\b" + re.escape(phrase).replace(" ", r"\s+") + r"\b", re.IGNORECASE)
+        for phrase in engine.phrases
+    ]
+    separate += [re.compile(pattern.replace("{backref}", "1")) for _, pattern in _PATTERN_RULES]
+
+    rows = []
+    for size_kb in args.sizes:
+        text = base * max(1, size_kb * 1024 // len(base))
+        single, per_rule = [], []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            findings = engine.check(text)
+            single.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            for pattern in separate:
+                for _ in pattern.finditer(text):
+                    pass
+            per_rule.append(time.perf_counter() - start)
+        best = min(single)
+        rows.append({
+            "size_kb": len(text) // 1024,
+            "rules": engine.rule_count,
+            "findings": len(findings),
+            "compile_s": compile_s,
+            "single_pass_s": best,
+            "mb_per_s": len(text) / best / 1e6,
+            "per_rule_s": min(per_rule),
+            "speedup": min(per_rule) / best,
+        })
+    return rows
+
+
+def bench_serialization(args: argparse.Namespace) -> List[Row]:
+    """Encode time and size of analysis payloads: FastAPI's default path vs. the fast response path."""
+    from pydantic import TypeAdapter
+
+    from adk_api_server import RESPONSE_ENCODING, EssayAnalysisResponse, JobStatusResponse
+    from essay_analyzer import serialization
+
+    words = Path(args.essay).read_text(encoding="utf-8").split()
+    feedback = " ".join(words[i % len(words)] for i in range(args.feedback_words))
+    analysis = EssayAnalysisResponse(
+        grammarFeedback=feedback, grammarRating=4,
+        structureFeedback=feedback, structureRating=3,
+        contentFeedback=feedback, contentRating=5,
+        spellingFeedback=feedback, spellingRating=4,
+        overallScore=82, session_id="0" * 36,
+    )
+    history = [
+        JobStatusResponse(
+            job_id=f"{i:032x}", status="completed", attempts=1,
+            created_at=1.7e9 + i, updated_at=1.7e9 + i + 20, result=analysis,
+        )
+        for i in range(args.items)
+    ]
+    payloads = {
+        "analysis": (analysis, TypeAdapter(EssayAnalysisResponse)),
+        f"history x{args.items}": (history, TypeAdapter(List[JobStatusResponse])),
+    }
+
+    def best_us(encode: Callable[[], bytes], number: int) -> float:
+        samples = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            for _ in range(number):
+                encode()
+            samples.append((time.perf_counter() - start) / number)
+        return min(samples) * 1e6
+
+    rows = []
+    for name, (content, adapter) in payloads.items():
+        number = max(1, args.iterations // (args.items if isinstance(content, list) else 1))
+
+        def fastapi_default() -> bytes:
+            # What a response_model endpoint does: dump the return value,
+            # validate it against the model, dump it again in JSON mode and
+            # json.dumps the result (JSONResponse.render)
+            value = adapter.validate_python(adapter.dump_python(content))
+            return json.dumps(
+                adapter.dump_python(value, mode="json"),
+                ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"),
+            ).encode("utf-8")
+
+        paths: Dict[str, Callable[[], bytes]] = {
+            "fastapi default": fastapi_default,
+            "pydantic dump_json": lambda: adapter.dump_json(content),
+            "orjson": lambda: serialization.dumps_json(content),
+        }
+        if serialization.msgpack is not None:
+            paths["msgpack"] = lambda: serialization.dumps_msgpack(content)
+        baseline = None
+        for path, encode in paths.items():
+            body = encode()
+            encode_us = best_us(encode, number)
+            baseline = baseline or encode_us
+            rows.append({
+                "payload": name,
+                "path": path,
+                "bytes": len(body),
+                "encode_us": encode_us,
+                "speedup": baseline / encode_us,
+            })
+        # The fast path with compression at the server's levels
+        codings = [serialization.GZIP] + ([serialization.BROTLI] if serialization.brotli else [])
+        for coding in codings:
+            def encode() -> bytes:
+                return serialization.compress(serialization.dumps_json(content), coding, RESPONSE_ENCODING)
+
+            compressed = encode()
+            encode_us = best_us(encode, number)
+            rows.append({
+                "payload": name,
+                "path": f"orjson + {coding}",
+                "bytes": len(compressed),
+                "encode_us": encode_us,
+                "speedup": baseline / encode_us,
+            })
+    return rows
+
+
+def bench_analytics(args: argparse.Namespace) -> List[Row]:
+    """Query latency of cohort analytics over a synthetic corpus of stored results."""
+    import random
+    import tempfile
+
+    from essay_analyzer.analytics import cohort_report
+    from essay_analyzer.results_store import RATING_COLUMNS, ResultsStore
+
+    rng = random.Random(0)
+    now = time.time()
+    span = 180 * 86400
+    records = []
+    for i in range(args.results):
+        base = rng.randint(1, 5)
+        record = {
+            "created_at": now - span + i * span / args.results,
+            "user_id": f"user{rng.randrange(args.users)}",
+            "cohort": f"class{rng.randrange(args.cohorts)}",
+            "degraded": rng.random() < 0.02,
+            "overallScore": rng.randint(20, 100),
+            "word_count": rng.randint(150, 1200),
+            "sentence_count": rng.randint(8, 60),
+            "paragraph_count": rng.randint(1, 8),
+            "avg_sentence_length": rng.uniform(8, 30),
+            "lexical_diversity": rng.uniform(0.3, 0.8),
+            "flesch_reading_ease": rng.gauss(55, 15),
+            "transition_count": rng.randint(0, 20),
+        }
+        for name in RATING_COLUMNS:
+            record[name] = max(1, min(5, base + rng.randint(-1, 1)))
+        records.append(record)
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = str(Path(directory) / "results.sqlite3")
+        start = time.perf_counter()
+        ResultsStore(db_path).add_many(records)
+        insert_s = time.perf_counter() - start
+        start = time.perf_counter()
+        store = ResultsStore(db_path)
+        load_s = time.perf_counter() - start
+
+        queries = {
+            "all": {},
+            "all by cohort": {"group_by": "cohort"},
+            "one cohort, weekly": {"cohort": "class1", "interval": "week"},
+            "one user": {"user_id": "user1"},
+            "last 7 days": {"since": now - 7 * 86400},
+            "cohort + 30 days": {"cohort": "class1", "since": now - 30 * 86400, "group_by": "user"},
+        }
+        rows = []
+        for name, filters in queries.items():
+            samples = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                report = cohort_report(store, **filters)
+                samples.append(time.perf_counter() - start)
+            rows.append({
+                "query": name,
+                "results": args.results,
+                "matched": report["count"],
+                "insert_s": insert_s,
+                "load_s": load_s,
+                **latency_stats(samples),
+            })
+    return rows
+
+
+def bench_fair_queue(args: argparse.Namespace) -> List[Row]:
+    """Per-request overhead of fair queueing and the wait of light users behind a bulk user."""
+    import tempfile
+
+    from essay_analyzer.fair_queue import FairScheduler, TenantLimits, UsageLedger
+
+    async def run(users: int, ledger: UsageLedger) -> Row:
+        scheduler = FairScheduler(args.slots, ledger, TenantLimits(max_concurrency=args.slots))
+        light_waits: List[float] = []
+
+        async def analysis(user_id: str, record: bool) -> None:
+            ticket = await scheduler.acquire(user_id, 2000)
+            if record:
+                light_waits.append(ticket.waited)
+            await asyncio.sleep(0)
+            scheduler.release(ticket)
+
+        # One bulk user queues a backlog as large as all other users combined
+        tasks = [asyncio.ensure_future(analysis("bulk", False)) for _ in range(users)]
+        await asyncio.sleep(0)
+        tasks += [asyncio.ensure_future(analysis(f"user{i}", True)) for i in range(users)]
+        start = time.perf_counter()
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+        requests = 2 * users
+        return {
+            "users": users,
+            "requests": requests,
+            "total_s": elapsed,
+            "us_per_request": elapsed / requests * 1e6,
+            "light_wait_p50_s": statistics.median(light_waits),
+            "light_wait_max_s": max(light_waits),
+        }
+
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        for users in args.users:
+            ledger = UsageLedger(str(Path(directory) / f"usage{users}.sqlite3"))
+            rows.append(asyncio.run(run(users, ledger)))
+    return rows
+
+
+# Child process for the warm-up suite: a fresh server process that starts up
+# (optionally warming up) and then serves two analyses, printing its timings
+_WARMUP_CHILD = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+import adk_api_server as server
+from essay_analyzer import replay
+imported = time.perf_counter() - start
+
+async def main(warm, essay, analyze):
+    replay.install_from_env()
+    await server.initialize_runner()
+    row = {"import_s": imported, "warmup_s": 0.0}
+    if warm:
+        server.start_warmup()
+        if server.warmup_task is not None:
+            await server.warmup_task
+        row["warmup_s"] = server.warmup.total_seconds
+    for name in ("first_s", "second_s") if analyze else ():
+        started = time.perf_counter()
+        await server.run_analysis(essay, "benchmark")
+        row[name] = time.perf_counter() - started
+    print(json.dumps(row))
+
+loop = asyncio.new_event_loop()
+loop.run_until_complete(main(sys.argv[1] == "warm", open(sys.argv[2]).read(), sys.argv[3] == "1"))
+"""
+
+
+def bench_warmup(args: argparse.Namespace) -> List[Row]:
+    """First-request latency of a freshly started server process, cold vs warmed up."""
+    import os
+    import subprocess
+
+    env = dict(os.environ, WARMUP_ENABLED="true", WARMUP_CONNECTIONS=str(args.connections))
+    if args.replay:
+        # Children replay the same fixtures as the parent would
+        env.update(LLM_FIXTURE_MODE="replay", LLM_FIXTURE_PATH=args.replay, LLM_REPLAY_SPEED=str(args.replay_speed))
+    analyze = "1" if args.live or args.replay else "0"
+
+    rows = []
+    for mode in ("cold", "warm"):
+        samples: Dict[str, List[float]] = {}
+        for _ in range(args.runs):
+            child = subprocess.run(
+                [sys.executable, "-c", _WARMUP_CHILD, mode, args.essay, analyze],
+                cwd=project_root, env=env, capture_output=True, text=True,
+            )
+            if child.returncode != 0:
+                raise RuntimeError(f"{mode} server process failed:\n{child.stderr}")
+            for key, value in json.loads(child.stdout.strip().splitlines()[-1]).items():
+                samples.setdefault(key, []).append(value)
+        row: Row = {"mode": mode, "runs": args.runs}
+        row.update({key: statistics.median(values) for key, values in samples.items()})
+        rows.append(row)
+    return rows
+
+
+# Simulated replica for the routing suite: a real ResultCache in front of a
+# fixed "model" latency, so hit rate and latency reflect routing alone
+_REPLICA_CHILD = """
+import json, sys, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from essay_analyzer.result_cache import ResultCache
+
+cache = ResultCache(int(sys.argv[2]))
+miss_seconds = float(sys.argv[1])
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.reply({"status": "healthy"})
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        key = cache.key(request["text"], ("grammar",), "brief")
+        hit = cache.get(key) is not None
+        if not hit:
+            time.sleep(miss_seconds)
+            cache.put(key, {"overallScore": 80})
+        self.reply({"cached": hit})
+
+    def reply(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+ThreadingHTTPServer.request_queue_size = 128
+server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+print(server.server_address[1], flush=True)
+server.serve_forever()
+"""
+
+
+def bench_routing(args: argparse.Namespace) -> List[Row]:
+    """Cache hit rate and latency across local replica processes: random vs. consistent-hash routing."""
+    import random
+    import subprocess
+    import uuid
+
+    from essay_analyzer.result_cache import essay_fingerprint
+    from essay_analyzer.routing import HashRing, ReplicaRouter
+
+    base = Path(args.essay).read_text(encoding="utf-8").split()
+    essays = [" ".join(base[i % len(base):] + base[: i % len(base)]) + f" ({i})" for i in range(args.essays)]
+    # Popular essays are resubmitted far more often (Zipf-like)
+    rng = random.Random(7)
+    workload = rng.choices(essays, weights=[1 / (rank + 1) for rank in range(len(essays))], k=args.requests)
+
+    def start_replicas() -> List[subprocess.Popen]:
+        return [
+            subprocess.Popen(
+                [sys.executable, "-c", _REPLICA_CHILD, str(args.miss_ms / 1000), str(args.cache_size)],
+                cwd=project_root, stdout=subprocess.PIPE, text=True,
+            )
+            for _ in range(args.replicas)
+        ]
+
+    async def run(strategy: str, processes: List[subprocess.Popen], kill_one: bool) -> Row:
+        urls = [f"http://127.0.0.1:{int(p.stdout.readline())}" for p in processes]
+        router = ReplicaRouter(urls)
+        semaphore = asyncio.Semaphore(args.concurrency)
+        latencies: List[float] = []
+        hits = errors = failovers = 0
+
+        async def send(index: int, essay_text: str) -> None:
+            nonlocal hits, errors, failovers
+            # Round-robin DNS is equivalent to a random replica per request
+            key = essay_fingerprint(essay_text) if strategy != "random" else uuid.uuid4().hex
+            async with semaphore:
+                if kill_one and index == len(workload) // 2:
+                    processes[0].kill()
+                start = time.perf_counter()
+                try:
+                    forwarded = await router.forward(
+                        key, "POST", "/analyze",
+                        content=json.dumps({"text": essay_text}).encode(),
+                        headers={"Content-Type": "application/json"},
+                    )
+                except Exception:
+                    errors += 1
+                    return
+                latencies.append(time.perf_counter() - start)
+            hits += json.loads(forwarded.body)["cached"]
+            failovers += forwarded.replica != router.ring.lookup(key)
+
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(*(send(i, essay) for i, essay in enumerate(workload)))
+        finally:
+            await router.close()
+        elapsed = time.perf_counter() - start
+        return {
+            "strategy": strategy + (" + replica killed" if kill_one else ""),
+            "requests": len(workload),
+            "req_per_s": len(workload) / elapsed,
+            "hit_rate": hits / max(1, len(latencies)),
+            **latency_stats(latencies),
+            "failovers": failovers,
+            "errors": errors,
+        }
+
+    rows = []
+    for strategy, kill_one in (("random", False), ("consistent-hash", False), ("consistent-hash", True)):
+        processes = start_replicas()
+        try:
+            rows.append(asyncio.run(run(strategy, processes, kill_one)))
+        finally:
+            for process in processes:
+                process.kill()
+                process.wait()
+
+    # Keys that change owner when a replica joins; ideally 1/(n+1)
+    ring = HashRing(f"replica{i}" for i in range(args.replicas))
+    keys = [essay_fingerprint(essay) for essay in essays]
+    before = [ring.lookup(key) for key in keys]
+    ring.add(f"replica{args.replicas}")
+    moved = sum(ring.lookup(key) != owner for key, owner in zip(keys, before)) / len(keys)
+    print(
+        f"Adding replica {args.replicas + 1} remaps {moved:.1%} of essays (ideal {1 / (args.replicas + 1):.1%})",
+        file=sys.stderr,
+    )
+    return rows
+
+
+SUITES: Dict[str, Callable[[argparse.Namespace], List[Row]]] = {
+    "dimensions": bench_dimensions,
+    "budgets": bench_budgets,
+    "grammar-rules": bench_grammar_rules,
+    "batching": bench_batching,
+    "upload": bench_upload,
+    "serialization": bench_serialization,
+    "analytics": bench_analytics,
+    "fair-queue": bench_fair_queue,
+    "warmup": bench_warmup,
+    "routing": bench_routing,
+}
+
+
+def main():
+    """Main benchmark function."""
+    parser = argparse.ArgumentParser(description="Benchmark the essay analysis pipeline.")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument(
+        "--replay", metavar="PATH", help="Serve model calls from a recorded fixture file"
+    )
+    parser.add_argument(
+        "--replay-speed", type=float, default=0.0, help="Replay latency multiplier (0 = instant)"
+    )
+    subparsers = parser.add_subparsers(dest="suite", required=True)
+
+    dimensions = subparsers.add_parser("dimensions", help=bench_dimensions.__doc__)
+    dimensions.add_argument("--essay", default="test_essay.txt", help="Essay file to analyze")
+    dimensions.add_argument("--runs", type=int, default=1, help="Live runs per combination")
+    dimensions.add_argument(
+        "--live", action="store_true", help="Run the pipeline to measure latency (costs quota unless replaying)"
+    )
+
+    budgets = subparsers.add_parser("budgets", help=bench_budgets.__doc__)
+    budgets.add_argument("--essay", default="test_essay.txt", help="Essay file to analyze")
+    budgets.add_argument("--runs", type=int, default=3, help="Live runs per preset")
+    budgets.add_argument(
+        "--live", action="store_true", help="Run the pipeline to measure latency (costs quota unless replaying)"
+    )
+
+    grammar_rules = subparsers.add_parser("grammar-rules", help=bench_grammar_rules.__doc__)
+    grammar_rules.add_argument("--essay", default="test_complete_essay.txt", help="Essay file to repeat")
+    grammar_rules.add_argument(
+        "--sizes", type=int, nargs="+", default=[16, 128, 1024], help="Text sizes in KiB"
+    )
+    grammar_rules.add_argument("--runs", type=int, default=3, help="Runs per size (best is reported)")
+
+    batching = subparsers.add_parser("batching", help=bench_batching.__doc__)
+    batching.add_argument(
+        "--essays", nargs="+", default=["test_essay.txt"], help="Short essay files, cycled to fill a batch"
+    )
+    batching.add_argument("--sizes", type=int, nargs="+", default=[2, 4, 8], help="Batch sizes")
+    batching.add_argument("--budget", default="brief", help="Output budget preset")
+    batching.add_argument(
+        "--live", action="store_true", help="Run both paths to measure latency (costs quota unless replaying)"
+    )
+
+    upload = subparsers.add_parser("upload", help=bench_upload.__doc__)
+    upload.add_argument("--essay", default="test_complete_essay.txt", help="Essay file to repeat")
+    upload.add_argument("--sizes", type=int, nargs="+", default=[1, 8, 32], help="Upload sizes in MiB")
+    upload.add_argument("--chunk-kb", type=int, default=64, help="Body chunk size in KiB")
+
+    serialization = subparsers.add_parser("serialization", help=bench_serialization.__doc__)
+    serialization.add_argument("--essay", default="test_complete_essay.txt", help="Source of feedback words")
+    serialization.add_argument("--feedback-words", type=int, default=300, help="Words per feedback field")
+    serialization.add_argument("--items", type=int, default=500, help="Analyses in the history payload")
+    serialization.add_argument("--iterations", type=int, default=2000, help="Encodes per run of one analysis")
+    serialization.add_argument("--runs", type=int, default=5, help="Runs per path (best is reported)")
+
+    analytics = subparsers.add_parser("analytics", help=bench_analytics.__doc__)
+    analytics.add_argument("--results", type=int, default=100000, help="Stored results to generate")
+    analytics.add_argument("--users", type=int, default=5000, help="Distinct users")
+    analytics.add_argument("--cohorts", type=int, default=200, help="Distinct cohorts (classes)")
+    analytics.add_argument("--runs", type=int, default=5, help="Runs per query")
+
+    fair_queue = subparsers.add_parser("fair-queue", help=bench_fair_queue.__doc__)
+    fair_queue.add_argument(
+        "--users", type=int, nargs="+", default=[100, 1000, 5000], help="Distinct light users"
+    )
+    fair_queue.add_argument("--slots", type=int, default=8, help="Runner slots")
+
+    warmup = subparsers.add_parser("warmup", help=bench_warmup.__doc__)
+    warmup.add_argument("--essay", default="test_essay.txt", help="Essay file to analyze")
+    warmup.add_argument("--runs", type=int, default=3, help="Server processes started per mode")
+    warmup.add_argument("--connections", type=int, default=4, help="Keep-alive connections to open")
+    warmup.add_argument(
+        "--live", action="store_true", help="Time the first analyses (costs quota unless replaying)"
+    )
+
+    routing = subparsers.add_parser("routing", help=bench_routing.__doc__)
+    routing.add_argument("--essay", default="test_complete_essay.txt", help="Essay file to derive essays from")
+    routing.add_argument("--replicas", type=int, default=4, help="Replica processes")
+    routing.add_argument("--essays", type=int, default=200, help="Distinct essays")
+    routing.add_argument("--requests", type=int, default=2000, help="Requests sent")
+    routing.add_argument("--concurrency", type=int, default=8, help="Requests in flight")
+    routing.add_argument("--miss-ms", type=float, default=200, help="Simulated analysis latency on a cache miss")
+    routing.add_argument("--cache-size", type=int, default=64, help="Results each replica caches")
+
+    args = parser.parse_args()
+    if args.replay:
+        from essay_analyzer import replay
+
+        replay.install(replay.REPLAY, args.replay, args.replay_speed)
+    rows = SUITES[args.suite](args)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -19,6 +19,7 @@ ADK Essay Analyzer CLI
 Command-line interface for the ADK essay analysis agents.
 """
 
+import argparse
 import asyncio
 import json
 import sys
@@ -30,56 +31,90 @@ sys.path.insert(0, str(project_root))
 
 try:
     from google.adk.runners import InMemoryRunner
-    from google.genai import types
     from dotenv import load_dotenv
-    from essay_analyzer.agent import root_agent
+
+    # Load environment variables before importing essay_analyzer: the root
+    # agent and the output budget presets are built from them at import time
+    load_dotenv()
+
+    from essay_analyzer.agent import (
+        analysis_message,
+        build_coordinator,
+        normalize_dimensions,
+        overall_score_from_ratings,
+        upstream_call_prompts,
+    )
+    from essay_analyzer.budgets import get_preset, presets
+    from essay_analyzer.prompt import DIMENSIONS
+    from essay_analyzer import replay, tracing
+    from essay_analyzer.events import collect_analysis, sub_agent_output_keys
+    from essay_analyzer.rate_limiter import estimate_tokens, get_scheduler, is_quota_error
 except ImportError as e:
     print(f"Error importing required modules: {e}")
     print("Please ensure all dependencies are installed:")
     print("pip install -r requirements.txt")
     sys.exit(1)
 
-# Load environment variables
-load_dotenv()
+QUOTA_RETRIES = 2
+QUOTA_BACKOFF_SECONDS = 10.0
 
-async def analyze_essay_cli(essay_text: str) -> dict:
+async def analyze_essay_cli(essay_text: str, dimensions: tuple = None, output_budget: str = None) -> dict:
     """
     Analyze essay using the ADK agent and return results.
     
     Args:
         essay_text: The essay text to analyze
+        dimensions: Dimensions to analyze (defaults to all of them)
+        output_budget: Output budget preset (defaults to OUTPUT_BUDGET_PRESET)
         
     Returns:
         Dictionary containing the analysis results
     """
     try:
+        dimensions = normalize_dimensions(dimensions)
+        coordinator_preset = get_preset(output_budget)
+        coordinator = build_coordinator(dimensions, coordinator_preset)
+        
         # Create runner for the agent
         runner = InMemoryRunner(
-            agent=root_agent,
+            agent=coordinator,
             app_name="essay_analyzer_cli"
         )
         
-        # Create a session
-        session = await runner.session_service.create_session(
-            app_name="essay_analyzer_cli",
-            user_id="cli_user"
-        )
-        
         # Prepare content for analysis
-        content = types.Content(
-            role='user',
-            parts=[types.Part.from_text(text=f"Please analyze this essay:\n\n{essay_text}")]
-        )
+        content = analysis_message(essay_text)
+        
+        # Wait for upstream capacity shared with the API server workers
+        scheduler = get_scheduler()
+        prompts = upstream_call_prompts(coordinator)
+        estimated_tokens = estimate_tokens(essay_text, prompts)
         
         # Run the analysis
-        response_text = ""
-        async for event in runner.run_async(
-            user_id="cli_user",
-            session_id=session.id,
-            new_message=content,
-        ):
-            if event.content.parts and event.content.parts[0].text:
-                response_text += event.content.parts[0].text
+        for attempt in range(QUOTA_RETRIES + 1):
+            if not replay.is_replaying():
+                await scheduler.acquire(estimated_tokens, requests=len(prompts))
+            # A fresh session per attempt, so a retry does not send the essay
+            # on top of the failed attempt's history
+            session = await runner.session_service.create_session(
+                app_name="essay_analyzer_cli",
+                user_id="cli_user"
+            )
+            try:
+                stream = await collect_analysis(
+                    runner.run_async(
+                        user_id="cli_user",
+                        session_id=session.id,
+                        new_message=content,
+                    ),
+                    coordinator=coordinator.name,
+                    output_keys=sub_agent_output_keys(coordinator),
+                )
+                response_text = stream.text
+                break
+            except Exception as e:
+                if not is_quota_error(e) or attempt == QUOTA_RETRIES:
+                    raise
+                await scheduler.penalize_async(QUOTA_BACKOFF_SECONDS * (attempt + 1))
         
         # Parse the response
         try:
@@ -94,7 +129,7 @@ async def analyze_essay_cli(essay_text: str) -> dict:
             result = json.loads(cleaned_response)
             
             # Validate required fields
-            required_fields = ["grammarFeedback", "structureFeedback", "contentFeedback", "spellingFeedback", "overallScore"]
+            required_fields = [f"{dimension}Feedback" for dimension in dimensions]
             for field in required_fields:
                 if field not in result:
                     result[field] = f"No {field.replace('Feedback', '').lower()} feedback available"
@@ -103,6 +138,16 @@ async def analyze_essay_cli(essay_text: str) -> dict:
             if not isinstance(result.get("overallScore"), (int, float)):
                 result["overallScore"] = 50
             
+            # Score a partial analysis from the dimensions that ran
+            rating_fields = [f"{dimension}Rating" for dimension in dimensions]
+            if len(dimensions) < len(DIMENSIONS) and all(
+                isinstance(result.get(field), (int, float)) for field in rating_fields
+            ):
+                result["overallScore"] = overall_score_from_ratings(result, dimensions)
+            
+            result["dimensions"] = list(dimensions)
+            result["output_budget"] = coordinator_preset.name
+            
             return result
             
         except json.JSONDecodeError:
@@ -128,13 +173,29 @@ async def analyze_essay_cli(essay_text: str) -> dict:
 
 async def main():
     """Main CLI function."""
-    if len(sys.argv) != 2:
-        print(json.dumps({
-            "error": "Usage: python adk_essay_cli.py <essay_text>"
-        }), file=sys.stderr)
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Analyze an essay with the ADK agents.")
+    parser.add_argument("essay_text", help="The essay text to analyze")
+    parser.add_argument(
+        "--dimensions",
+        help="Comma-separated subset of grammar,structure,content,spelling (default: all)",
+    )
+    parser.add_argument(
+        "--budget",
+        choices=sorted(presets()),
+        help="Output budget preset (default: OUTPUT_BUDGET_PRESET or standard)",
+    )
+    fixtures = parser.add_mutually_exclusive_group()
+    fixtures.add_argument("--record", metavar="PATH", help="Record model calls to a fixture file")
+    fixtures.add_argument("--replay", metavar="PATH", help="Answer model calls from a fixture file")
+    parser.add_argument(
+        "--replay-speed",
+        type=float,
+        default=0.0,
+        help="Replay at this multiple of recorded latency (0 = instant)",
+    )
+    args = parser.parse_args()
     
-    essay_text = sys.argv[1]
+    essay_text = args.essay_text
     
     if not essay_text.strip():
         print(json.dumps({
@@ -142,8 +203,29 @@ async def main():
         }), file=sys.stderr)
         sys.exit(1)
     
+    dimensions = None
+    if args.dimensions:
+        try:
+            dimensions = normalize_dimensions(args.dimensions.split(","))
+        except ValueError as e:
+            print(json.dumps({"error": str(e)}), file=sys.stderr)
+            sys.exit(1)
+    
+    try:
+        if args.record:
+            replay.install(replay.RECORD, args.record)
+        elif args.replay:
+            replay.install(replay.REPLAY, args.replay, args.replay_speed)
+        else:
+            replay.install_from_env()
+        tracing.configure_from_env()
+    except (OSError, ValueError) as e:
+        print(json.dumps({"error": str(e)}), file=sys.stderr)
+        sys.exit(1)
+    
     # Analyze the essay
-    result = await analyze_essay_cli(essay_text)
+    with tracing.span("cli.analyze", **{"essay.chars": len(essay_text)}):
+        result = await analyze_essay_cli(essay_text, dimensions, args.budget)
     
     # Output the result as JSON
     print(json.dumps(result, indent=2))
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+ADK Essay Analyzer Router
+
+A thin front for several ADK API server replicas. Each request is forwarded
+to the replica that owns its routing key on a consistent hash ring (the essay
+fingerprint, or the user id), so repeats of an essay or a user's requests
+find that replica's caches and agent graphs warm. Unreachable, draining and
+warming replicas are skipped in ring order.
+"""
+
+import asyncio
+import hmac
+import logging
+import os
+import uuid
+from typing import Optional
+
+import orjson
+import uvicorn
+from dotenv import load_dotenv
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, Response
+
+from essay_analyzer.metrics import metrics
+from essay_analyzer.result_cache import essay_fingerprint
+from essay_analyzer.routing import DEFAULT_VNODES, HOP_BY_HOP_HEADERS, Forwarded, ReplicaRouter
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Replica base URLs, comma separated
+ROUTER_REPLICAS = [r.strip() for r in os.getenv("ROUTER_REPLICAS", "http://localhost:8000").split(",") if r.strip()]
+# What requests are hashed on: essay (fingerprint of the text) or user (user_id)
+ROUTER_KEY = os.getenv("ROUTER_KEY", "essay")
+ROUTER_VNODES = int(os.getenv("ROUTER_VNODES", str(DEFAULT_VNODES)))
+ROUTER_HEALTH_INTERVAL_SECONDS = float(os.getenv("ROUTER_HEALTH_INTERVAL_SECONDS", "5"))
+ROUTER_DOWN_SECONDS = float(os.getenv("ROUTER_DOWN_SECONDS", "10"))
+ROUTER_TIMEOUT_SECONDS = float(os.getenv("ROUTER_TIMEOUT_SECONDS", "150"))
+# Bearer token for changing the replica set at runtime (empty disables it)
+ROUTER_ADMIN_TOKEN = os.getenv("ROUTER_ADMIN_TOKEN", "")
+
+if ROUTER_KEY not in ("essay", "user"):
+    raise ValueError(f"ROUTER_KEY must be essay or user, not {ROUTER_KEY}")
+
+app = FastAPI(
+    title="ADK Essay Analyzer Router",
+    description="Consistent-hash affinity routing across ADK API server replicas",
+    version="1.0.0",
+)
+
+router: Optional[ReplicaRouter] = None
+health_task: Optional[asyncio.Task] = None
+
+async def health_loop():
+    """Probe the replicas periodically so failed ones rejoin once healthy."""
+    while True:
+        try:
+            await router.check_health()
+        except Exception as e:
+            logger.warning(f"Replica health check failed: {e}")
+        await asyncio.sleep(ROUTER_HEALTH_INTERVAL_SECONDS)
+
+@app.on_event("startup")
+async def startup_event():
+    """Build the hash ring and start health checks."""
+    global router, health_task
+    router = ReplicaRouter(
+        ROUTER_REPLICAS,
+        vnodes=ROUTER_VNODES,
+        down_seconds=ROUTER_DOWN_SECONDS,
+        timeout=ROUTER_TIMEOUT_SECONDS,
+    )
+    health_task = asyncio.ensure_future(health_loop())
+    logger.info(f"Routing by {ROUTER_KEY} across {len(ROUTER_REPLICAS)} replicas: {', '.join(ROUTER_REPLICAS)}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop health checks and close pooled replica connections."""
+    if health_task:
+        health_task.cancel()
+    if router:
+        await router.close()
+
+def client_key(request: Request) -> str:
+    """
+    Routing key of a request that names no user.
+
+    Anonymous callers are spread over the replicas by client address (taken
+    from X-Forwarded-For for proxies in FORWARDED_ALLOW_IPS), so one client
+    keeps its replica. Without an address the request id is used, or
+    a random key.
+    """
+    if request.client and request.client.host:
+        return f"client:{request.client.host}"
+    return f"request:{request.headers.get('x-request-id') or uuid.uuid4().hex}"
+
+def routing_key(body: bytes, user_id: Optional[str], anonymous: str = "anonymous") -> str:
+    """
+    Routing key of an analysis request.
+
+    Args:
+        body: JSON request body, if any
+        user_id: user_id query parameter, if any
+        anonymous: Key when the request names no user
+
+    Returns:
+        The essay fingerprint or user id, whichever ROUTER_KEY selects;
+        the user id if the body has no essay text
+    """
+    payload = {}
+    if body:
+        try:
+            payload = orjson.loads(body)
+        except orjson.JSONDecodeError:
+            pass
+    if not isinstance(payload, dict):
+        payload = {}
+    text = payload.get("text")
+    if ROUTER_KEY == "essay" and isinstance(text, str):
+        return essay_fingerprint(text)
+    return str(payload.get("user_id") or user_id or anonymous)
+
+async def forward(key: str, request: Request, body: bytes) -> Response:
+    """Forward a request to the replica owning key and relay its response."""
+    headers = {
+        name: value for name, value in request.headers.items()
+        if name.lower() not in HOP_BY_HOP_HEADERS
+    }
+    try:
+        forwarded = await router.forward(
+            key,
+            request.method,
+            request.url.path,
+            content=body,
+            headers=headers,
+            params=request.query_params,
+        )
+    except Exception as e:
+        logger.error(f"No replica reachable for {request.url.path}: {e}")
+        raise HTTPException(status_code=502, detail="No analyzer replica reachable")
+    return relay(forwarded)
+
+def relay(forwarded: Forwarded) -> Response:
+    """Client response for a replica's response, body passed through as sent."""
+    headers = dict(forwarded.headers)
+    headers["X-Replica"] = forwarded.replica
+    return Response(content=forwarded.body, status_code=forwarded.status_code, headers=headers)
+
+@app.get("/health")
+async def health_check(response: Response):
+    """Router health: ready while at least one replica is up."""
+    replicas = {replica: router.is_up(replica) for replica in router.replicas}
+    if not any(replicas.values()):
+        response.status_code = 503
+    return {
+        "status": "healthy" if any(replicas.values()) else "unavailable",
+        "service": "adk-essay-router",
+        "key": ROUTER_KEY,
+        "replicas": replicas,
+    }
+
+@app.get("/router/metrics")
+async def get_router_metrics():
+    """Router counters: owner hits, failovers and replica failures."""
+    return metrics.snapshot()
+
+def require_admin(authorization: Optional[str] = Header(None)) -> None:
+    """Allow only requests bearing ROUTER_ADMIN_TOKEN."""
+    if not ROUTER_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Replica changes are disabled (ROUTER_ADMIN_TOKEN is not set)")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), ROUTER_ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token", headers={"WWW-Authenticate": "Bearer"})
+
+@app.put("/router/replicas", dependencies=[Depends(require_admin)])
+async def add_replica(url: str):
+    """Add a replica to the ring; only keys on its arcs move to it."""
+    router.add_replica(url)
+    return {"replicas": router.replicas}
+
+@app.delete("/router/replicas", dependencies=[Depends(require_admin)])
+async def remove_replica(url: str):
+    """Remove a replica from the ring; its keys move to the next replica clockwise."""
+    router.remove_replica(url)
+    return {"replicas": router.replicas}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, request: Request):
+    """
+    Find a job on the replica that queued it.
+
+    Jobs live in their replica's queue, so replicas are asked in ring order
+    (of the job id) until one knows the job.
+    """
+    headers = {
+        name: value for name, value in request.headers.items()
+        if name.lower() not in HOP_BY_HOP_HEADERS
+    }
+    last: Optional[Forwarded] = None
+    for replica in router.candidates(job_id):
+        try:
+            forwarded = await router.forward_to(replica, "GET", request.url.path, headers=headers)
+        except Exception as e:
+            logger.warning(f"Replica {replica} unreachable for job lookup: {e}")
+            continue
+        if forwarded.status_code != 404:
+            return relay(forwarded)
+        last = forwarded
+    if last is None:
+        raise HTTPException(status_code=502, detail="No analyzer replica reachable")
+    return relay(last)
+
+@app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
+async def proxy(path: str, request: Request):
+    """
+    Forward everything else by routing key.
+
+    JSON analyses (/analyze, /jobs) hash on the essay or user; uploads and
+    other calls hash on the user_id query parameter. Requests without a user
+    hash on their client, not on one shared key.
+    """
+    body = await request.body()
+    user_id = request.query_params.get("user_id")
+    if request.headers.get("content-type", "").startswith("application/json"):
+        key = routing_key(body, user_id, anonymous=client_key(request))
+    else:
+        key = user_id or client_key(request)
+    return await forward(key, request, body)
+
+if __name__ == "__main__":
+    port = int(os.getenv("PORT", 8080))
+    host = os.getenv("HOST", "0.0.0.0")
+
+    logger.info(f"Starting router on {host}:{port}")
+    uvicorn.run(
+        "adk_router:app",
+        host=host,
+        port=port,
+        log_level="info",
+    )
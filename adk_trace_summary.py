@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+ADK Essay Analyzer Trace Summary
+
+Summarizes an OTLP/JSON trace file written with TRACE_EXPORT_PATH: the
+slowest stages across all traces and the critical path of the slowest traces.
+
+    python adk_trace_summary.py traces.jsonl --top 5
+"""
+
+import argparse
+import json
+import statistics
+import sys
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+
+def _attribute_value(value: Dict[str, Any]) -> Any:
+    if "intValue" in value:
+        return int(value["intValue"])
+    if "doubleValue" in value:
+        return value["doubleValue"]
+    if "boolValue" in value:
+        return value["boolValue"]
+    if "arrayValue" in value:
+        return [_attribute_value(v) for v in value["arrayValue"].get("values", [])]
+    return value.get("stringValue")
+
+
+def load_spans(path: str) -> List[Dict[str, Any]]:
+    """Read every span from an OTLP/JSON lines file."""
+    spans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            for resource_spans in request.get("resourceSpans", []):
+                for scope_spans in resource_spans.get("scopeSpans", []):
+                    for span in scope_spans.get("spans", []):
+                        start = int(span["startTimeUnixNano"])
+                        end = int(span["endTimeUnixNano"])
+                        spans.append({
+                            "trace_id": span["traceId"],
+                            "span_id": span["spanId"],
+                            "parent_id": span.get("parentSpanId"),
+                            "name": span["name"],
+                            "start": start,
+                            "end": end,
+                            "duration": (end - start) / 1e9,
+                            "error": span.get("status", {}).get("code") == 2,
+                            "attributes": {
+                                a["key"]: _attribute_value(a["value"])
+                                for a in span.get("attributes", [])
+                            },
+                        })
+    return spans
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _self_time(span: Dict[str, Any], children: List[Dict[str, Any]]) -> float:
+    """Span duration not covered by any child span."""
+    covered = 0
+    cursor = span["start"]
+    for child in sorted(children, key=lambda c: c["start"]):
+        start = max(child["start"], cursor)
+        end = min(child["end"], span["end"])
+        if end > start:
+            covered += end - start
+            cursor = end
+    return max(0, span["end"] - span["start"] - covered) / 1e9
+
+
+def stage_stats(spans: List[Dict[str, Any]], children: Dict[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Aggregate duration and self time per span name, slowest total first."""
+    by_name: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for span in spans:
+        by_name[span["name"]].append(span)
+    rows = []
+    for name, group in by_name.items():
+        durations = [s["duration"] for s in group]
+        rows.append({
+            "stage": name,
+            "count": len(group),
+            "errors": sum(1 for s in group if s["error"]),
+            "total_s": sum(durations),
+            "self_s": sum(_self_time(s, children.get(s["span_id"], [])) for s in group),
+            "mean_s": statistics.fmean(durations),
+            "p95_s": _percentile(durations, 0.95),
+            "max_s": max(durations),
+        })
+    return sorted(rows, key=lambda r: r["total_s"], reverse=True)
+
+
+def critical_path(root: Dict[str, Any], children: Dict[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Follow, from the root, the child that finishes last at each level."""
+    path = [root]
+    node: Optional[Dict[str, Any]] = root
+    while node is not None:
+        kids = children.get(node["span_id"])
+        node = max(kids, key=lambda c: c["end"]) if kids else None
+        if node is not None:
+            path.append(node)
+    return path
+
+
+def summarize(spans: List[Dict[str, Any]], top: int) -> Dict[str, Any]:
+    """Build the stage table and critical paths of the slowest traces."""
+    children: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for span in spans:
+        if span["parent_id"]:
+            children[span["parent_id"]].append(span)
+    roots = sorted(
+        (s for s in spans if not s["parent_id"]),
+        key=lambda s: s["duration"],
+        reverse=True,
+    )
+    slowest = []
+    for root in roots[:top]:
+        slowest.append({
+            "trace_id": root["trace_id"],
+            "name": root["name"],
+            "duration_s": root["duration"],
+            "critical_path": [
+                {
+                    "stage": s["name"],
+                    "duration_s": s["duration"],
+                    "self_s": _self_time(s, children.get(s["span_id"], [])),
+                }
+                for s in critical_path(root, children)
+            ],
+        })
+    return {
+        "traces": len(roots),
+        "spans": len(spans),
+        "stages": stage_stats(spans, children),
+        "slowest_traces": slowest,
+    }
+
+
+def print_summary(summary: Dict[str, Any]) -> None:
+    """Print the summary as text tables."""
+    print(f"{summary['traces']} traces, {summary['spans']} spans\n")
+    print(f"{'stage':<40} {'count':>6} {'err':>4} {'total_s':>9} {'self_s':>9} {'mean_s':>8} {'p95_s':>8} {'max_s':>8}")
+    for row in summary["stages"]:
+        print(
+            f"{row['stage'][:40]:<40} {row['count']:>6} {row['errors']:>4} {row['total_s']:>9.3f} "
+            f"{row['self_s']:>9.3f} {row['mean_s']:>8.3f} {row['p95_s']:>8.3f} {row['max_s']:>8.3f}"
+        )
+    for trace in summary["slowest_traces"]:
+        print(f"\nTrace {trace['trace_id']} ({trace['name']}): {trace['duration_s']:.3f}s critical path")
+        for depth, step in enumerate(trace["critical_path"]):
+            print(f"  {'  ' * depth}{step['stage']}  {step['duration_s']:.3f}s (self {step['self_s']:.3f}s)")
+
+
+def main():
+    """Main function for command line usage."""
+    parser = argparse.ArgumentParser(description="Summarize an OTLP/JSON trace file.")
+    parser.add_argument("trace_file", help="File written via TRACE_EXPORT_PATH")
+    parser.add_argument("--top", type=int, default=3, help="Slowest traces to show")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args()
+
+    try:
+        spans = load_spans(args.trace_file)
+    except (OSError, ValueError, KeyError) as e:
+        print(json.dumps({"error": f"Could not read {args.trace_file}: {e}"}), file=sys.stderr)
+        sys.exit(1)
+
+    summary = summarize(spans, args.top)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_summary(summary)
+
+
+if __name__ == "__main__":
+    main()
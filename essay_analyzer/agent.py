@@ -14,30 +14,194 @@
 
 """Essay Analyzer: Comprehensive essay analysis and feedback using ADK agents."""
 
+from dataclasses import replace
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
 from google.adk.agents.llm_agent import LlmAgent
 from google.adk.tools.agent_tool import AgentTool
+from google.genai import types
 
-from . import prompt
-from .sub_agents.content_analyzer import content_analyzer_agent
-from .sub_agents.grammar_analyzer import grammar_analyzer_agent
-from .sub_agents.structure_analyzer import structure_analyzer_agent
+from . import callbacks, prompt
+from .batching import essay_block
+from .budgets import BudgetPreset, agent_config, get_preset
+from .models import shared_model
+from .sub_agents.content_analyzer import build_content_analyzer
+from .sub_agents.grammar_analyzer import build_grammar_analyzer
+from .sub_agents.structure_analyzer import build_structure_analyzer
 
 MODEL = "gemini-2.5-flash"
 
-essay_coordinator = LlmAgent(
-    name="essay_coordinator",
-    model=MODEL,
-    description=(
-        "Comprehensive essay analysis coordinator that provides detailed feedback "
-        "on grammar, structure, content, and spelling while delivering an overall score"
-    ),
-    instruction=prompt.ESSAY_ANALYZER_PROMPT,
-    output_key="essay_analysis",
-    tools=[
-        AgentTool(agent=grammar_analyzer_agent),
-        AgentTool(agent=structure_analyzer_agent),
-        AgentTool(agent=content_analyzer_agent),
-    ],
-)
+# Specialist sub-agent factory per dimension; spelling is handled by the coordinator.
+DIMENSION_AGENTS = {
+    "grammar": build_grammar_analyzer,
+    "structure": build_structure_analyzer,
+    "content": build_content_analyzer,
+}
+
+
+@lru_cache(maxsize=None)
+def build_dimension_agent(dimension: str, preset: BudgetPreset) -> LlmAgent:
+    """Build (once per preset) the sub-agent for a dimension."""
+    return DIMENSION_AGENTS[dimension](preset.for_agent(dimension))
+
+
+def analysis_message(essay_text: str) -> types.Content:
+    """
+    User message asking for an analysis of the essay.
+
+    The essay is a part of its own rather than interpolated into the request
+    sentence, so a large essay is not copied into a second string.
+    """
+    return types.Content(
+        role="user",
+        parts=[
+            types.Part.from_text(text="Please analyze this essay:"),
+            types.Part.from_text(text=essay_text),
+        ],
+    )
+
+
+def normalize_dimensions(dimensions: Optional[Iterable[str]] = None) -> Tuple[str, ...]:
+    """
+    Validate requested dimensions and put them in canonical order.
+
+    Args:
+        dimensions: Requested dimension names, or None for all of them
+
+    Returns:
+        Tuple of dimension names ordered as in prompt.DIMENSIONS
+    """
+    if dimensions is None:
+        return prompt.DIMENSIONS
+    requested = {d.strip().lower() for d in dimensions if d.strip()}
+    unknown = requested.difference(prompt.DIMENSIONS)
+    if unknown:
+        raise ValueError(
+            f"Unknown dimensions: {', '.join(sorted(unknown))}. "
+            f"Choose from: {', '.join(prompt.DIMENSIONS)}"
+        )
+    if not requested:
+        raise ValueError("At least one dimension must be requested")
+    return tuple(d for d in prompt.DIMENSIONS if d in requested)
+
+
+def overall_score_from_ratings(result: Dict[str, Any], dimensions: Tuple[str, ...]) -> int:
+    """Map the mean 1-5 rating of the analyzed dimensions onto the 0-100 scale."""
+    ratings = [result[f"{dimension}Rating"] for dimension in dimensions]
+    return int(round(sum(ratings) / len(ratings) * 20))
+
+
+@lru_cache(maxsize=None)
+def build_coordinator(
+    dimensions: Tuple[str, ...] = prompt.DIMENSIONS,
+    preset: Optional[BudgetPreset] = None,
+) -> LlmAgent:
+    """
+    Build (once per combination) a coordinator that runs only the given dimensions.
+
+    Args:
+        dimensions: Normalized dimension tuple from normalize_dimensions()
+        preset: Output budgets for the coordinator and its sub-agents; the
+            configured default preset if None
+
+    Returns:
+        Coordinator LlmAgent whose tools are the matching sub-agents
+    """
+    preset = preset or get_preset()
+    return LlmAgent(
+        name="essay_coordinator",
+        model=shared_model(MODEL),
+        description=(
+            "Comprehensive essay analysis coordinator that provides detailed feedback "
+            f"on {', '.join(dimensions)} while delivering an overall score"
+        ),
+        instruction=prompt.build_analyzer_prompt(dimensions, preset.coordinator.target_words),
+        output_key="essay_analysis",
+        tools=[
+            AgentTool(agent=build_dimension_agent(d, preset))
+            for d in dimensions
+            if d in DIMENSION_AGENTS
+        ],
+        before_model_callback=callbacks.before_model,
+        after_model_callback=callbacks.after_model,
+        before_agent_callback=callbacks.before_agent,
+        after_agent_callback=callbacks.after_agent,
+        before_tool_callback=callbacks.before_tool,
+        after_tool_callback=callbacks.after_tool,
+        **agent_config(preset.coordinator),
+    )
+
+
+@lru_cache(maxsize=None)
+def build_batch_analyzer(
+    dimensions: Tuple[str, ...],
+    preset: BudgetPreset,
+    max_essays: int,
+) -> LlmAgent:
+    """
+    Build (once per combination) an agent that analyzes several essays in one call.
+
+    It has no sub-agent tools, so a whole batch costs a single model call;
+    its output cap is the coordinator's scaled to the batch size.
+
+    Args:
+        dimensions: Normalized dimension tuple from normalize_dimensions()
+        preset: Output budgets; the coordinator's applies per essay
+        max_essays: Largest batch the agent is given
+
+    Returns:
+        LlmAgent answering with one analysis per essay
+    """
+    budget = replace(
+        preset.coordinator,
+        max_output_tokens=preset.coordinator.max_output_tokens * max_essays,
+    )
+    return LlmAgent(
+        name="essay_batch_analyzer",
+        model=shared_model(MODEL),
+        description=f"Analyzes batches of short essays on {', '.join(dimensions)}",
+        instruction=prompt.build_batch_prompt(dimensions, preset.coordinator.target_words),
+        output_key="essay_batch_analysis",
+        before_model_callback=callbacks.before_model,
+        after_model_callback=callbacks.after_model,
+        before_agent_callback=callbacks.before_agent,
+        after_agent_callback=callbacks.after_agent,
+        **agent_config(budget),
+    )
+
+
+def batch_message(essays: List[str]) -> types.Content:
+    """User message with numbered, fenced essays for the batch analyzer."""
+    parts = [types.Part.from_text(text=f"Please analyze each of these {len(essays)} essays:")]
+    for number, essay_text in enumerate(essays, 1):
+        parts.append(types.Part.from_text(text=essay_block(number, essay_text)))
+    return types.Content(role="user", parts=parts)
+
+
+essay_coordinator = build_coordinator()
 
 root_agent = essay_coordinator
+
+
+def upstream_call_prompts(agent: LlmAgent = root_agent) -> List[str]:
+    """
+    List the instruction sent with each upstream model call of one analysis.
+
+    The coordinator is called once to dispatch its sub-agent tools and once
+    more to synthesize their results; each sub-agent is called once. A
+    coordinator without tools answers in a single call.
+
+    Args:
+        agent: Coordinator agent of the graph being run
+
+    Returns:
+        One instruction string per expected model call
+    """
+    prompts = [agent.instruction]
+    if agent.tools:
+        prompts.append(agent.instruction)
+    for tool in agent.tools:
+        if isinstance(tool, AgentTool):
+            prompts.append(tool.agent.instruction)
+    return prompts
@@ -0,0 +1,223 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Vectorized cohort analytics over the results store.
+
+Every aggregate works on whole columns at once: descriptive statistics and
+percentiles, histograms, correlations between dimension ratings, trends
+bucketed by UTC calendar day/week/month and per-cohort or per-user breakdowns.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .results_store import NUMERIC_COLUMNS, RATING_COLUMNS, ResultsStore
+
+# Trend intervals: numpy datetime unit of the bucket and days per bucket.
+# Weeks are 7-day buckets from the epoch, months are calendar months.
+INTERVALS = {"day": ("D", 1), "week": ("D", 7), "month": ("M", 1)}
+PERCENTILES = (10, 25, 50, 75, 90, 95, 99)
+# Most histogram bins a report may ask for
+MAX_HISTOGRAM_BINS = 100
+
+# Fixed histogram ranges so dashboards stay comparable across queries
+_HISTOGRAM_RANGES: Dict[str, Tuple[float, float]] = {
+    "overallScore": (0, 100),
+    "flesch_reading_ease": (-50, 120),
+    "lexical_diversity": (0, 1),
+    **{name: (0.5, 5.5) for name in RATING_COLUMNS},
+}
+
+
+def _finite(values: np.ndarray) -> np.ndarray:
+    # Columns are float32; aggregate in float64
+    return values[np.isfinite(values)].astype(np.float64)
+
+
+def describe(values: np.ndarray) -> Dict[str, Any]:
+    """Count, mean, standard deviation, range and percentiles, ignoring NaN."""
+    values = _finite(values)
+    if not len(values):
+        return {"count": 0}
+    percentiles = np.percentile(values, PERCENTILES)
+    return {
+        "count": int(len(values)),
+        "mean": float(values.mean()),
+        "std": float(values.std()),
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "percentiles": {f"p{p}": float(v) for p, v in zip(PERCENTILES, percentiles)},
+    }
+
+
+def histogram(name: str, values: np.ndarray, bins: int = 10) -> Dict[str, List[float]]:
+    """Histogram of a column; ratings get one bin per star."""
+    values = _finite(values)
+    if name in RATING_COLUMNS:
+        bins = 5
+    value_range = _HISTOGRAM_RANGES.get(name)
+    if value_range is None:
+        value_range = (float(values.min()), float(values.max())) if len(values) else (0.0, 1.0)
+    counts, edges = np.histogram(values, bins=bins, range=value_range)
+    return {"edges": edges.tolist(), "counts": counts.tolist()}
+
+
+def rating_correlations(store: ResultsStore, rows: np.ndarray) -> Dict[str, Dict[str, Optional[float]]]:
+    """Pearson correlations between dimension ratings over rows that have all of them."""
+    matrix = np.vstack([store.column(name)[rows] for name in RATING_COLUMNS])
+    complete = matrix[:, np.all(np.isfinite(matrix), axis=0)]
+    result: Dict[str, Dict[str, Optional[float]]] = {}
+    if complete.shape[1] < 2:
+        return {a: {b: None for b in RATING_COLUMNS} for a in RATING_COLUMNS}
+    with np.errstate(invalid="ignore", divide="ignore"):
+        correlations = np.corrcoef(complete)
+    for i, a in enumerate(RATING_COLUMNS):
+        result[a] = {
+            b: None if np.isnan(correlations[i, j]) else float(correlations[i, j])
+            for j, b in enumerate(RATING_COLUMNS)
+        }
+    return result
+
+
+def _grouped_mean(
+    codes: np.ndarray,
+    values: np.ndarray,
+    groups: int,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Per-group count, mean and standard deviation via bincount, ignoring NaN."""
+    finite = np.isfinite(values)
+    codes, values = codes[finite], values[finite].astype(np.float64)
+    counts = np.bincount(codes, minlength=groups)
+    sums = np.bincount(codes, weights=values, minlength=groups)
+    squares = np.bincount(codes, weights=values * values, minlength=groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / counts
+        stds = np.sqrt(np.maximum(squares / counts - means * means, 0))
+    return counts, means, stds
+
+
+def trend(store: ResultsStore, rows: np.ndarray, metric: str, interval: str = "day") -> List[Dict[str, Any]]:
+    """
+    Mean of a metric per UTC day, week or calendar month, oldest first.
+
+    Each point's period is the date its bucket starts (YYYY-MM for months),
+    and period_start the same instant in epoch seconds.
+    """
+    if not len(rows):
+        return []
+    unit, size = INTERVALS[interval]
+    # Casting to a coarser datetime unit floors to the start of its day or month
+    seconds = np.floor(store.created_at[rows]).astype(np.int64).astype("datetime64[s]")
+    buckets = seconds.astype(f"datetime64[{unit}]").astype(np.int64) // size
+    first = int(buckets.min())
+    counts, means, stds = _grouped_mean(
+        buckets - first, store.column(metric)[rows], int(buckets.max()) - first + 1
+    )
+    starts = ((first + np.flatnonzero(counts)) * size).astype(f"datetime64[{unit}]")
+    return [
+        {
+            "period": period,
+            "period_start": float(start),
+            "count": int(counts[i]),
+            "mean": float(means[i]),
+            "std": float(stds[i]),
+        }
+        for i, period, start in zip(
+            np.flatnonzero(counts),
+            np.datetime_as_string(starts),
+            starts.astype("datetime64[s]").astype(np.int64),
+        )
+    ]
+
+
+def breakdown(store: ResultsStore, rows: np.ndarray, metric: str, by: str = "cohort") -> List[Dict[str, Any]]:
+    """Count, mean and standard deviation of a metric per cohort or per user."""
+    dictionary = store.cohorts if by == "cohort" else store.users
+    codes = (store.cohort_code if by == "cohort" else store.user_code)[rows]
+    counts, means, stds = _grouped_mean(codes, store.column(metric)[rows], len(dictionary.values))
+    return [
+        {by: dictionary.values[i], "count": int(counts[i]), "mean": float(means[i]), "std": float(stds[i])}
+        for i in np.flatnonzero(counts)
+    ]
+
+
+def cohort_report(
+    store: ResultsStore,
+    user_id: Optional[str] = None,
+    cohort: Optional[str] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    include_degraded: bool = False,
+    metrics: Sequence[str] = NUMERIC_COLUMNS,
+    trend_metric: str = "overallScore",
+    interval: str = "day",
+    group_by: Optional[str] = None,
+    bins: int = 10,
+) -> Dict[str, Any]:
+    """
+    Dashboard aggregates for the results matching the filters.
+
+    Args:
+        store: Results to aggregate
+        user_id, cohort, since, until, include_degraded: Row filters, see
+            ResultsStore.select
+        metrics: Columns to describe and histogram
+        trend_metric: Column whose mean is reported per interval
+        interval: "day", "week" or "month"
+        group_by: "cohort" or "user" to break trend_metric down per group
+        bins: Histogram bins for non-rating columns
+
+    Returns:
+        Dictionary of statistics, histograms, rating correlations and trends
+
+    Raises:
+        ValueError: On an unknown metric, interval or group, or a bin count
+            outside 1..MAX_HISTOGRAM_BINS
+    """
+    unknown = [m for m in (*metrics, trend_metric) if m not in NUMERIC_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown metric(s): {', '.join(unknown)}")
+    if interval not in INTERVALS:
+        raise ValueError(f"Unknown interval: {interval}")
+    if group_by not in (None, "cohort", "user"):
+        raise ValueError(f"Unknown group: {group_by}")
+    if not 1 <= bins <= MAX_HISTOGRAM_BINS:
+        raise ValueError(f"bins must be between 1 and {MAX_HISTOGRAM_BINS}")
+
+    store.refresh()
+    rows = store.select(user_id, cohort, since, until, include_degraded)
+    report: Dict[str, Any] = {
+        "count": int(len(rows)),
+        "statistics": {},
+        "histograms": {},
+        "rating_correlations": rating_correlations(store, rows),
+        "trend": {
+            "metric": trend_metric,
+            "interval": interval,
+            "points": trend(store, rows, trend_metric, interval),
+        },
+    }
+    for name in metrics:
+        values = store.column(name)[rows]
+        report["statistics"][name] = describe(values)
+        report["histograms"][name] = histogram(name, values, bins)
+    if group_by:
+        report["breakdown"] = {
+            "metric": trend_metric,
+            "by": group_by,
+            "groups": breakdown(store, rows, trend_metric, group_by),
+        }
+    return report
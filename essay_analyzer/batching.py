@@ -0,0 +1,231 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Micro-batching of short essays.
+
+Short essays pay the full fixed cost of an analysis (the coordinator prompt,
+the sub-agent instructions, one model call per agent) for very little text.
+The batcher holds short essays that share a batch key (the user, dimensions
+and output budget) for a brief window and analyzes them together in one
+model call, then hands each waiting request its own result. Essays whose
+part of the batch result is missing or invalid are analyzed again on their
+own. Only one user's essays share a prompt, so text in one essay that reads
+like instructions cannot change anyone else's results; each essay is also
+fenced in numbered tags it cannot close early.
+"""
+
+import asyncio
+import json
+import logging
+import re
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, List, Optional, Set, Tuple, TypeVar
+
+from .fair_queue import unmetered_context
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+Result = TypeVar("Result")
+Pending = Tuple[str, "asyncio.Future"]
+
+# Essay tags inside an essay's own text
+_ESSAY_TAG = re.compile(r"<(\s*/?\s*essay\b)", re.IGNORECASE)
+
+
+def essay_block(number: int, essay_text: str) -> str:
+    """
+    An essay fenced in numbered tags for a batch message.
+
+    Tags in the text itself are defused, so an essay cannot end its block
+    and pose as instructions or as another essay.
+    """
+    defused = _ESSAY_TAG.sub(r"&lt;\1", essay_text)
+    return f'<essay number="{number}">\n{defused}\n</essay>'
+
+
+def split_usage(tokens: int, essays: List[str]) -> List[int]:
+    """Divide a batch's tokens among its essays in proportion to their length."""
+    weights = [len(essay_text) + 1 for essay_text in essays]
+    total = sum(weights)
+    shares = [tokens * weight // total for weight in weights]
+    shares[-1] += tokens - sum(shares)
+    return shares
+
+
+def split_batch_response(response_text: str, count: int) -> List[Optional[Dict[str, Any]]]:
+    """
+    Split a batch analyzer response into one analysis per essay.
+
+    Args:
+        response_text: Raw response text of the batch analyzer
+        count: Number of essays in the batch
+
+    Returns:
+        The analysis of each essay in batch order; None where the response
+        has no usable entry for it
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * count
+    cleaned = response_text.strip()
+    if cleaned.startswith("```json"):
+        cleaned = cleaned[7:]
+    if cleaned.endswith("```"):
+        cleaned = cleaned[:-3]
+    try:
+        parsed = json.loads(cleaned.strip())
+    except json.JSONDecodeError as e:
+        logger.warning(f"Failed to parse batch response: {e}")
+        return results
+    entries = parsed.get("essays") if isinstance(parsed, dict) else parsed
+    if not isinstance(entries, list):
+        return results
+    for position, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            continue
+        # Trust the essay number over the position, but fall back to it
+        number = entry.pop("essay", position + 1)
+        if isinstance(number, int) and 1 <= number <= count and results[number - 1] is None:
+            results[number - 1] = entry
+    return results
+
+
+class MicroBatcher(Generic[Result]):
+    """Groups concurrent short essays per key and runs each group as one call."""
+
+    def __init__(
+        self,
+        run_batch: Callable[[Hashable, List[str]], Awaitable[List[Optional[Result]]]],
+        run_single: Callable[[Hashable, str], Awaitable[Result]],
+        max_batch_size: int = 8,
+        max_wait: float = 0.05,
+    ):
+        """
+        Args:
+            run_batch: Analyzes a batch; returns one result per essay, None
+                where the batch result failed validation
+            run_single: Analyzes one essay on its own
+            max_batch_size: A batch is sent as soon as it has this many essays
+            max_wait: Seconds the first essay of a batch waits for company
+        """
+        self.run_batch = run_batch
+        self.run_single = run_single
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._pending: Dict[Hashable, List[Pending]] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, key: Hashable, essay_text: str) -> Result:
+        """
+        Analyze an essay as part of the next batch for its key.
+
+        Cancelling the caller withdraws the essay if its batch has not been
+        sent yet.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._pending.setdefault(key, [])
+        batch.append((essay_text, future))
+        if len(batch) >= self.max_batch_size:
+            self._flush(key)
+        elif len(batch) == 1:
+            self._timers[key] = loop.call_later(self.max_wait, self._flush, key)
+        return await future
+
+    def _flush(self, key: Hashable) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        # Callers that gave up while waiting are dropped from the batch
+        batch = [item for item in self._pending.pop(key, []) if not item[1].done()]
+        if not batch:
+            return
+        if len(batch) == 1:
+            metrics.increment("batch_essays", path="single")
+            self._start(self._run_single(key, *batch[0]), [batch[0][1]])
+        else:
+            self._start(self._run_batch(key, batch), [future for _, future in batch])
+
+    def _start(self, coroutine: Awaitable[None], futures: List["asyncio.Future"]) -> None:
+        # The batch serves several requests, so its model calls are not
+        # counted against whichever request happened to start it
+        task = asyncio.get_running_loop().create_task(coroutine, context=unmetered_context())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+        def abandon(_: "asyncio.Future") -> None:
+            # Stop the model call once every caller waiting on it has gone
+            if all(future.cancelled() for future in futures):
+                task.cancel()
+
+        for future in futures:
+            future.add_done_callback(abandon)
+
+    async def _run_batch(self, key: Hashable, batch: List[Pending]) -> None:
+        try:
+            results = await self.run_batch(key, [essay_text for essay_text, _ in batch])
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            # An upstream failure is every caller's failure; each request's
+            # own retry and degradation handling takes it from here
+            metrics.increment("batch_runs", outcome="error")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        retry = []
+        for (essay_text, future), result in zip(batch, results):
+            if result is None:
+                retry.append((essay_text, future))
+            elif not future.done():
+                future.set_result(result)
+        metrics.increment("batch_runs", outcome="partial" if retry else "completed")
+        metrics.increment("batch_essays", len(batch) - len(retry), path="batched")
+        if retry:
+            logger.info(f"Batch of {len(batch)}: re-analyzing {len(retry)} essay(s) individually")
+            metrics.increment("batch_essays", len(retry), path="fallback")
+            for essay_text, future in retry:
+                self._start(self._run_single(key, essay_text, future), [future])
+
+    async def _run_single(self, key: Hashable, essay_text: str, future: "asyncio.Future") -> None:
+        if future.done():
+            return
+        try:
+            result = await self.run_single(key, essay_text)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(result)
+
+    async def close(self) -> None:
+        """Cancel batches still waiting or running."""
+        for key in list(self._pending):
+            timer = self._timers.pop(key, None)
+            if timer is not None:
+                timer.cancel()
+            for _, future in self._pending.pop(key):
+                future.cancel()
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,171 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Output-length budgets for the coordinator and the dimension sub-agents.
+
+Output tokens dominate analysis latency, so every agent gets a hard cap on
+generated tokens (max_output_tokens, which on Gemini 2.5 includes thinking
+tokens), a thinking budget and a target word count that is written into its
+instruction. Budgets are grouped into named presets (brief, standard, deep)
+that can be picked per request.
+"""
+
+import json
+import logging
+import os
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+from google.adk.planners import BuiltInPlanner
+from google.genai import types
+
+logger = logging.getLogger(__name__)
+
+AGENTS = ("coordinator", "grammar", "structure", "content")
+
+
+@dataclass(frozen=True)
+class OutputBudget:
+    """Generation limits for one agent."""
+
+    max_output_tokens: int
+    # For the coordinator this applies to each feedback field of its JSON
+    target_words: int
+    # None leaves thinking at the model default; 0 disables it
+    thinking_budget: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class BudgetPreset:
+    """Output budgets for the coordinator and each sub-agent."""
+
+    name: str
+    coordinator: OutputBudget
+    grammar: OutputBudget
+    structure: OutputBudget
+    content: OutputBudget
+
+    def for_agent(self, agent: str) -> OutputBudget:
+        return getattr(self, agent)
+
+    def total_output_tokens(self, dimensions) -> int:
+        """Upper bound on output tokens for one analysis of the given dimensions."""
+        sub_agents = [d for d in dimensions if d in AGENTS]
+        coordinator_calls = 2 if sub_agents else 1
+        return coordinator_calls * self.coordinator.max_output_tokens + sum(
+            self.for_agent(d).max_output_tokens for d in sub_agents
+        )
+
+
+# The grammar agent gets the smallest budget in every preset: the rule
+# pre-pass already lists the mechanical errors, so it only confirms them and
+# adds what the rules cannot see
+PRESETS: Dict[str, BudgetPreset] = {
+    "brief": BudgetPreset(
+        name="brief",
+        coordinator=OutputBudget(1024, 40, 0),
+        grammar=OutputBudget(384, 60, 0),
+        structure=OutputBudget(512, 80, 0),
+        content=OutputBudget(640, 100, 0),
+    ),
+    "standard": BudgetPreset(
+        name="standard",
+        coordinator=OutputBudget(3072, 100, 1024),
+        grammar=OutputBudget(1536, 200, 1024),
+        structure=OutputBudget(2048, 250, 1024),
+        content=OutputBudget(2560, 300, 1024),
+    ),
+    "deep": BudgetPreset(
+        name="deep",
+        coordinator=OutputBudget(8192, 250),
+        grammar=OutputBudget(4096, 400),
+        structure=OutputBudget(8192, 600),
+        content=OutputBudget(8192, 700),
+    ),
+}
+
+DEFAULT_PRESET = "standard"
+
+
+def load_overrides(config: str) -> Dict[str, BudgetPreset]:
+    """
+    Apply a JSON override to the built-in presets.
+
+    Args:
+        config: JSON like {"brief": {"content": {"max_output_tokens": 800}}};
+            unknown presets are added as copies of standard
+
+    Returns:
+        Mapping of preset name to BudgetPreset
+    """
+    presets = dict(PRESETS)
+    for name, agents in json.loads(config).items():
+        preset = presets.get(name, replace(PRESETS[DEFAULT_PRESET], name=name))
+        for agent, fields in agents.items():
+            if agent not in AGENTS:
+                raise ValueError(f"Unknown agent in budget preset {name}: {agent}")
+            preset = replace(preset, **{agent: replace(preset.for_agent(agent), **fields)})
+        presets[name] = preset
+    return presets
+
+
+@lru_cache(maxsize=None)
+def presets() -> Dict[str, BudgetPreset]:
+    """Presets configured from the environment (OUTPUT_BUDGETS JSON overrides)."""
+    config = os.getenv("OUTPUT_BUDGETS")
+    if not config:
+        return PRESETS
+    return load_overrides(config)
+
+
+def default_preset_name() -> str:
+    """Preset used when a request does not pick one (OUTPUT_BUDGET_PRESET)."""
+    return os.getenv("OUTPUT_BUDGET_PRESET", DEFAULT_PRESET)
+
+
+def get_preset(name: Optional[str] = None) -> BudgetPreset:
+    """
+    Look up a preset by name.
+
+    Raises:
+        ValueError: If the preset does not exist
+    """
+    name = name or default_preset_name()
+    try:
+        return presets()[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown output budget: {name}. Choose from: {', '.join(presets())}"
+        ) from None
+
+
+def length_instruction(budget: OutputBudget) -> str:
+    """Instruction line asking a sub-agent to stay within its word target."""
+    return f"\nKeep your response under {budget.target_words} words.\n"
+
+
+def agent_config(budget: OutputBudget) -> Dict[str, Any]:
+    """LlmAgent keyword arguments enforcing a budget's token and thinking limits."""
+    config: Dict[str, Any] = {
+        "generate_content_config": types.GenerateContentConfig(
+            max_output_tokens=budget.max_output_tokens
+        ),
+    }
+    if budget.thinking_budget is not None:
+        config["planner"] = BuiltInPlanner(
+            thinking_config=types.ThinkingConfig(thinking_budget=budget.thinking_budget)
+        )
+    return config
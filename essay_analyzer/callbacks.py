@@ -0,0 +1,148 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Callback hooks shared by every agent in the essay analyzer graph.
+
+Every LlmAgent is built with the model, agent and tool callbacks below, which
+dispatch to the hooks registered at runtime (fixture record/replay,
+tracing, ...).
+"""
+
+import inspect
+from typing import Any, Callable, Dict, List, Optional
+
+BeforeModelHook = Callable[[Any, Any], Any]
+AfterModelHook = Callable[[Any, Any], Any]
+AgentHook = Callable[[Any], Any]
+BeforeToolHook = Callable[[Any, Dict[str, Any], Any], Any]
+AfterToolHook = Callable[[Any, Dict[str, Any], Any, Any], Any]
+
+_before_model_hooks: List[BeforeModelHook] = []
+_after_model_hooks: List[AfterModelHook] = []
+_before_agent_hooks: List[AgentHook] = []
+_after_agent_hooks: List[AgentHook] = []
+_before_tool_hooks: List[BeforeToolHook] = []
+_after_tool_hooks: List[AfterToolHook] = []
+
+
+def register_model_hooks(
+    before: Optional[BeforeModelHook] = None,
+    after: Optional[AfterModelHook] = None,
+) -> None:
+    """
+    Register hooks called around every model call of every agent.
+
+    Args:
+        before: Called with (callback_context, llm_request); returning an
+            LlmResponse skips the model call and uses it instead
+        after: Called with (callback_context, llm_response); returning an
+            LlmResponse replaces the model's response
+    """
+    if before is not None and before not in _before_model_hooks:
+        _before_model_hooks.append(before)
+    if after is not None and after not in _after_model_hooks:
+        _after_model_hooks.append(after)
+
+
+def unregister_model_hooks(
+    before: Optional[BeforeModelHook] = None,
+    after: Optional[AfterModelHook] = None,
+) -> None:
+    """Remove previously registered hooks."""
+    if before in _before_model_hooks:
+        _before_model_hooks.remove(before)
+    if after in _after_model_hooks:
+        _after_model_hooks.remove(after)
+
+
+def register_agent_hooks(
+    before: Optional[AgentHook] = None,
+    after: Optional[AgentHook] = None,
+) -> None:
+    """Register observers called with the callback context around every agent run."""
+    if before is not None and before not in _before_agent_hooks:
+        _before_agent_hooks.append(before)
+    if after is not None and after not in _after_agent_hooks:
+        _after_agent_hooks.append(after)
+
+
+def register_tool_hooks(
+    before: Optional[BeforeToolHook] = None,
+    after: Optional[AfterToolHook] = None,
+) -> None:
+    """Register observers called around every tool (sub-agent) call."""
+    if before is not None and before not in _before_tool_hooks:
+        _before_tool_hooks.append(before)
+    if after is not None and after not in _after_tool_hooks:
+        _after_tool_hooks.append(after)
+
+
+async def _call(hook: Callable[..., Any], *args: Any) -> Any:
+    result = hook(*args)
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+async def before_model(callback_context: Any, llm_request: Any) -> Optional[Any]:
+    """
+    before_model_callback for all agents: first hook to answer wins.
+
+    ADK skips after_model_callback for answered calls, so the after hooks are
+    run here to keep observers balanced.
+    """
+    for hook in list(_before_model_hooks):
+        response = await _call(hook, callback_context, llm_request)
+        if response is not None:
+            return await after_model(callback_context, response) or response
+    return None
+
+
+async def after_model(callback_context: Any, llm_response: Any) -> Optional[Any]:
+    """after_model_callback for all agents: hooks may replace the response in turn."""
+    replaced = None
+    for hook in list(_after_model_hooks):
+        response = await _call(hook, callback_context, replaced or llm_response)
+        if response is not None:
+            replaced = response
+    return replaced
+
+
+async def before_agent(callback_context: Any) -> None:
+    """before_agent_callback for all agents; hooks only observe."""
+    for hook in list(_before_agent_hooks):
+        await _call(hook, callback_context)
+    return None
+
+
+async def after_agent(callback_context: Any) -> None:
+    """after_agent_callback for all agents; hooks only observe."""
+    for hook in list(_after_agent_hooks):
+        await _call(hook, callback_context)
+    return None
+
+
+async def before_tool(tool: Any, args: Dict[str, Any], tool_context: Any) -> None:
+    """before_tool_callback for the coordinator; hooks only observe."""
+    for hook in list(_before_tool_hooks):
+        await _call(hook, tool, args, tool_context)
+    return None
+
+
+async def after_tool(tool: Any, args: Dict[str, Any], tool_context: Any, tool_response: Any) -> None:
+    """after_tool_callback for the coordinator; hooks only observe."""
+    for hook in list(_after_tool_hooks):
+        await _call(hook, tool, args, tool_context, tool_response)
+    return None
@@ -0,0 +1,215 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Degradation controller for upstream model calls.
+
+A circuit breaker watches the error rate and tail latency of recent upstream
+analyses. When either crosses its threshold the breaker opens and new requests
+are answered by the local heuristic analyzer instead of waiting on Gemini.
+After a cooldown it half-opens and lets a few probe requests through; enough
+successful probes close it again, a failed probe reopens it.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, Optional, Tuple
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_STATE_GAUGE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised when upstream is skipped because the circuit breaker is open."""
+
+
+class UnparseableResponseError(ValueError):
+    """Raised when upstream answered with something that is not a usable analysis."""
+
+
+class CircuitBreaker:
+    """Sliding-window circuit breaker over upstream outcomes and latencies."""
+
+    def __init__(
+        self,
+        window: int = 20,
+        min_samples: int = 5,
+        error_rate_threshold: float = 0.5,
+        latency_threshold: float = 30.0,
+        cooldown: float = 30.0,
+        half_open_probes: int = 2,
+        clock=time.monotonic,
+    ):
+        """
+        Args:
+            window: Number of recent upstream outcomes considered
+            min_samples: Outcomes required before the breaker may trip
+            error_rate_threshold: Failure fraction that opens the breaker
+            latency_threshold: p95 latency in seconds that opens the breaker
+            cooldown: Seconds to stay open before probing
+            half_open_probes: Successful probes needed to close again
+        """
+        self.min_samples = min_samples
+        self.error_rate_threshold = error_rate_threshold
+        self.latency_threshold = latency_threshold
+        self.cooldown = cooldown
+        self.half_open_probes = half_open_probes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._outcomes: Deque[Tuple[bool, float]] = deque(maxlen=window)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self.last_trip_reason: Optional[str] = None
+        self._publish()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _publish(self) -> None:
+        metrics.set_gauge("upstream_circuit_state", _STATE_GAUGE[self._state])
+
+    def _transition(self, state: str, reason: Optional[str] = None) -> None:
+        if state == self._state:
+            return
+        logger.warning(
+            f"Upstream circuit {self._state} -> {state}{f' ({reason})' if reason else ''}"
+        )
+        self._state = state
+        metrics.increment("upstream_circuit_transitions", to=state)
+        if state == OPEN:
+            self._opened_at = self._clock()
+            self.last_trip_reason = reason
+        if state != HALF_OPEN:
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+        if state == CLOSED:
+            self._outcomes.clear()
+        self._publish()
+
+    def _maybe_half_open(self) -> None:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.cooldown:
+            self._transition(HALF_OPEN)
+
+    def allow_request(self) -> bool:
+        """
+        Whether the next request may call upstream.
+
+        In the half-open state at most half_open_probes requests are admitted
+        at a time; each admitted probe must be reported with record_success or
+        record_failure.
+        """
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+                self._probes_in_flight += 1
+                return True
+            return False
+
+    def record_success(self, latency: float) -> None:
+        """Report an upstream call that succeeded after latency seconds."""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_probes:
+                    self._transition(CLOSED)
+                return
+            self._outcomes.append((True, latency))
+            self._evaluate()
+
+    def record_failure(self, latency: float, reason: str = "error") -> None:
+        """Report an upstream call that failed or timed out."""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._transition(OPEN, f"probe failed: {reason}")
+                return
+            self._outcomes.append((False, latency))
+            self._evaluate()
+
+    def release(self) -> None:
+        """Return an admitted request that never reached upstream (e.g. it was cancelled)."""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def _evaluate(self) -> None:
+        if self._state != CLOSED or len(self._outcomes) < self.min_samples:
+            return
+        failures = sum(1 for ok, _ in self._outcomes if not ok)
+        error_rate = failures / len(self._outcomes)
+        if error_rate >= self.error_rate_threshold:
+            self._transition(OPEN, f"error rate {error_rate:.0%}")
+            return
+        p95 = _percentile((latency for _, latency in self._outcomes), 0.95)
+        if p95 >= self.latency_threshold:
+            self._transition(OPEN, f"p95 latency {p95:.1f}s")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current state and window statistics, for health reporting."""
+        with self._lock:
+            self._maybe_half_open()
+            samples = len(self._outcomes)
+            failures = sum(1 for ok, _ in self._outcomes if not ok)
+            return {
+                "state": self._state,
+                "samples": samples,
+                "error_rate": failures / samples if samples else 0.0,
+                "p95_latency_s": _percentile((l for _, l in self._outcomes), 0.95) if samples else 0.0,
+                "last_trip_reason": self.last_trip_reason,
+            }
+
+
+def _percentile(values: Iterable[float], fraction: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+_breaker: Optional[CircuitBreaker] = None
+
+
+def get_breaker() -> CircuitBreaker:
+    """
+    Process-wide upstream circuit breaker, configured from the environment:
+    CIRCUIT_WINDOW, CIRCUIT_MIN_SAMPLES, CIRCUIT_ERROR_RATE,
+    CIRCUIT_LATENCY_SECONDS, CIRCUIT_COOLDOWN_SECONDS and CIRCUIT_HALF_OPEN_PROBES.
+    """
+    global _breaker
+    if _breaker is None:
+        _breaker = CircuitBreaker(
+            window=int(os.getenv("CIRCUIT_WINDOW", "20")),
+            min_samples=int(os.getenv("CIRCUIT_MIN_SAMPLES", "5")),
+            error_rate_threshold=float(os.getenv("CIRCUIT_ERROR_RATE", "0.5")),
+            latency_threshold=float(os.getenv("CIRCUIT_LATENCY_SECONDS", "30")),
+            cooldown=float(os.getenv("CIRCUIT_COOLDOWN_SECONDS", "30")),
+            half_open_probes=int(os.getenv("CIRCUIT_HALF_OPEN_PROBES", "2")),
+        )
+    return _breaker
@@ -0,0 +1,182 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Shared consumer for ADK runner event streams.
+
+Collects only the coordinator's final response (all text parts, joined once),
+captures sub-agent output_key results from state deltas, stops as soon as the
+final JSON object is complete, and records per-event timing for profiling.
+"""
+
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncGenerator, Dict, Iterable, List
+
+from . import tracing
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class EventTiming:
+    """Timing of one event relative to the start of the run."""
+
+    index: int
+    author: str
+    kind: str
+    elapsed: float
+    delta: float
+
+
+@dataclass
+class AnalysisStream:
+    """Everything collected from one agent run."""
+
+    text: str = ""
+    sub_agent_outputs: Dict[str, Any] = field(default_factory=dict)
+    timings: List[EventTiming] = field(default_factory=list)
+    event_count: int = 0
+    json_complete: bool = False
+    total_seconds: float = 0.0
+
+
+class JsonObjectTracker:
+    """Incrementally detects when the first top-level JSON object is closed."""
+
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.complete = False
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str) -> bool:
+        """Consume more text; returns True once the object is complete."""
+        if self.complete:
+            return True
+        for char in chunk:
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                if self.started:
+                    self._in_string = True
+            elif char == "{":
+                self.depth += 1
+                self.started = True
+            elif char == "}" and self.started:
+                self.depth -= 1
+                if self.depth == 0:
+                    self.complete = True
+                    return True
+        return False
+
+
+def sub_agent_output_keys(agent: Any) -> List[str]:
+    """Output keys of the sub-agents an agent calls through AgentTool."""
+    keys = []
+    for tool in getattr(agent, "tools", []):
+        output_key = getattr(getattr(tool, "agent", None), "output_key", None)
+        if output_key:
+            keys.append(output_key)
+    return keys
+
+
+def _event_kind(event: Any) -> str:
+    if event.get_function_calls():
+        return "function_call"
+    if event.get_function_responses():
+        return "function_response"
+    if event.is_final_response():
+        return "final"
+    return "text"
+
+
+async def collect_analysis(
+    events: AsyncGenerator[Any, None],
+    coordinator: str,
+    output_keys: Iterable[str] = (),
+) -> AnalysisStream:
+    """
+    Consume a runner event stream and return the coordinator's final answer.
+
+    The generator is closed before returning, which also stops the run early
+    once the final JSON object has been received.
+
+    Args:
+        events: Async generator returned by runner.run_async
+        coordinator: Name of the agent whose final response is the answer
+        output_keys: State keys written by sub-agents to capture
+
+    Returns:
+        AnalysisStream with the final text, sub-agent outputs and timings
+    """
+    wanted = set(output_keys)
+    stream = AnalysisStream()
+    chunks: List[str] = []
+    tracker = JsonObjectTracker()
+    start = last = time.perf_counter()
+    try:
+        async for event in events:
+            now = time.perf_counter()
+            stream.timings.append(EventTiming(
+                index=stream.event_count,
+                author=event.author,
+                kind=_event_kind(event),
+                elapsed=now - start,
+                delta=now - last,
+            ))
+            tracing.add_event(
+                "adk.event",
+                author=event.author,
+                kind=stream.timings[-1].kind,
+                delta_seconds=stream.timings[-1].delta,
+            )
+            last = now
+            stream.event_count += 1
+
+            state_delta = event.actions.state_delta if event.actions else None
+            if state_delta and wanted:
+                for key in wanted.intersection(state_delta):
+                    stream.sub_agent_outputs[key] = state_delta[key]
+
+            if event.author != coordinator or not event.content or not event.content.parts:
+                continue
+            if event.partial or not event.is_final_response():
+                continue
+            for part in event.content.parts:
+                if part.text and not part.thought:
+                    chunks.append(part.text)
+                    tracker.feed(part.text)
+            if tracker.complete:
+                stream.json_complete = True
+                break
+    finally:
+        await events.aclose()
+
+    stream.text = "".join(chunks)
+    stream.total_seconds = time.perf_counter() - start
+    if logger.isEnabledFor(logging.DEBUG):
+        for timing in stream.timings:
+            logger.debug(
+                f"event {timing.index} {timing.author}/{timing.kind} "
+                f"+{timing.delta:.3f}s (t={timing.elapsed:.3f}s)"
+            )
+    return stream
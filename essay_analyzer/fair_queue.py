@@ -0,0 +1,571 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Per-tenant weighted fair queueing and daily token quotas.
+
+Analyses are admitted to a fixed number of runner slots. When the slots are
+busy, waiting requests are ordered by weighted fair queueing: each request
+gets a virtual finish tag of max(virtual time, the tenant's previous tag) plus
+its estimated tokens divided by the tenant's weight, and the smallest tag
+runs next. A tenant with a thousand queued essays therefore gets its weighted
+share of slots, not all of them. Each tenant also has a concurrency cap, and
+a daily token quota recorded in SQLite so it holds across processes and
+restarts. Admission charges the estimated tokens (checked against the quota
+in the same transaction); when the run finishes the charge is corrected to
+the tokens the model calls actually reported.
+
+A tenant is a user_id, or a named group of user ids from the configuration.
+"""
+
+import asyncio
+import contextvars
+import heapq
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Set, Tuple
+
+from . import callbacks
+from .metrics import metrics
+from .rate_limiter import RateLimitTimeout
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class TenantLimits:
+    """Scheduling weight, concurrency cap and daily token quota (0 = unlimited)."""
+
+    weight: float = 1.0
+    max_concurrency: int = 2
+    daily_token_quota: int = 0
+
+
+class QuotaExceeded(Exception):
+    """Raised when a request would exceed its tenant's daily token quota."""
+
+    def __init__(self, tenant: str, used: int, requested: int, limit: int, resets_at: float):
+        super().__init__(
+            f"Daily token quota exceeded for '{tenant}': {used} of {limit} tokens used, "
+            f"request needs about {requested}"
+        )
+        self.tenant = tenant
+        self.used = used
+        self.requested = requested
+        self.limit = limit
+        self.resets_at = resets_at
+
+    @property
+    def retry_after(self) -> float:
+        return max(0.0, self.resets_at - time.time())
+
+
+def _utc_day(now: Optional[float] = None) -> Tuple[str, float]:
+    """Current UTC date and the epoch time it ends."""
+    current = datetime.fromtimestamp(now if now is not None else time.time(), tz=timezone.utc)
+    midnight = datetime(current.year, current.month, current.day, tzinfo=timezone.utc)
+    return current.date().isoformat(), (midnight + timedelta(days=1)).timestamp()
+
+
+class UsageLedger:
+    """Per-tenant daily token and request counts in a shared SQLite file."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            db_path, timeout=10, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Charged on every admission; losing the last few charges in a power
+        # failure is acceptable, an fsync per request is not
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS usage ("
+            "tenant TEXT NOT NULL, day TEXT NOT NULL, "
+            "tokens INTEGER NOT NULL DEFAULT 0, requests INTEGER NOT NULL DEFAULT 0, "
+            "PRIMARY KEY (tenant, day))"
+        )
+
+    def used(self, tenant: str, day: str) -> Tuple[int, int]:
+        """(tokens, requests) charged to a tenant on a day."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT tokens, requests FROM usage WHERE tenant = ? AND day = ?", (tenant, day)
+            ).fetchone()
+        return (row[0], row[1]) if row else (0, 0)
+
+    def charge(self, tenant: str, day: str, tokens: int, limit: int = 0) -> Tuple[bool, int]:
+        """
+        Add one request and its tokens to a tenant's usage, within a quota.
+
+        The quota check and the charge are one transaction, so concurrent
+        processes cannot both pass the check and overrun the quota together.
+
+        Args:
+            tenant: Tenant to charge
+            day: UTC day of the charge
+            tokens: Tokens to add
+            limit: Daily token quota; 0 charges unconditionally
+
+        Returns:
+            (charged, tokens used before this charge)
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT tokens FROM usage WHERE tenant = ? AND day = ?", (tenant, day)
+                ).fetchone()
+                used = row[0] if row else 0
+                charged = not limit or used + tokens <= limit
+                if charged:
+                    self._conn.execute(
+                        "INSERT INTO usage (tenant, day, tokens, requests) VALUES (?, ?, ?, 1) "
+                        "ON CONFLICT (tenant, day) DO UPDATE SET "
+                        "tokens = tokens + excluded.tokens, requests = requests + 1",
+                        (tenant, day, tokens),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return charged, used
+
+    def adjust(self, tenant: str, day: str, tokens: int) -> None:
+        """Correct a tenant's token usage by tokens (negative to refund)."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE usage SET tokens = MAX(0, tokens + ?) WHERE tenant = ? AND day = ?",
+                (tokens, tenant, day),
+            )
+
+    def day_totals(self, day: str, limit: int = 100) -> List[Tuple[str, int, int]]:
+        """(tenant, tokens, requests) for a day, heaviest first."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT tenant, tokens, requests FROM usage WHERE day = ? "
+                "ORDER BY tokens DESC LIMIT ?",
+                (day, limit),
+            ).fetchall()
+
+
+@dataclass
+class _Waiter:
+    tag: float
+    cost: float
+    future: asyncio.Future
+
+
+@dataclass
+class _Tenant:
+    name: str
+    limits: TenantLimits
+    queue: Deque[_Waiter] = field(default_factory=deque)
+    last_tag: float = 0.0
+    in_flight: int = 0
+    in_heap: bool = False
+
+
+@dataclass(frozen=True)
+class Ticket:
+    """A granted runner slot; pass it back to FairScheduler.release."""
+
+    tenant: str
+    tokens: int
+    waited: float
+    # UTC day the tokens were charged to
+    day: str = ""
+
+
+class UsageMeter:
+    """Tokens reported by the model calls of one analysis."""
+
+    def __init__(self):
+        self.tokens = 0
+        self.calls = 0
+
+
+_usage_meter: contextvars.ContextVar[Optional[UsageMeter]] = contextvars.ContextVar(
+    "usage_meter", default=None
+)
+
+
+@contextmanager
+def metered_usage() -> Iterator[UsageMeter]:
+    """
+    Count the tokens of every model call made in this context.
+
+    Sub-agent calls run in the same task as the coordinator, so they are
+    counted too. Work handed to other tasks that do not inherit the context
+    (micro-batches) is not; it is credited with add_metered_usage.
+    """
+    meter = UsageMeter()
+    token = _usage_meter.set(meter)
+    try:
+        yield meter
+    finally:
+        _usage_meter.reset(token)
+
+
+def unmetered_context() -> contextvars.Context:
+    """A copy of the current context whose model calls are not metered."""
+    context = contextvars.copy_context()
+    context.run(_usage_meter.set, None)
+    return context
+
+
+def add_metered_usage(tokens: int, calls: int = 1) -> None:
+    """Count model usage of work run in another task against the current meter, if any."""
+    meter = _usage_meter.get()
+    if meter is not None:
+        meter.tokens += tokens
+        meter.calls += calls
+
+
+def _record_model_usage(callback_context: Any, llm_response: Any) -> None:
+    if _usage_meter.get() is None or getattr(llm_response, "partial", False):
+        return
+    usage = getattr(llm_response, "usage_metadata", None)
+    if usage is None:
+        return
+    total = getattr(usage, "total_token_count", None)
+    if total is None:
+        total = (usage.prompt_token_count or 0) + (usage.candidates_token_count or 0)
+    add_metered_usage(total)
+
+
+callbacks.register_model_hooks(after=_record_model_usage)
+
+
+class FairScheduler:
+    """Weighted fair admission of analyses to a fixed number of runner slots."""
+
+    def __init__(
+        self,
+        slots: int,
+        ledger: UsageLedger,
+        default_limits: TenantLimits = TenantLimits(),
+        tenants: Optional[Dict[str, TenantLimits]] = None,
+        members: Optional[Dict[str, str]] = None,
+    ):
+        """
+        Args:
+            slots: Analyses allowed to run at once in this process
+            ledger: Where daily usage is recorded
+            default_limits: Limits of tenants without their own entry
+            tenants: Limits per tenant name
+            members: user_id -> tenant name for users grouped into a tenant
+        """
+        self.slots = slots
+        self.ledger = ledger
+        self.default_limits = default_limits
+        self.tenant_limits = tenants or {}
+        self.members = members or {}
+        self._tenants: Dict[str, _Tenant] = {}
+        self._ready: List[Tuple[float, int, _Tenant]] = []
+        self._sequence = 0
+        self._in_flight = 0
+        self._waiting = 0
+        self._virtual_time = 0.0
+        # Ledger updates finishing in threads after their request returned
+        self._background: Set[asyncio.Task] = set()
+
+    def tenant_of(self, user_id: Optional[str]) -> str:
+        user_id = user_id or "anonymous"
+        return self.members.get(user_id, user_id)
+
+    def limits_of(self, name: str) -> TenantLimits:
+        return self.tenant_limits.get(name, self.default_limits)
+
+    def _tenant(self, name: str) -> _Tenant:
+        tenant = self._tenants.get(name)
+        if tenant is None:
+            tenant = self._tenants[name] = _Tenant(name, self.limits_of(name))
+        return tenant
+
+    def _evict_if_idle(self, tenant: _Tenant) -> None:
+        # Scheduling state is only needed while a tenant has work; dropping
+        # it when idle keeps one entry per active user, not per user ever
+        # seen. A returning tenant starts from the current virtual time,
+        # which its last tag cannot exceed once all its requests have run.
+        # A stale heap entry is skipped by _dispatch.
+        if tenant.in_flight or any(not w.future.done() for w in tenant.queue):
+            return
+        self._tenants.pop(tenant.name, None)
+
+    async def check_quota(self, user_id: Optional[str], tokens: int) -> None:
+        """
+        Raise QuotaExceeded if tokens more would exceed the daily quota.
+
+        The ledger may be shared with other processes and wait on their
+        locks, so it is read in a thread.
+
+        Raises:
+            QuotaExceeded: If the tenant's quota cannot cover the request
+        """
+        name = self.tenant_of(user_id)
+        limit = self.limits_of(name).daily_token_quota
+        if not limit:
+            return
+        day, resets_at = _utc_day()
+        used, _ = await asyncio.to_thread(self.ledger.used, name, day)
+        if used + tokens > limit:
+            metrics.increment("quota_rejections", tenant=name)
+            raise QuotaExceeded(name, used, tokens, limit, resets_at)
+
+    def _push_ready(self, tenant: _Tenant) -> None:
+        """Offer the tenant's head request for dispatch if it may run."""
+        while tenant.queue and tenant.queue[0].future.done():
+            tenant.queue.popleft()  # Timed out or cancelled while queued
+        if tenant.in_heap or not tenant.queue or tenant.in_flight >= tenant.limits.max_concurrency:
+            return
+        self._sequence += 1
+        heapq.heappush(self._ready, (tenant.queue[0].tag, self._sequence, tenant))
+        tenant.in_heap = True
+
+    def _dispatch(self) -> None:
+        while self._in_flight < self.slots and self._ready:
+            _, _, tenant = heapq.heappop(self._ready)
+            tenant.in_heap = False
+            if self._tenants.get(tenant.name) is not tenant:
+                continue  # Evicted while its entry was still queued
+            while tenant.queue and tenant.queue[0].future.done():
+                tenant.queue.popleft()
+            if not tenant.queue or tenant.in_flight >= tenant.limits.max_concurrency:
+                continue
+            waiter = tenant.queue.popleft()
+            tenant.in_flight += 1
+            self._in_flight += 1
+            self._waiting -= 1
+            self._virtual_time = max(self._virtual_time, waiter.tag)
+            waiter.future.set_result(None)
+            self._push_ready(tenant)
+
+    async def acquire(
+        self,
+        user_id: Optional[str],
+        tokens: int,
+        max_wait: Optional[float] = None,
+    ) -> Ticket:
+        """
+        Wait for a runner slot in fair order and charge the daily quota.
+
+        The quota is checked before queueing, to turn away hopeless requests
+        early, and again atomically with the charge once a slot is granted.
+
+        Args:
+            user_id: User the analysis is for
+            tokens: Estimated tokens of the analysis
+            max_wait: Give up after this many seconds in the queue
+
+        Returns:
+            Ticket to release when the analysis finishes
+
+        Raises:
+            QuotaExceeded: If the tenant's daily quota cannot cover the request
+            RateLimitTimeout: If no slot was granted within max_wait
+        """
+        await self.check_quota(user_id, tokens)
+        name = self.tenant_of(user_id)
+        tenant = self._tenant(name)
+        start = time.monotonic()
+
+        if (
+            self._in_flight < self.slots
+            and not self._ready
+            and not tenant.queue
+            and tenant.in_flight < tenant.limits.max_concurrency
+        ):
+            tenant.in_flight += 1
+            self._in_flight += 1
+        else:
+            tag = max(self._virtual_time, tenant.last_tag) + tokens / tenant.limits.weight
+            tenant.last_tag = tag
+            waiter = _Waiter(tag, tokens, asyncio.get_running_loop().create_future())
+            tenant.queue.append(waiter)
+            self._waiting += 1
+            self._push_ready(tenant)
+            self._dispatch()
+            metrics.set_gauge("fair_queue_waiting", self.waiting)
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), timeout=max_wait)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if waiter.future.done() and not waiter.future.cancelled():
+                    # Granted just as we gave up: hand the slot on
+                    self._finish(tenant)
+                else:
+                    waiter.future.cancel()
+                    self._waiting -= 1
+                    self._push_ready(tenant)
+                    self._evict_if_idle(tenant)
+                if isinstance(e, asyncio.TimeoutError):
+                    raise RateLimitTimeout(time.monotonic() - start, max_wait or 0.0)
+                raise
+            finally:
+                metrics.set_gauge("fair_queue_waiting", self.waiting)
+
+        day, resets_at = _utc_day()
+        limit = tenant.limits.daily_token_quota
+        charge = asyncio.ensure_future(asyncio.to_thread(self.ledger.charge, name, day, tokens, limit))
+        try:
+            charged, used = await asyncio.shield(charge)
+        except BaseException as e:
+            self._finish(tenant)
+            if isinstance(e, asyncio.CancelledError):
+                # The charge still completes in its thread; refund it
+                charge.add_done_callback(lambda done: self._refund(done, name, day, tokens))
+            raise
+        if not charged:
+            # Another request or process used up the quota while this one queued
+            self._finish(tenant)
+            metrics.increment("quota_rejections", tenant=name)
+            raise QuotaExceeded(name, used, tokens, limit, resets_at)
+        metrics.increment("tenant_tokens_charged", tokens, tenant=name)
+        return Ticket(name, tokens, time.monotonic() - start, day)
+
+    def _refund(self, charge: "asyncio.Future[Tuple[bool, int]]", name: str, day: str, tokens: int) -> None:
+        if charge.cancelled() or charge.exception() is not None or not charge.result()[0]:
+            return
+        self._in_background(self._adjust, name, day, -tokens)
+
+    def _in_background(self, function: Callable[..., None], *args: Any) -> None:
+        task = asyncio.ensure_future(asyncio.to_thread(function, *args))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def _adjust(self, name: str, day: str, correction: int) -> None:
+        try:
+            self.ledger.adjust(name, day, correction)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to reconcile usage of '{name}': {e}")
+            return
+        metrics.increment("tenant_tokens_reconciled", correction, tenant=name)
+
+    def _finish(self, tenant: _Tenant) -> None:
+        tenant.in_flight -= 1
+        self._in_flight -= 1
+        self._push_ready(tenant)
+        self._dispatch()
+        self._evict_if_idle(tenant)
+
+    def release(self, ticket: Ticket, actual_tokens: Optional[int] = None) -> None:
+        """
+        Return a slot and admit the next request in fair order.
+
+        Args:
+            ticket: The ticket from acquire
+            actual_tokens: Tokens the analysis actually used, if known; the
+                estimate charged at admission is corrected to it, in a
+                thread, without holding up the caller
+        """
+        self._finish(self._tenants[ticket.tenant])
+        if actual_tokens is not None and actual_tokens != ticket.tokens:
+            self._in_background(self._adjust, ticket.tenant, ticket.day, actual_tokens - ticket.tokens)
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    async def usage(self, user_id: Optional[str] = None, limit: int = 100) -> Dict[str, Any]:
+        """
+        Today's usage and live scheduling state, for one user's tenant or the heaviest tenants.
+
+        Args:
+            user_id: Report only this user's tenant
+            limit: Tenants listed when user_id is None
+
+        Returns:
+            Dictionary with the UTC day, its reset time and per-tenant usage
+        """
+        day, resets_at = _utc_day()
+        if user_id is not None:
+            name = self.tenant_of(user_id)
+            tokens, requests = await asyncio.to_thread(self.ledger.used, name, day)
+            totals = [(name, tokens, requests)]
+        else:
+            totals = await asyncio.to_thread(self.ledger.day_totals, day, limit)
+        tenants = []
+        for name, tokens, requests in totals:
+            tenant = self._tenants.get(name)
+            limits = tenant.limits if tenant else self.limits_of(name)
+            tenants.append({
+                "tenant": name,
+                "tokens": tokens,
+                "requests": requests,
+                "daily_token_quota": limits.daily_token_quota or None,
+                "remaining_tokens": (
+                    max(0, limits.daily_token_quota - tokens) if limits.daily_token_quota else None
+                ),
+                "weight": limits.weight,
+                "max_concurrency": limits.max_concurrency,
+                "in_flight": tenant.in_flight if tenant else 0,
+                "queued": sum(1 for w in tenant.queue if not w.future.done()) if tenant else 0,
+            })
+        return {"day": day, "resets_at": resets_at, "tenants": tenants}
+
+
+def load_config(raw: str) -> Tuple[Dict[str, TenantLimits], Dict[str, str]]:
+    """
+    Parse tenant configuration JSON.
+
+    Format: {"tenants": {"<name>": {"weight": 2, "max_concurrency": 4,
+    "daily_token_quota": 5000000, "users": ["alice", "bob"]}}}. A tenant
+    without "users" applies to the user_id equal to its name.
+
+    Returns:
+        (limits per tenant, user_id -> tenant)
+    """
+    config = json.loads(raw) if raw else {}
+    tenants: Dict[str, TenantLimits] = {}
+    members: Dict[str, str] = {}
+    for name, entry in config.get("tenants", {}).items():
+        users = entry.pop("users", [])
+        tenants[name] = TenantLimits(**entry)
+        for user_id in users:
+            members[user_id] = name
+    return tenants, members
+
+
+_fair_scheduler: Optional[FairScheduler] = None
+
+
+def get_fair_scheduler() -> FairScheduler:
+    """
+    Process-wide fair scheduler configured from the environment:
+    FAIR_QUEUE_SLOTS, USER_MAX_CONCURRENCY, USER_DAILY_TOKEN_QUOTA,
+    USAGE_DB_PATH and TENANT_CONFIG (JSON, see load_config).
+    """
+    global _fair_scheduler
+    if _fair_scheduler is None:
+        tenants, members = load_config(os.getenv("TENANT_CONFIG", ""))
+        _fair_scheduler = FairScheduler(
+            slots=int(os.getenv("FAIR_QUEUE_SLOTS", "8")),
+            ledger=UsageLedger(os.getenv("USAGE_DB_PATH", "essay_usage.sqlite3")),
+            default_limits=TenantLimits(
+                max_concurrency=int(os.getenv("USER_MAX_CONCURRENCY", "2")),
+                daily_token_quota=int(os.getenv("USER_DAILY_TOKEN_QUOTA", "0")),
+            ),
+            tenants=tenants,
+            members=members,
+        )
+    return _fair_scheduler
@@ -0,0 +1,520 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Deterministic grammar pre-pass.
+
+Finds mechanical issues (doubled words, "could of", its/it's, a/an, missing
+serial commas, wordy or redundant phrases, common misspellings, run-on
+length, unbalanced quotes) without a model call. All phrase rules are folded
+into one trie-shaped regex, and that is combined with the pattern rules into
+a single alternation, so the text is scanned once regardless of how many
+rules there are. After a match the scan resumes at its last word, so
+adjacent errors that share a word ("its a apple") are both found. The findings are handed to the grammar sub-agent, which can
+then spend its output on higher-level issues.
+"""
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+MECHANICS = "mechanics"
+USAGE = "usage"
+SPELLING = "spelling"
+STYLE = "style"
+PUNCTUATION = "punctuation"
+
+# Sentences longer than this (in words) are reported as possible run-ons
+RUN_ON_WORDS = 40
+
+
+@dataclass(frozen=True)
+class Finding:
+    """One rule match, located by character span in the checked text."""
+
+    rule: str
+    category: str
+    start: int
+    end: int
+    text: str
+    message: str
+    suggestion: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "rule": self.rule,
+            "category": self.category,
+            "start": self.start,
+            "end": self.end,
+            "text": self.text,
+            "message": self.message,
+            "suggestion": self.suggestion,
+        }
+
+
+# Phrase rules: lowercase phrase -> (category, suggestion)
+_USAGE_PHRASES = {
+    "could of": "could have", "would of": "would have", "should of": "should have",
+    "must of": "must have", "might of": "might have", "may of": "may have",
+    "could care less": "couldn't care less", "for all intensive purposes": "for all intents and purposes",
+    "irregardless": "regardless", "per say": "per se", "supposably": "supposedly",
+    "expresso": "espresso", "excape": "escape", "nucular": "nuclear", "heighth": "height",
+    "alot": "a lot", "allot of": "a lot of", "a while ago": None, "suppose to": "supposed to",
+    "use to": "used to", "one in the same": "one and the same", "case and point": "case in point",
+    "deep seeded": "deep-seated", "escape goat": "scapegoat", "nip it in the butt": "nip it in the bud",
+    "on accident": "by accident", "try and": "try to", "different than": "different from",
+    "less people": "fewer people", "less students": "fewer students", "less things": "fewer things",
+    "between you and i": "between you and me", "me and him": "he and I", "me and her": "she and I",
+    "its a": "it's a", "its an": "it's an", "its the": "it's the", "its not": "it's not",
+    "its been": "it's been", "its going": "it's going", "its important": "it's important",
+    "its clear": "it's clear", "its true": "it's true", "its hard": "it's hard",
+    "its easy": "it's easy", "its time": "it's time", "its very": "it's very",
+    "it's own": "its own", "it's purpose": "its purpose", "it's value": "its value",
+    "it's role": "its role", "it's impact": "its impact", "it's ability": "its ability",
+    "their is": "there is", "their are": "there are", "their was": "there was",
+    "their were": "there were", "there own": "their own", "they're own": "their own",
+    "your welcome": "you're welcome", "your right": "you're right", "your wrong": "you're wrong",
+    "your going": "you're going", "you're own": "your own", "whose going": "who's going",
+    "who's own": "whose own", "then ever": "than ever", "more then": "more than",
+    "less then": "less than", "better then": "better than", "rather then": "rather than",
+    "other then": "other than", "greater then": "greater than", "worse then": "worse than",
+    "effect change": None, "affect on": "effect on", "an affect": "an effect",
+    "the affect": "the effect", "loose weight": "lose weight", "lead to believe": "led to believe",
+    "peak my interest": "pique my interest", "peaked my interest": "piqued my interest",
+    "sneak peak": "sneak peek", "free reign": "free rein", "tow the line": "toe the line",
+    "baited breath": "bated breath", "hone in on": "home in on", "wreck havoc": "wreak havoc",
+    "statue of limitations": "statute of limitations", "mute point": "moot point",
+    "make due": "make do", "shoe in": "shoo-in", "waiting with baited": "waiting with bated",
+    "all of the sudden": "all of a sudden", "for awhile": "for a while", "in awhile": "in a while",
+    "anyways": "anyway", "nowheres": "nowhere", "everyday life": None, "thru": "through",
+    "alright": "all right", "orientate": "orient", "conversate": "converse",
+}
+
+_WORDY_PHRASES = {
+    "due to the fact that": "because", "in order to": "to", "at this point in time": "now",
+    "in spite of the fact that": "although", "for the purpose of": "to", "in the event that": "if",
+    "it is important to note that": None, "the fact that": None, "in light of the fact that": "because",
+    "at the present time": "now", "in the near future": "soon", "a large number of": "many",
+    "a majority of": "most", "has the ability to": "can", "is able to": "can",
+    "in close proximity to": "near", "with regard to": "about", "in regards to": "regarding",
+    "with reference to": "about", "on a daily basis": "daily", "on a regular basis": "regularly",
+    "prior to": "before", "subsequent to": "after", "until such time as": "until",
+    "in the process of": None, "by means of": "by", "in view of the fact that": "because",
+    "owing to the fact that": "because", "despite the fact that": "although",
+    "it should be noted that": None, "needless to say": None, "first and foremost": "first",
+    "each and every": "each", "in my opinion i think": "I think", "the reason why is because": "because",
+    "the reason is because": "the reason is that", "at all times": "always",
+    "in this day and age": "today", "for all of the": "for all the", "a number of": "several",
+    "in terms of": None, "the majority of": "most", "is indicative of": "indicates",
+    "make a decision": "decide", "come to a conclusion": "conclude", "give consideration to": "consider",
+    "take into consideration": "consider", "conduct an investigation": "investigate",
+    "have a tendency to": "tend to", "in a timely manner": "promptly", "as a means of": "to",
+}
+
+_REDUNDANT_PHRASES = {
+    "free gift": "gift", "end result": "result", "past history": "history",
+    "close proximity": "proximity", "advance planning": "planning", "basic fundamentals": "fundamentals",
+    "completely finished": "finished", "final outcome": "outcome", "future plans": "plans",
+    "unexpected surprise": "surprise", "added bonus": "bonus", "true fact": "fact",
+    "each individual": "each", "revert back": "revert", "return back": "return",
+    "repeat again": "repeat", "join together": "join", "merge together": "merge",
+    "combine together": "combine", "collaborate together": "collaborate", "mix together": "mix",
+    "reason why": "reason", "absolutely essential": "essential", "absolutely necessary": "necessary",
+    "completely eliminate": "eliminate", "very unique": "unique", "most unique": "unique",
+    "new innovation": "innovation", "past experience": "experience", "actual fact": "fact",
+    "general consensus": "consensus", "consensus of opinion": "consensus", "exact same": "same",
+    "still remains": "remains", "postpone until later": "postpone", "plan ahead": "plan",
+    "current trend": "trend", "brief summary": "summary", "sum total": "total",
+    "period of time": "period", "circle around": "circle", "ask the question": "ask",
+    "protest against": "protest", "shorter in length": "shorter", "small in size": "small",
+    "large in size": "large", "red in color": "red", "blue in color": "blue",
+    "over exaggerate": "exaggerate", "whether or not": "whether", "first began": "began",
+    "first started": "started", "new beginning": "beginning", "old adage": "adage",
+}
+
+_MISSPELLINGS = {
+    "teh": "the", "recieve": "receive", "recieved": "received", "definately": "definitely",
+    "definatly": "definitely", "seperate": "separate", "seperately": "separately",
+    "occured": "occurred", "occuring": "occurring", "occurence": "occurrence",
+    "untill": "until", "wich": "which", "becuase": "because", "beacuse": "because",
+    "thier": "their", "beleive": "believe", "beleif": "belief", "goverment": "government",
+    "enviroment": "environment", "arguement": "argument", "neccessary": "necessary",
+    "necesary": "necessary", "accomodate": "accommodate", "begining": "beginning",
+    "existance": "existence", "independant": "independent", "tommorow": "tomorrow",
+    "tomorow": "tomorrow", "wierd": "weird", "truely": "truly", "publically": "publicly",
+    "acheive": "achieve", "acheivement": "achievement", "concious": "conscious",
+    "foriegn": "foreign", "grammer": "grammar", "occassion": "occasion", "posession": "possession",
+    "realy": "really", "succesful": "successful", "sucessful": "successful", "suprise": "surprise",
+    "tounge": "tongue", "writting": "writing", "freind": "friend", "calender": "calendar",
+    "cemetary": "cemetery", "collegue": "colleague", "comming": "coming", "commited": "committed",
+    "comittee": "committee", "completly": "completely", "concensus": "consensus",
+    "dissapoint": "disappoint", "embarass": "embarrass", "enviornment": "environment",
+    "excercise": "exercise", "experiance": "experience", "familar": "familiar",
+    "finaly": "finally", "fourty": "forty", "garantee": "guarantee", "gaurd": "guard",
+    "happend": "happened", "harrass": "harass", "immediatly": "immediately",
+    "incidently": "incidentally", "interupt": "interrupt", "knowlege": "knowledge",
+    "liason": "liaison", "libary": "library", "lisence": "licence", "maintainance": "maintenance",
+    "millenium": "millennium", "mischievious": "mischievous", "misspell": None,
+    "noticable": "noticeable", "occurr": "occur", "persistant": "persistent",
+    "personel": "personnel", "posible": "possible", "prefered": "preferred",
+    "privelege": "privilege", "probaly": "probably", "pronounciation": "pronunciation",
+    "propoganda": "propaganda", "questionaire": "questionnaire", "recomend": "recommend",
+    "refered": "referred", "relevent": "relevant", "religous": "religious",
+    "remeber": "remember", "repetion": "repetition", "resistence": "resistance",
+    "responsability": "responsibility", "rythm": "rhythm", "sargent": "sergeant",
+    "shedule": "schedule", "similiar": "similar", "sincerly": "sincerely",
+    "speach": "speech", "strenght": "strength", "studing": "studying", "sucess": "success",
+    "supercede": "supersede", "temperture": "temperature", "threshhold": "threshold",
+    "tommorrow": "tomorrow", "tounament": "tournament", "twelth": "twelfth",
+    "tyranny": None, "underate": "underrate", "vaccum": "vacuum",
+    "visable": "visible", "wether": "whether", "wellfare": "welfare", "whereever": "wherever",
+    "withold": "withhold", "yeild": "yield", "youre": "you're", "dont": "don't",
+    "doesnt": "doesn't", "didnt": "didn't", "cant": "can't", "wont": "won't",
+    "isnt": "isn't", "arent": "aren't", "wasnt": "wasn't", "couldnt": "couldn't",
+    "shouldnt": "shouldn't", "wouldnt": "wouldn't", "thats": "that's", "theyre": "they're",
+    "accross": "across", "agressive": "aggressive", "apparant": "apparent", "aquire": "acquire",
+    "basicly": "basically", "buisness": "business", "catagory": "category",
+    "challange": "challenge", "changable": "changeable", "cheif": "chief",
+    "competition": None, "concieve": "conceive", "critisism": "criticism", "decieve": "deceive",
+    "desicion": "decision", "develope": "develop", "diffrent": "different",
+    "dilema": "dilemma", "disipline": "discipline", "ecstacy": "ecstasy", "equiptment": "equipment",
+    "explaination": "explanation", "fascinate": None, "febuary": "february", "gauge": None,
+    "greatful": "grateful", "heirarchy": "hierarchy",
+    "humourous": "humorous", "hygene": "hygiene", "ignorence": "ignorance",
+    "imediately": "immediately", "independance": "independence", "inteligence": "intelligence",
+    "intresting": "interesting", "jewelery": "jewellery", "judgement": None, "medeval": "medieval",
+    "mispell": "misspell", "neice": "niece", "ocasion": "occasion", "oppurtunity": "opportunity",
+    "paralel": "parallel", "parliment": "parliament", "percieve": "perceive",
+    "perseverence": "perseverance", "politican": "politician", "prefrence": "preference",
+    "reccomend": "recommend", "recieving": "receiving", "referance": "reference",
+    "relize": "realize", "restaraunt": "restaurant", "sacrafice": "sacrifice",
+    "secratary": "secretary", "sieze": "seize", "speciman": "specimen", "succede": "succeed",
+    "tendancy": "tendency", "therefor": "therefore", "thourough": "thorough",
+    "throughly": "thoroughly", "tommarow": "tomorrow", "truley": "truly", "usally": "usually",
+    "vegtable": "vegetable", "writen": "written",
+}
+
+
+def _phrase_table() -> Dict[str, Tuple[str, str, Optional[str]]]:
+    """Phrase -> (rule id, category, suggestion) for every phrase rule."""
+    table: Dict[str, Tuple[str, str, Optional[str]]] = {}
+    groups = (
+        ("misspelling", SPELLING, _MISSPELLINGS),
+        ("redundancy", STYLE, _REDUNDANT_PHRASES),
+        ("wordiness", STYLE, _WORDY_PHRASES),
+        ("usage", USAGE, _USAGE_PHRASES),
+    )
+    for rule, category, phrases in groups:
+        for phrase, suggestion in phrases.items():
+            # None marks entries deliberately disabled (correct spellings,
+            # phrases too ambiguous to flag)
+            if suggestion is not None or rule == "wordiness":
+                table[phrase] = (rule, category, suggestion)
+    return table
+
+
+def _trie_pattern(phrases: Iterable[str]) -> str:
+    """
+    Build a regex alternation shaped like a trie of the phrases.
+
+    Shared prefixes are factored out, so the regex engine follows a single
+    branch per character instead of retrying every phrase at each position.
+    Spaces inside phrases match any run of whitespace.
+    """
+    trie: Dict[str, dict] = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def render(node: Dict[str, dict]) -> str:
+        branches = []
+        optional = False
+        for char in sorted(node):
+            if char == "":
+                optional = True
+                continue
+            head = r"\s+" if char == " " else re.escape(char)
+            branches.append(head + render(node[char]))
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 and not optional else f"(?:{'|'.join(branches)})"
+        if optional:
+            body += "?"
+        return body
+
+    return render(trie)
+
+
+_A_AN_EXCEPTIONS = {
+    # "a" before a vowel letter with a consonant sound
+    "a": ("uni", "use", "usu", "uti", "eu", "one", "once", "ubiq", "uran", "eur", "ewe", "ufo", "ukr", "uto"),
+    # "an" before a consonant letter with a vowel sound
+    "an": ("hour", "honest", "honor", "honour", "heir", "herb", "fbi", "mba", "mri", "nba", "x-", "sat", "fda"),
+}
+
+# Starts whose sound is unambiguous despite the first letter, so the other
+# article is wrong before them: "an unicorn" and "a hour" are flagged. Kept
+# narrower than the exceptions above ("unimportant" takes "an", "herb" either)
+_A_AN_REQUIRED = {
+    "a": (
+        "unic", "uniq", "unif", "unio", "unit", "univ", "unil", "use", "usu", "uti", "uten",
+        "utop", "eu", "ewe", "ubiq", "uran", "ufo", "ukr", "ukul", "one-",
+    ),
+    "an": ("hour", "honest", "honor", "honour", "heir"),
+}
+_A_AN_REQUIRED_WORDS = {"a": ("one", "once"), "an": ()}
+
+# Pattern rules folded into the same single-pass regex as the phrases. Each
+# rule is one named group enclosing any inner groups, so match.lastgroup
+# names the rule that matched.
+_PATTERN_RULES = (
+    ("doubled_word", r"(?i:\b([A-Za-z]+)\s+\{backref}\b)"),
+    ("article", r"\b[Aa]n?[ \t]+(?=[A-Za-z])"),
+    ("lowercase_i", r"(?<![\w'’.-])i(?![\w'’-]|\.\w)"),
+    ("space_before_punctuation", r"(?<=[A-Za-z])[ \t]+[,.;:!?](?!\w)"),
+    ("missing_space", r"(?<=[a-z])[,;:](?=[A-Za-z])|(?<=[a-z]{2})[.!?](?=[A-Z][a-z])"),
+    ("repeated_punctuation", r"[!?]{2,}|,{2,}|\.{4,}"),
+)
+
+# Checked per sentence: "A, B and C" (one-word items) or "A, B, C and D"
+# (items of up to two words), without a comma before the conjunction
+_SERIAL_LIST = re.compile(
+    r"\b(?:(?:\w+(?:[ \t]+\w+)?,[ \t]+){2,}(?:\w+[ \t]+){0,2}?|\w+,[ \t]+)\w+[ \t]+(?:and|or)[ \t]+\w+"
+)
+_LIST_ITEM_END = re.compile(r"(\w+),")
+# Last words of introductory or parenthetical phrases ("However," "of
+# course," "In short,"), which are set off by commas but are not list items.
+# Checked on each candidate list; a lookahead in the regex doubles its cost.
+_TRANSITIONS = frozenset((
+    "however", "therefore", "moreover", "furthermore", "nevertheless", "meanwhile",
+    "instead", "indeed", "also", "then", "thus", "still", "first", "second", "third",
+    "finally", "lastly", "yes", "no", "well", "today", "yesterday", "unfortunately",
+    "fortunately", "sadly", "luckily", "clearly", "obviously", "actually", "course",
+    "example", "instance", "fact", "addition", "contrast", "general", "conclusion",
+    "short", "particular", "result", "contrary",
+))
+_NEXT_WORD = re.compile(r"[A-Za-z][\w-]*")
+
+
+class GrammarRuleEngine:
+    """Single-pass matcher over all phrase and pattern rules."""
+
+    def __init__(self, phrases: Optional[Dict[str, Tuple[str, str, Optional[str]]]] = None):
+        self.phrases = phrases if phrases is not None else _phrase_table()
+        self._normalized = {self._normalize(p): v for p, v in self.phrases.items()}
+        alternatives = [f"(?P<phrase>(?i:\\b{_trie_pattern(self.phrases)}\\b))"]
+        for name, pattern in _PATTERN_RULES:
+            # Back-references are numbered by position in the combined regex
+            backref = len(alternatives) + 2
+            alternatives.append(f"(?P<{name}>{pattern.replace('{backref}', str(backref))})")
+        self._pattern = re.compile("|".join(alternatives))
+        # Sentence spans for the run-on check; quotes are balanced per paragraph
+        self._sentence = re.compile(r"[^.!?\n]+(?:[.!?]+|$)", re.MULTILINE)
+        self._paragraph = re.compile(r"[^\n]+(?:\n(?!\s*\n)[^\n]*)*")
+
+    @property
+    def rule_count(self) -> int:
+        # Pattern rules plus the serial comma, run-on and quote checks
+        return len(self.phrases) + len(_PATTERN_RULES) + 3
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return " ".join(text.lower().split())
+
+    def check(self, text: str) -> List[Finding]:
+        """
+        Scan text once and return findings ordered by position.
+
+        Args:
+            text: The essay (or any passage) to check
+
+        Returns:
+            Span-annotated findings
+        """
+        findings: List[Finding] = []
+        position = 0
+        while True:
+            match = self._pattern.search(text, position)
+            if match is None:
+                break
+            finding = self._dispatch(match)
+            if finding is not None:
+                findings.append(finding)
+            position = self._resume_at(match)
+        findings.extend(self._sentence_rules(text))
+        findings.extend(self._unbalanced_quotes(text))
+        findings.sort(key=lambda f: (f.start, f.end))
+        return findings
+
+    @staticmethod
+    def _resume_at(match: "re.Match[str]") -> int:
+        # Matches cannot overlap within one scan, so the next search starts
+        # at the match's last word rather than its end: in "its a apple" the
+        # "a" of "its a" still begins the article check. A single-word
+        # match resumes at its end, so every step moves forward.
+        matched = match.group(0)
+        last_space = max(matched.rfind(" "), matched.rfind("\t"), matched.rfind("\n"))
+        return match.start() + last_space + 1 if last_space >= 0 else match.end()
+
+    def _dispatch(self, match: "re.Match[str]") -> Optional[Finding]:
+        kind = match.lastgroup
+        start, end = match.span()
+        matched = match.group(0)
+
+        if kind == "phrase":
+            rule, category, suggestion = self._normalized[self._normalize(matched)]
+            message = {
+                "misspelling": f"Possible misspelling of '{suggestion}'",
+                "redundancy": "Redundant phrase",
+                "wordiness": "Wordy phrase",
+                "usage": "Commonly confused usage",
+            }[rule]
+            return Finding(rule, category, start, end, matched, message, _match_case(matched, suggestion))
+        if kind == "doubled_word":
+            word = matched.split()[0]
+            # "had had" and "that that" are often intentional
+            if word.lower() in ("had", "that"):
+                return None
+            return Finding(kind, MECHANICS, start, end, matched, "Repeated word", word)
+        if kind == "article":
+            return self._article(match)
+        if kind == "lowercase_i":
+            return Finding(kind, MECHANICS, start, end, matched, "Capitalize the pronoun 'I'", "I")
+        if kind == "space_before_punctuation":
+            return Finding(kind, PUNCTUATION, start, end, matched, "Space before punctuation", matched[-1])
+        if kind == "missing_space":
+            return Finding(kind, PUNCTUATION, start, end, matched, "Missing space after punctuation", matched + " ")
+        if kind == "repeated_punctuation":
+            return Finding(kind, PUNCTUATION, start, end, matched, "Repeated punctuation", matched[0])
+        return None
+
+    def _article(self, match: "re.Match[str]") -> Optional[Finding]:
+        written = match.group(0).rstrip()
+        next_word = _NEXT_WORD.match(match.string, match.end())
+        article = written.lower()
+        following = next_word.group(0).lower()
+        other = "an" if article == "a" else "a"
+        if following.startswith(_A_AN_REQUIRED[other]) or following in _A_AN_REQUIRED_WORDS[other]:
+            # "an unicorn", "a hour"
+            expected = other
+        elif following.startswith(_A_AN_REQUIRED[article]) or following in _A_AN_REQUIRED_WORDS[article]:
+            return None
+        elif article == "a" and following[0] in "aeiou" and not following.startswith(_A_AN_EXCEPTIONS["a"]):
+            expected = "an"
+        elif article == "an" and following[0] not in "aeiou" and not following.startswith(_A_AN_EXCEPTIONS["an"]):
+            expected = "a"
+        else:
+            return None
+        if written[0].isupper():
+            expected = expected.capitalize()
+        start, end = match.start(), next_word.end()
+        return Finding(
+            "article", MECHANICS, start, end, match.string[start:end],
+            f"Use '{expected}' before '{next_word.group(0)}'", expected,
+        )
+
+    def _sentence_rules(self, text: str) -> List[Finding]:
+        """Run-on length and serial commas, checked one sentence at a time."""
+        findings = []
+        for match in self._sentence.finditer(text):
+            listed = self._serial_list(match.group(0))
+            if listed is not None:
+                start = match.start() + listed.start()
+                findings.append(Finding(
+                    "serial_comma", PUNCTUATION, start, start + len(listed.group(0)), listed.group(0),
+                    "List without a serial (Oxford) comma before the last item", None,
+                ))
+            words = len(match.group(0).split())
+            if words > RUN_ON_WORDS:
+                sentence = match.group(0).strip()
+                start = match.start() + match.group(0).index(sentence[0])
+                findings.append(Finding(
+                    "run_on", MECHANICS, start, start + len(sentence), sentence,
+                    f"Sentence has {words} words; consider splitting it", None,
+                ))
+        return findings
+
+    @staticmethod
+    def _serial_list(sentence: str) -> Optional["re.Match[str]"]:
+        """The first list in a sentence whose comma-separated items are not transitions."""
+        position = 0
+        while True:
+            listed = _SERIAL_LIST.search(sentence, position)
+            if listed is None:
+                return None
+            items = _LIST_ITEM_END.findall(listed.group(0))
+            if not any(item.lower() in _TRANSITIONS for item in items):
+                return listed
+            position = listed.start() + 1
+
+    def _unbalanced_quotes(self, text: str) -> List[Finding]:
+        findings = []
+        for match in self._paragraph.finditer(text):
+            paragraph = match.group(0)
+            straight = paragraph.count('"')
+            opened = paragraph.count("“")
+            closed = paragraph.count("”")
+            if straight % 2 or opened != closed:
+                findings.append(Finding(
+                    "unbalanced_quotes", PUNCTUATION, match.start(), match.end(),
+                    paragraph[:60], "Unbalanced quotation marks in this paragraph", None,
+                ))
+        return findings
+
+
+def _match_case(original: str, suggestion: Optional[str]) -> Optional[str]:
+    """Give a suggestion the capitalization of the text it replaces."""
+    if not suggestion:
+        return suggestion
+    letters = [c for c in original if c.isalpha()]
+    if len(letters) > 1 and all(c.isupper() for c in letters):
+        return suggestion.upper()
+    if original[:1].isupper():
+        return suggestion[0].upper() + suggestion[1:]
+    return suggestion
+
+
+@lru_cache(maxsize=1)
+def default_engine() -> GrammarRuleEngine:
+    """The shared engine with the built-in rule set, compiled once."""
+    return GrammarRuleEngine()
+
+
+def check_grammar(text: str) -> List[Finding]:
+    """Run the built-in rules over text."""
+    return default_engine().check(text)
+
+
+def format_findings(findings: List[Finding], limit: int = 40) -> str:
+    """
+    Render findings as a compact list for a model prompt.
+
+    Args:
+        findings: Findings from check_grammar
+        limit: Maximum findings listed individually
+
+    Returns:
+        One line per finding, plus a count of any omitted
+    """
+    lines = []
+    for finding in findings[:limit]:
+        snippet = finding.text if len(finding.text) <= 60 else finding.text[:57] + "..."
+        fix = f" -> '{finding.suggestion}'" if finding.suggestion else ""
+        lines.append(f"- [{finding.rule}] \"{snippet}\"{fix}: {finding.message}")
+    if len(findings) > limit:
+        lines.append(f"- ... and {len(findings) - limit} more")
+    return "\n".join(lines)
@@ -0,0 +1,544 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Persistent job queue and worker pool for asynchronous essay analyses.
+
+Jobs live in a local SQLite database. A worker claims a job by taking a lease
+(visibility timeout) on it; if the worker dies, the lease expires and another
+worker picks the job up again, so queued and in-flight work survives restarts.
+"""
+
+import asyncio
+import http.client
+import ipaddress
+import json
+import logging
+import socket
+import sqlite3
+import threading
+import time
+import urllib.parse
+import uuid
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+@dataclass
+class Job:
+    """A single queued analysis and its outcome."""
+
+    id: str
+    status: str
+    payload: Dict[str, Any]
+    attempts: int
+    created_at: float
+    updated_at: float
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    webhook_url: Optional[str] = None
+
+
+class JobQueue:
+    """SQLite-backed queue with leases, retries and crash recovery."""
+
+    _COLUMNS = "id, status, payload, result, error, webhook_url, attempts, created_at, updated_at"
+
+    def __init__(
+        self,
+        db_path: str,
+        visibility_timeout: float = 600.0,
+        max_attempts: int = 3,
+    ):
+        self.db_path = db_path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            db_path, timeout=10, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, "
+            "status TEXT NOT NULL, "
+            "payload TEXT NOT NULL, "
+            "result TEXT, "
+            "error TEXT, "
+            "webhook_url TEXT, "
+            "attempts INTEGER NOT NULL DEFAULT 0, "
+            "available_at REAL NOT NULL, "
+            "leased_until REAL, "
+            "worker_id TEXT, "
+            "created_at REAL NOT NULL, "
+            "updated_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, available_at)"
+        )
+
+    def _row_to_job(self, row: sqlite3.Row) -> Job:
+        return Job(
+            id=row[0],
+            status=row[1],
+            payload=json.loads(row[2]),
+            result=json.loads(row[3]) if row[3] else None,
+            error=row[4],
+            webhook_url=row[5],
+            attempts=row[6],
+            created_at=row[7],
+            updated_at=row[8],
+        )
+
+    def enqueue(self, payload: Dict[str, Any], webhook_url: Optional[str] = None) -> Job:
+        """Persist a new job and return it."""
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, payload, webhook_url, attempts, "
+                "available_at, created_at, updated_at) VALUES (?, ?, ?, ?, 0, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(payload), webhook_url, now, now, now),
+            )
+        return Job(
+            id=job_id,
+            status=QUEUED,
+            payload=payload,
+            attempts=0,
+            created_at=now,
+            updated_at=now,
+            webhook_url=webhook_url,
+        )
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Look up a job by id."""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {self._COLUMNS} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def claim(self, worker_id: str) -> Optional[Job]:
+        """
+        Lease the oldest runnable job to a worker.
+
+        Runnable jobs are queued jobs whose retry delay has passed and running
+        jobs whose lease expired because their worker stopped heartbeating.
+
+        Args:
+            worker_id: Identifier of the claiming worker
+
+        Returns:
+            The claimed job, or None if nothing is runnable
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Jobs abandoned too many times are left for expire()
+                row = self._conn.execute(
+                    f"SELECT {self._COLUMNS} FROM jobs "
+                    "WHERE (status = ? AND available_at <= ?) "
+                    "OR (status = ? AND leased_until < ? AND attempts < ?) "
+                    "ORDER BY available_at LIMIT 1",
+                    (QUEUED, now, RUNNING, now, self.max_attempts),
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, leased_until = ?, "
+                    "worker_id = ?, updated_at = ? WHERE id = ?",
+                    (RUNNING, now + self.visibility_timeout, worker_id, now, row[0]),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        job = self._row_to_job(row)
+        job.status = RUNNING
+        job.attempts += 1
+        return job
+
+    def expire(self) -> List[Job]:
+        """
+        Fail jobs whose lease expired on their last allowed attempt.
+
+        Their workers stopped heartbeating too many times, so they are given
+        up on instead of claimed again. Each job is returned exactly once,
+        for its failure notification.
+
+        Returns:
+            The jobs just marked failed
+        """
+        now = time.time()
+        error = "Worker lease expired too many times"
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    f"SELECT {self._COLUMNS} FROM jobs "
+                    "WHERE status = ? AND leased_until < ? AND attempts >= ?",
+                    (RUNNING, now, self.max_attempts),
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE jobs SET status = ?, error = ?, leased_until = NULL, updated_at = ? "
+                    "WHERE id = ?",
+                    [(FAILED, error, now, row[0]) for row in rows],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        expired = [self._row_to_job(row) for row in rows]
+        for job in expired:
+            job.status, job.error, job.updated_at = FAILED, error, now
+        return expired
+
+    def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        """Extend a lease; returns False if the worker no longer owns the job."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET leased_until = ?, updated_at = ? "
+                "WHERE id = ? AND worker_id = ? AND status = ?",
+                (now + self.visibility_timeout, now, job_id, worker_id, RUNNING),
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id: str, worker_id: str, result: Dict[str, Any]) -> bool:
+        """
+        Mark a job succeeded and store its result.
+
+        Returns:
+            False if the worker no longer owns the job (its lease expired and
+            the job was claimed again), in which case nothing is written
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = NULL, leased_until = NULL, "
+                "updated_at = ? WHERE id = ? AND worker_id = ? AND status = ?",
+                (SUCCEEDED, json.dumps(result), time.time(), job_id, worker_id, RUNNING),
+            )
+        return cursor.rowcount == 1
+
+    def fail(self, job_id: str, worker_id: str, error: str, retry_delay: float = 5.0) -> Optional[str]:
+        """
+        Record a failed attempt, requeueing the job if attempts remain.
+
+        Args:
+            job_id: The failed job
+            worker_id: The worker that ran the attempt
+            error: Error message to store
+            retry_delay: Base delay before the job becomes runnable again
+
+        Returns:
+            The job's new status, or None if the worker no longer owns it
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT attempts FROM jobs WHERE id = ? AND worker_id = ? AND status = ?",
+                    (job_id, worker_id, RUNNING),
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                attempts = row[0]
+                status = QUEUED if attempts < self.max_attempts else FAILED
+                # Exponential backoff between attempts
+                available_at = now + retry_delay * (2 ** max(0, attempts - 1))
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, available_at = ?, leased_until = NULL, "
+                    "updated_at = ? WHERE id = ?",
+                    (status, error, available_at, now, job_id),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return status
+
+    def release(self, job_id: str, worker_id: str) -> bool:
+        """
+        Return a job to the queue without charging an attempt (used on shutdown).
+
+        Returns:
+            False if the worker no longer owns the job, which is left alone
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, attempts = MAX(0, attempts - 1), available_at = ?, "
+                "leased_until = NULL, updated_at = ? WHERE id = ? AND worker_id = ? AND status = ?",
+                (QUEUED, now, now, job_id, worker_id, RUNNING),
+            )
+        return cursor.rowcount == 1
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs per status."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        return {status: count for status, count in rows}
+
+
+class WebhookRejected(ValueError):
+    """Raised for a webhook URL the server must not call."""
+
+
+def check_webhook_url(url: str, allowed_hosts: Iterable[str] = (), resolve: bool = True) -> str:
+    """
+    Check that a webhook URL is safe for the server to call.
+
+    Only http and https URLs are accepted. Hosts on the allowlist are
+    trusted as they are; any other host must be, or with resolve=True
+    resolve only to, public addresses, so a webhook cannot be pointed at
+    loopback, private, link-local (cloud metadata) or reserved addresses.
+
+    Args:
+        url: The webhook URL
+        allowed_hosts: Host names trusted even if they resolve privately
+        resolve: Look the host name up in DNS; without it only literal IP
+            addresses are checked
+
+    Returns:
+        The URL, unchanged
+
+    Raises:
+        WebhookRejected: If the URL must not be called
+    """
+    _webhook_address(url, allowed_hosts, resolve)
+    return url
+
+
+def _webhook_address(url: str, allowed_hosts: Iterable[str] = (), resolve: bool = True) -> Optional[str]:
+    """
+    Check a webhook URL as check_webhook_url does.
+
+    Returns:
+        The checked address to connect to; None for allowlisted hosts, and
+        for host names when resolve is False
+    """
+    parsed = urllib.parse.urlsplit(url)
+    if parsed.scheme not in ("http", "https"):
+        raise WebhookRejected("Webhook URL must use http or https")
+    host = (parsed.hostname or "").lower()
+    if not host:
+        raise WebhookRejected("Webhook URL has no host")
+    if parsed.username or parsed.password:
+        raise WebhookRejected("Webhook URL must not contain credentials")
+    if host in {h.lower() for h in allowed_hosts}:
+        return None
+    try:
+        addresses = [ipaddress.ip_address(host)]
+    except ValueError:
+        if not resolve:
+            return None
+        try:
+            infos = socket.getaddrinfo(host, parsed.port or None, proto=socket.IPPROTO_TCP)
+        except (socket.gaierror, UnicodeError) as e:
+            raise WebhookRejected(f"Webhook host {host} does not resolve: {e}")
+        addresses = [ipaddress.ip_address(info[4][0].split("%")[0]) for info in infos]
+    for address in addresses:
+        if not address.is_global or address.is_multicast:
+            raise WebhookRejected(f"Webhook host {host} is not a public address")
+    return str(addresses[0])
+
+
+def _webhook_connection(url: str, address: Optional[str], timeout: float) -> http.client.HTTPConnection:
+    """
+    Connection for a webhook URL that connects to the checked address.
+
+    Resolving the host again at connect time would let DNS rebinding swap in
+    an internal address after the check. The Host header, TLS server name
+    and certificate check still use the host name.
+    """
+    parsed = urllib.parse.urlsplit(url)
+    connection_class = http.client.HTTPSConnection if parsed.scheme == "https" else http.client.HTTPConnection
+    connection = connection_class(parsed.hostname, parsed.port, timeout=timeout)
+    if address is not None:
+        def connect_to_checked_address(destination, *args, **kwargs):
+            return socket.create_connection((address, destination[1]), *args, **kwargs)
+
+        connection._create_connection = connect_to_checked_address
+    return connection
+
+
+def _post_webhook(
+    url: str,
+    body: Dict[str, Any],
+    attempts: int = 3,
+    allowed_hosts: Iterable[str] = (),
+) -> None:
+    # Checked again at delivery (the host may resolve differently by now),
+    # and the connection goes to the address that passed the check
+    try:
+        address = _webhook_address(url, allowed_hosts)
+    except WebhookRejected as e:
+        logger.warning(f"Webhook to {url} not delivered: {e}")
+        metrics.increment("webhooks_rejected")
+        return
+    parsed = urllib.parse.urlsplit(url)
+    target = (parsed.path or "/") + (f"?{parsed.query}" if parsed.query else "")
+    data = json.dumps(body).encode("utf-8")
+    for attempt in range(attempts):
+        connection = _webhook_connection(url, address, timeout=10)
+        try:
+            connection.request("POST", target, body=data, headers={"Content-Type": "application/json"})
+            response = connection.getresponse()
+            response.read()
+            # Redirects are not followed: they could lead past the address check
+            if response.status >= 300:
+                raise http.client.HTTPException(f"HTTP {response.status} {response.reason}")
+            return
+        except Exception as e:
+            logger.warning(f"Webhook delivery to {url} failed (attempt {attempt + 1}): {e}")
+            time.sleep(2 ** attempt)
+        finally:
+            connection.close()
+
+
+class JobWorkerPool:
+    """Asyncio workers that drain a JobQueue inside the API process."""
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        handler: JobHandler,
+        concurrency: int = 2,
+        poll_interval: float = 1.0,
+        webhook_allowed_hosts: Iterable[str] = (),
+    ):
+        self.queue = queue
+        self.handler = handler
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.webhook_allowed_hosts = tuple(webhook_allowed_hosts)
+        self._tasks: List[asyncio.Task] = []
+        self._running: Dict[str, Job] = {}
+        self._stopping = False
+
+    def start(self) -> None:
+        """Spawn the worker tasks on the running event loop."""
+        self._stopping = False
+        for index in range(self.concurrency):
+            worker_id = f"{uuid.uuid4().hex[:8]}-{index}"
+            self._tasks.append(asyncio.create_task(self._worker(worker_id)))
+        logger.info(f"Started {self.concurrency} job workers")
+
+    async def stop(self, timeout: float = 0.0) -> None:
+        """
+        Stop claiming jobs, let in-flight ones finish, then cancel the rest.
+
+        Args:
+            timeout: Seconds to wait for in-flight jobs before cancelling them;
+                cancelled jobs go back to the queue
+        """
+        self._stopping = True
+        if self._tasks and timeout > 0:
+            await asyncio.wait(self._tasks, timeout=timeout)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def _heartbeat(self, job: Job, worker_id: str, run: asyncio.Future) -> None:
+        interval = max(1.0, self.queue.visibility_timeout / 3)
+        while True:
+            await asyncio.sleep(interval)
+            if not await asyncio.to_thread(self.queue.heartbeat, job.id, worker_id):
+                # Another worker owns the job now; stop this attempt
+                logger.warning(f"Job {job.id} lease lost by worker {worker_id}, abandoning attempt")
+                metrics.increment("jobs_abandoned", reason="lease_lost")
+                run.cancel()
+                return
+
+    async def _worker(self, worker_id: str) -> None:
+        # Queue calls take SQLite locks (up to its busy timeout under
+        # contention), so they run in threads, off the event loop
+        while not self._stopping:
+            for expired in await asyncio.to_thread(self.queue.expire):
+                logger.warning(f"Job {expired.id} failed: {expired.error}")
+                await self._notify(expired, FAILED, error=expired.error)
+            job = await asyncio.to_thread(self.queue.claim, worker_id)
+            if job is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            await self._process(job, worker_id)
+
+    async def _process(self, job: Job, worker_id: str) -> None:
+        self._running[job.id] = job
+        run = asyncio.ensure_future(self.handler(job.payload))
+        heartbeat = asyncio.create_task(self._heartbeat(job, worker_id, run))
+        try:
+            result = await run
+        except asyncio.CancelledError:
+            if heartbeat.done() and not heartbeat.cancelled():
+                # The heartbeat cancelled the run after losing the lease;
+                # the job is no longer this worker's to update
+                return
+            # Shutting down: hand the job back without charging an attempt
+            if await asyncio.to_thread(self.queue.release, job.id, worker_id):
+                metrics.increment("jobs_released", reason="shutdown")
+            raise
+        except Exception as e:
+            status = await asyncio.to_thread(self.queue.fail, job.id, worker_id, str(e))
+            if status is None:
+                logger.warning(f"Job {job.id} failed after its lease was lost: {e}")
+                return
+            logger.warning(f"Job {job.id} attempt {job.attempts} failed ({status}): {e}")
+            if status == FAILED:
+                await self._notify(job, FAILED, error=str(e))
+        else:
+            if not await asyncio.to_thread(self.queue.complete, job.id, worker_id, result):
+                # The lease expired and the job was claimed again; the new
+                # owner's result and notification stand
+                logger.warning(f"Job {job.id} finished after its lease was lost, result dropped")
+                metrics.increment("jobs_abandoned", reason="lease_expired")
+                return
+            logger.info(f"Job {job.id} completed")
+            await self._notify(job, SUCCEEDED, result=result)
+        finally:
+            heartbeat.cancel()
+            run.cancel()
+            self._running.pop(job.id, None)
+
+    async def _notify(
+        self,
+        job: Job,
+        status: str,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        if not job.webhook_url:
+            return
+        body = {"job_id": job.id, "status": status, "result": result, "error": error}
+        await asyncio.to_thread(
+            _post_webhook, job.webhook_url, body, allowed_hosts=self.webhook_allowed_hosts
+        )
@@ -0,0 +1,188 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Cancellation and graceful drain for in-flight agent runs.
+
+Each analysis runs as its own task. If the HTTP client disconnects, the task is
+cancelled; the CancelledError propagates through the runner's event loop and
+into any sub-agent tool calls awaiting the model, so no further upstream calls
+are made. On shutdown the tracker waits for in-flight runs up to a deadline and
+cancels whatever is left.
+
+uvicorn stops accepting connections before it runs shutdown handlers, so a
+draining flag set there is never seen by health checks. install_drain_signal
+marks the tracker draining as soon as SIGTERM arrives and hands the signal to
+uvicorn only after a notice period, while /health answers 503.
+"""
+
+import asyncio
+import logging
+import signal
+from typing import Any, Awaitable, Callable, List, Optional, Set
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ClientDisconnected(Exception):
+    """Raised when a run was cancelled because its client went away."""
+
+
+class ServerDraining(Exception):
+    """Raised when an analysis cannot start or finish because the server is draining."""
+
+
+class InFlightTracker:
+    """Tracks running analyses so they can be cancelled or drained."""
+
+    def __init__(self, poll_interval: float = 0.5):
+        self.poll_interval = poll_interval
+        self.draining = False
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    def _update_gauge(self) -> None:
+        metrics.set_gauge("analyses_in_flight", len(self._tasks))
+
+    async def run(
+        self,
+        coro: Awaitable[Any],
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+    ) -> Any:
+        """
+        Run a coroutine as a tracked task, cancelling it on client disconnect.
+
+        Args:
+            coro: The analysis to run
+            is_disconnected: Async predicate polled while the task runs
+
+        Returns:
+            The coroutine's result
+
+        Raises:
+            ServerDraining: If the server is shutting down
+            ClientDisconnected: If is_disconnected reported True
+        """
+        if self.draining:
+            coro.close()
+            raise ServerDraining("Server is shutting down")
+
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        self._update_gauge()
+        metrics.increment("analyses_started")
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=self.poll_interval)
+                if done:
+                    break
+                if is_disconnected is not None and await is_disconnected():
+                    task.cancel()
+                    await asyncio.gather(task, return_exceptions=True)
+                    metrics.increment("analyses_cancelled", reason="client_disconnect")
+                    logger.info("Client disconnected; cancelled in-flight analysis")
+                    raise ClientDisconnected()
+            if task.cancelled():
+                # Cancelled by drain(), which already counted it
+                raise ServerDraining("Analysis cancelled by server shutdown")
+            if task.exception() is not None:
+                metrics.increment("analyses_failed")
+            else:
+                metrics.increment("analyses_completed")
+            return task.result()
+        except asyncio.CancelledError:
+            # The request handler itself was cancelled (e.g. forced shutdown)
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                metrics.increment("analyses_cancelled", reason="shutdown")
+            raise
+        finally:
+            self._tasks.discard(task)
+            self._update_gauge()
+
+    async def drain(self, timeout: float) -> int:
+        """
+        Stop accepting work, wait for in-flight runs, then cancel stragglers.
+
+        Args:
+            timeout: Seconds to let in-flight runs finish
+
+        Returns:
+            Number of runs cancelled at the deadline
+        """
+        self.draining = True
+        pending = set(self._tasks)
+        if pending:
+            logger.info(f"Draining {len(pending)} in-flight analyses (deadline {timeout:.0f}s)")
+            _, pending = await asyncio.wait(pending, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            metrics.increment("analyses_cancelled", len(pending), reason="shutdown")
+            logger.warning(f"Cancelled {len(pending)} analyses at shutdown deadline")
+        return len(pending)
+
+
+def install_drain_signal(
+    tracker: InFlightTracker,
+    notice_seconds: float,
+    signum: int = signal.SIGTERM,
+) -> bool:
+    """
+    Mark the tracker draining on a signal, before the server's own handler sees it.
+
+    The handler installed before this one (uvicorn's) gets the signal after
+    notice_seconds, or at once on a second signal. Call from the event loop.
+
+    Args:
+        tracker: Tracker to mark draining
+        notice_seconds: Seconds to keep serving, draining, before shutdown starts
+        signum: Signal to intercept
+
+    Returns:
+        Whether the handler was installed; not when there is no Python-level
+        handler to pass the signal on to
+    """
+    previous = signal.getsignal(signum)
+    if not callable(previous):
+        return False
+    loop = asyncio.get_running_loop()
+    handoff: List[asyncio.TimerHandle] = []
+
+    def pass_on(received: int, frame: Any) -> None:
+        for timer in handoff:
+            timer.cancel()
+        handoff.clear()
+        previous(received, frame)
+
+    def schedule(received: int) -> None:
+        handoff.append(loop.call_later(notice_seconds, pass_on, received, None))
+
+    def on_signal(received: int, frame: Any) -> None:
+        if tracker.draining:
+            pass_on(received, frame)
+            return
+        tracker.draining = True
+        logger.info(f"Received signal {received}; draining for {notice_seconds:.0f}s before shutdown")
+        loop.call_soon_threadsafe(schedule, received)
+
+    signal.signal(signum, on_signal)
+    return True
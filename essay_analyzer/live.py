@@ -0,0 +1,243 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Live feedback while a draft is being typed.
+
+A LiveSession receives the full draft on every keystroke batch. Local metrics
+from the heuristic analyzer are recomputed and sent back immediately. Model
+analysis works per paragraph: once the draft has been quiet for the debounce
+window, only paragraphs whose text has not been analyzed before are sent to
+the model, and runs for paragraphs that have since been edited away are
+cancelled. Paragraph results are cached by fingerprint, so reverting an edit
+or moving a paragraph costs nothing. Degraded results (local stand-ins served
+while the model is unavailable) are shown but not cached, so the paragraph is
+analyzed again on the next update.
+"""
+
+import asyncio
+import hashlib
+import logging
+import re
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_WHITESPACE = re.compile(r"\s+")
+
+Analyzer = Callable[[str], Awaitable[Dict[str, Any]]]
+Sender = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+def split_paragraphs(text: str) -> List[str]:
+    """Non-empty paragraphs of a draft, separated by blank lines."""
+    return [p.strip() for p in _PARAGRAPH_BREAK.split(text) if p.strip()]
+
+
+def paragraph_fingerprint(paragraph: str) -> str:
+    """Hash of a paragraph with whitespace normalized, so reflowing does not count as an edit."""
+    normalized = _WHITESPACE.sub(" ", paragraph).strip()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+def combine_ratings(
+    results: List[Tuple[int, Dict[str, Any]]],
+    dimensions: Tuple[str, ...],
+) -> Dict[str, Any]:
+    """
+    Word-weighted mean of per-paragraph ratings.
+
+    Args:
+        results: (word count, analysis result) per analyzed paragraph
+        dimensions: Dimensions that were analyzed
+
+    Returns:
+        Dictionary with a rating per dimension and the overallScore
+    """
+    combined: Dict[str, Any] = {}
+    for dimension in dimensions:
+        field = f"{dimension}Rating"
+        rated = [(words, r[field]) for words, r in results if isinstance(r.get(field), (int, float))]
+        total = sum(words for words, _ in rated)
+        if total:
+            combined[field] = round(sum(words * rating for words, rating in rated) / total, 2)
+    scored = [(words, r["overallScore"]) for words, r in results if isinstance(r.get("overallScore"), (int, float))]
+    total = sum(words for words, _ in scored)
+    if total:
+        combined["overallScore"] = int(round(sum(words * score for words, score in scored) / total))
+    return combined
+
+
+class LiveSession:
+    """Debounced, per-paragraph incremental analysis for one connected draft."""
+
+    def __init__(
+        self,
+        analyze: Analyzer,
+        send: Sender,
+        local_metrics: Callable[[str], Dict[str, Any]],
+        dimensions: Tuple[str, ...],
+        debounce: float = 1.5,
+        min_paragraph_words: int = 8,
+        cache_size: int = 256,
+    ):
+        """
+        Args:
+            analyze: Runs the model analysis of one paragraph
+            send: Delivers a message to the client
+            local_metrics: Computes the heuristic metrics of the whole draft
+            dimensions: Dimensions analyzed per paragraph
+            debounce: Quiet seconds after the last update before model runs start
+            min_paragraph_words: Shorter paragraphs are not sent to the model yet
+            cache_size: Paragraph results kept for reuse
+        """
+        self.analyze = analyze
+        self.send = send
+        self.local_metrics = local_metrics
+        self.dimensions = dimensions
+        self.debounce = debounce
+        self.min_paragraph_words = min_paragraph_words
+        self.cache_size = cache_size
+        self.revision = 0
+        self.paragraphs: List[str] = []
+        self._fingerprints: List[str] = []
+        self._results: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._degraded: Dict[str, Dict[str, Any]] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self._debounce_task: Optional[asyncio.Task] = None
+
+    async def update(self, text: str, revision: Optional[int] = None) -> None:
+        """
+        Accept a new version of the draft.
+
+        Sends local metrics right away and (re)starts the debounce window for
+        model analysis. Local metrics are computed in a thread: they take
+        over a second on the largest drafts.
+        """
+        self.revision = revision if revision is not None else self.revision + 1
+        self.paragraphs = split_paragraphs(text)
+        self._fingerprints = [paragraph_fingerprint(p) for p in self.paragraphs]
+        metrics.increment("live_updates")
+        await self.send({
+            "type": "local",
+            "revision": self.revision,
+            "paragraphs": len(self.paragraphs),
+            **await asyncio.to_thread(self.local_metrics, text),
+        })
+        if self._debounce_task is not None:
+            self._debounce_task.cancel()
+        self._debounce_task = asyncio.ensure_future(self._debounced())
+
+    async def _debounced(self) -> None:
+        await asyncio.sleep(self.debounce)
+        self._debounce_task = None
+        await self.schedule()
+
+    async def schedule(self) -> None:
+        """Cancel superseded paragraph runs and start runs for new paragraphs."""
+        current = set(self._fingerprints)
+        for fingerprint, task in list(self._running.items()):
+            if fingerprint not in current:
+                task.cancel()
+                del self._running[fingerprint]
+                metrics.increment("live_paragraph_runs", outcome="superseded")
+        for fingerprint in list(self._degraded):
+            if fingerprint not in current:
+                del self._degraded[fingerprint]
+        started = 0
+        for fingerprint, paragraph in zip(self._fingerprints, self.paragraphs):
+            if fingerprint in self._results or fingerprint in self._running:
+                continue
+            if len(paragraph.split()) < self.min_paragraph_words:
+                continue
+            self._running[fingerprint] = asyncio.ensure_future(self._run(fingerprint, paragraph))
+            started += 1
+        if started:
+            logger.debug(f"Live revision {self.revision}: analyzing {started} changed paragraph(s)")
+        await self.send_analysis()
+
+    async def _run(self, fingerprint: str, paragraph: str) -> None:
+        try:
+            result = await self.analyze(paragraph)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Live paragraph analysis failed: {e}")
+            metrics.increment("live_paragraph_runs", outcome="error")
+            self._running.pop(fingerprint, None)
+            await self.send({"type": "error", "revision": self.revision, "detail": str(e)})
+            return
+        self._running.pop(fingerprint, None)
+        if result.get("degraded"):
+            metrics.increment("live_paragraph_runs", outcome="degraded")
+            self._degraded[fingerprint] = result
+        else:
+            metrics.increment("live_paragraph_runs", outcome="completed")
+            self._degraded.pop(fingerprint, None)
+            self._results[fingerprint] = result
+            self._results.move_to_end(fingerprint)
+            while len(self._results) > self.cache_size:
+                self._results.popitem(last=False)
+        await self.send_analysis()
+
+    async def send_analysis(self) -> None:
+        """Send per-paragraph results for the current draft and their combined ratings."""
+        paragraphs = []
+        rated = []
+        for index, (fingerprint, paragraph) in enumerate(zip(self._fingerprints, self.paragraphs)):
+            result = self._results.get(fingerprint)
+            if result is not None:
+                self._results.move_to_end(fingerprint)
+                status = "ready"
+                rated.append((len(paragraph.split()), result))
+            elif fingerprint in self._running:
+                status = "pending"
+                result = self._degraded.get(fingerprint)
+            elif fingerprint in self._degraded:
+                status = "degraded"
+                result = self._degraded[fingerprint]
+                rated.append((len(paragraph.split()), result))
+            else:
+                status = "skipped"
+            paragraphs.append({
+                "index": index,
+                "fingerprint": fingerprint,
+                "status": status,
+                "result": result,
+            })
+        await self.send({
+            "type": "analysis",
+            "revision": self.revision,
+            "pending": len(self._running),
+            "paragraphs": paragraphs,
+            **combine_ratings(rated, self.dimensions),
+        })
+
+    async def close(self) -> None:
+        """Cancel the debounce timer and every paragraph run in flight."""
+        tasks = list(self._running.values())
+        if self._debounce_task is not None:
+            tasks.append(self._debounce_task)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        if self._running:
+            metrics.increment("live_paragraph_runs", len(self._running), outcome="disconnected")
+        self._running.clear()
+        self._debounce_task = None
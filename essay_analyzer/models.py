@@ -0,0 +1,68 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Shared model backend for all agents.
+
+An agent configured with a model name gets a fresh Gemini wrapper, and with
+it a fresh API client and HTTP connection pool, whenever the model is
+resolved. Every agent here is given the same Gemini instance instead, so all
+model calls share one client whose keep-alive connections can be opened
+ahead of traffic.
+"""
+
+import asyncio
+import logging
+from functools import lru_cache
+
+from google.adk.models.google_llm import Gemini
+
+logger = logging.getLogger(__name__)
+
+MODEL = "gemini-2.5-flash"
+
+
+@lru_cache(maxsize=None)
+def shared_model(name: str = MODEL) -> Gemini:
+    """The process-wide Gemini instance for a model name."""
+    return Gemini(model=name)
+
+
+async def open_connections(count: int, name: str = MODEL) -> int:
+    """
+    Establish pooled keep-alive connections to the model backend.
+
+    Sends count concurrent token-count requests, which are cheap and do not
+    generate, so the client's pool holds that many connections with their
+    TLS handshakes done.
+
+    Args:
+        count: Connections to open
+        name: Model whose client to warm
+
+    Returns:
+        Number of requests that succeeded
+    """
+    client = shared_model(name).api_client
+
+    async def ping() -> bool:
+        try:
+            await client.aio.models.count_tokens(model=name, contents="warm-up")
+            return True
+        except Exception as e:
+            logger.warning(f"Connection warm-up request failed: {e}")
+            return False
+
+    results = await asyncio.gather(*(ping() for _ in range(max(1, count))))
+    return sum(results)
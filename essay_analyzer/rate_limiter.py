@@ -0,0 +1,303 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Upstream rate-limit scheduler for Gemini calls.
+
+Keeps two token buckets (requests per minute and estimated tokens per minute)
+in a local SQLite file so every worker process on the host draws from the same
+budget. Callers wait for capacity instead of tripping quota errors, and the
+batch lane always leaves a reserve for interactive traffic.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+# Fraction of each bucket the lane must leave untouched.
+LANE_RESERVE = {
+    INTERACTIVE: 0.0,
+    BATCH: 0.2,
+}
+
+# Rough conversion used for pre-call estimates; Gemini averages ~4 chars/token
+# for English prose.
+CHARS_PER_TOKEN = 4
+DEFAULT_OUTPUT_TOKENS = 1024
+
+REQUESTS_BUCKET = "requests"
+TOKENS_BUCKET = "tokens"
+
+# Upper bound on a single sleep so waiters re-check promptly when capacity is
+# returned by another process.
+MAX_POLL_INTERVAL = 1.0
+
+
+class RateLimitTimeout(Exception):
+    """Raised when capacity does not become available within max_wait."""
+
+    def __init__(self, waited: float, retry_after: float):
+        super().__init__(
+            f"Upstream capacity unavailable after waiting {waited:.1f}s"
+        )
+        self.waited = waited
+        self.retry_after = retry_after
+
+
+def estimate_tokens(
+    essay_text: str,
+    prompt_texts: Iterable[str] = (),
+    output_tokens: int = DEFAULT_OUTPUT_TOKENS,
+) -> int:
+    """
+    Estimate the tokens an analysis will consume before calling the model.
+
+    Args:
+        essay_text: The essay being analyzed
+        prompt_texts: One instruction per upstream call that sees the essay
+        output_tokens: Expected generated tokens per call
+
+    Returns:
+        Estimated total of input and output tokens
+    """
+    essay_chars = len(essay_text)
+    total = 0
+    calls = 0
+    for prompt_text in prompt_texts:
+        total += (len(prompt_text) + essay_chars) // CHARS_PER_TOKEN + output_tokens
+        calls += 1
+    if not calls:
+        total = essay_chars // CHARS_PER_TOKEN + output_tokens
+    return max(1, total)
+
+
+def is_quota_error(exc: BaseException) -> bool:
+    """Return True if the exception is an upstream quota/rate-limit rejection."""
+    code = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    if code == 429:
+        return True
+    message = str(exc)
+    return "RESOURCE_EXHAUSTED" in message or "429" in message.split(" ", 1)[0]
+
+
+class UpstreamScheduler:
+    """Token-bucket scheduler whose state is shared through a SQLite file."""
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        db_path: str,
+    ):
+        self.capacities = {
+            REQUESTS_BUCKET: float(requests_per_minute),
+            TOKENS_BUCKET: float(tokens_per_minute),
+        }
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._interactive_waiting = 0
+        self._conn = sqlite3.connect(
+            db_path, timeout=10, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def _rate(self, name: str) -> float:
+        return self.capacities[name] / 60.0
+
+    def _level(self, name: str, now: float) -> float:
+        """Current level of a bucket, refilled up to now; call inside a transaction."""
+        capacity = self.capacities[name]
+        row = self._conn.execute(
+            "SELECT tokens, updated FROM buckets WHERE name = ?", (name,)
+        ).fetchone()
+        if row is None:
+            return capacity
+        return min(capacity, row[0] + max(0.0, now - row[1]) * self._rate(name))
+
+    def try_acquire(self, cost: Dict[str, float], lane: str = INTERACTIVE) -> Tuple[bool, float]:
+        """
+        Atomically take cost from every bucket if all of them can cover it.
+
+        Blocks while another process holds the database lock; async callers
+        go through acquire(), which runs it in a worker thread.
+
+        Args:
+            cost: Amount to take per bucket name
+            lane: Priority lane; lower lanes must leave a reserve in each bucket
+
+        Returns:
+            (granted, seconds to wait before retrying)
+        """
+        reserve = LANE_RESERVE.get(lane, LANE_RESERVE[BATCH])
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                levels = {name: self._level(name, now) for name in self.capacities}
+
+                wait = 0.0
+                for name, amount in cost.items():
+                    capacity = self.capacities[name]
+                    # A single oversized call may run the bucket into debt
+                    # instead of waiting forever.
+                    amount = min(amount, capacity * (1.0 - reserve))
+                    shortfall = amount + reserve * capacity - levels[name]
+                    if shortfall > 0:
+                        wait = max(wait, shortfall / self._rate(name))
+
+                granted = wait == 0.0
+                if granted:
+                    for name, amount in cost.items():
+                        levels[name] -= amount
+                for name, level in levels.items():
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                        (name, level, now),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return granted, wait
+
+    def penalize(self, seconds: float) -> None:
+        """
+        Drain the request bucket so all workers back off after a quota error.
+
+        Capacity left in the bucket is dropped (upstream just said there is
+        none) and the backoff is added to any debt already there, so
+        penalties from several workers accumulate instead of replacing each
+        other.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                level = min(0.0, self._level(REQUESTS_BUCKET, now))
+                level -= self._rate(REQUESTS_BUCKET) * seconds
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                    (REQUESTS_BUCKET, level, now),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        logger.warning(f"Upstream quota error; backing off all workers for {seconds:.1f}s")
+
+    def _cost(self, tokens: int, requests: int) -> Dict[str, float]:
+        return {REQUESTS_BUCKET: float(requests), TOKENS_BUCKET: float(tokens)}
+
+    async def acquire(
+        self,
+        tokens: int,
+        requests: int = 1,
+        lane: str = INTERACTIVE,
+        max_wait: Optional[float] = None,
+    ) -> float:
+        """
+        Wait until the buckets can cover the call, then take the capacity.
+
+        The SQLite work runs in a worker thread, so a contended database lock
+        never stalls the event loop.
+
+        Args:
+            tokens: Estimated tokens for the call(s)
+            requests: Number of upstream requests the call will make
+            lane: INTERACTIVE or BATCH
+            max_wait: Give up after this many seconds (None waits indefinitely)
+
+        Returns:
+            Seconds spent waiting
+        """
+        cost = self._cost(tokens, requests)
+        start = time.monotonic()
+        interactive = lane == INTERACTIVE
+        if interactive:
+            self._interactive_waiting += 1
+        try:
+            while True:
+                # Batch callers in this process yield to waiting interactive ones.
+                if interactive or not self._interactive_waiting:
+                    granted, wait = await asyncio.to_thread(self.try_acquire, cost, lane)
+                    if granted:
+                        waited = time.monotonic() - start
+                        if waited > 0.05:
+                            logger.info(f"Upstream call ({lane}) delayed {waited:.2f}s by rate limits")
+                        return waited
+                else:
+                    wait = MAX_POLL_INTERVAL
+                waited = time.monotonic() - start
+                if max_wait is not None and waited + wait > max_wait:
+                    raise RateLimitTimeout(waited, wait)
+                await asyncio.sleep(min(wait, MAX_POLL_INTERVAL) + random.uniform(0, 0.05))
+        finally:
+            if interactive:
+                self._interactive_waiting -= 1
+
+    async def penalize_async(self, seconds: float) -> None:
+        """penalize() for async callers, run in a worker thread."""
+        await asyncio.to_thread(self.penalize, seconds)
+
+    def acquire_sync(
+        self,
+        tokens: int,
+        requests: int = 1,
+        lane: str = INTERACTIVE,
+        max_wait: Optional[float] = None,
+    ) -> float:
+        """Blocking variant of acquire() for synchronous scripts."""
+        cost = self._cost(tokens, requests)
+        start = time.monotonic()
+        while True:
+            granted, wait = self.try_acquire(cost, lane)
+            waited = time.monotonic() - start
+            if granted:
+                return waited
+            if max_wait is not None and waited + wait > max_wait:
+                raise RateLimitTimeout(waited, wait)
+            time.sleep(min(wait, MAX_POLL_INTERVAL) + random.uniform(0, 0.05))
+
+
+_scheduler: Optional[UpstreamScheduler] = None
+
+
+def get_scheduler() -> UpstreamScheduler:
+    """Return the process-wide scheduler configured from the environment."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = UpstreamScheduler(
+            requests_per_minute=float(os.getenv("UPSTREAM_RPM_LIMIT", "60")),
+            tokens_per_minute=float(os.getenv("UPSTREAM_TPM_LIMIT", "250000")),
+            db_path=os.getenv(
+                "UPSTREAM_RATE_LIMIT_DB",
+                os.path.join(tempfile.gettempdir(), "essay_analyzer_ratelimit.sqlite3"),
+            ),
+        )
+    return _scheduler
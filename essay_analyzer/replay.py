@@ -0,0 +1,250 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Record/replay fixtures for model calls.
+
+In record mode every model call made by any agent (coordinator turns,
+sub-agent tool calls and their answers) is stored with its latency, keyed by a
+fingerprint of the agent, model, instruction and conversation. In replay mode
+the same calls are answered from the store without touching the network,
+either instantly or at a multiple of the recorded speed, so the full pipeline
+runs offline and deterministically.
+
+Fixtures are gzip-compressed JSON lines; recording appends a new gzip member,
+so one file can accumulate several recording sessions.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import callbacks
+
+logger = logging.getLogger(__name__)
+
+OFF = "off"
+RECORD = "record"
+REPLAY = "replay"
+
+DEFAULT_FIXTURE_PATH = os.path.join("fixtures", "llm_fixtures.jsonl.gz")
+
+# Fields that differ between otherwise identical runs (generated call ids,
+# opaque thought signatures) and must not affect the fingerprint.
+_VOLATILE_KEYS = {"id", "thought_signature"}
+
+
+class FixtureMissingError(Exception):
+    """Raised in replay mode when a model call has no recorded response."""
+
+    def __init__(self, agent_name: str, fingerprint: str, path: str):
+        super().__init__(
+            f"No recorded model response for agent '{agent_name}' "
+            f"(fingerprint {fingerprint[:16]}) in {path}. "
+            f"Re-record with LLM_FIXTURE_MODE=record."
+        )
+        self.agent_name = agent_name
+        self.fingerprint = fingerprint
+        self.path = path
+
+
+def _strip_volatile(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _strip_volatile(v) for k, v in value.items() if k not in _VOLATILE_KEYS}
+    if isinstance(value, list):
+        return [_strip_volatile(v) for v in value]
+    return value
+
+
+def request_fingerprint(agent_name: str, llm_request: Any) -> str:
+    """
+    Fingerprint a model request independently of run-specific ids.
+
+    Args:
+        agent_name: Agent making the call
+        llm_request: The ADK LlmRequest about to be sent
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    config = getattr(llm_request, "config", None)
+    system_instruction = getattr(config, "system_instruction", None) if config else None
+    if system_instruction is not None and not isinstance(system_instruction, str):
+        system_instruction = json.loads(system_instruction.model_dump_json(exclude_none=True))
+    contents = [
+        json.loads(content.model_dump_json(exclude_none=True))
+        for content in llm_request.contents
+    ]
+    material = {
+        "agent": agent_name,
+        "model": llm_request.model,
+        "system_instruction": _strip_volatile(system_instruction),
+        "contents": _strip_volatile(contents),
+    }
+    encoded = json.dumps(material, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class FixtureStore:
+    """Compact on-disk store of recorded model responses."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        # Replay position per fingerprint, for repeated identical requests
+        self._cursor: Dict[str, int] = defaultdict(int)
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries[entry["fingerprint"]].append(entry)
+        logger.info(f"Loaded {sum(map(len, self._entries.values()))} model fixtures from {self.path}")
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    def add(self, fingerprint: str, agent_name: str, latency: float, response: Dict[str, Any]) -> None:
+        """Append one recorded response to memory and disk."""
+        entry = {
+            "fingerprint": fingerprint,
+            "agent": agent_name,
+            "seq": len(self._entries[fingerprint]),
+            "latency": round(latency, 4),
+            "recorded_at": time.time(),
+            "response": response,
+        }
+        with self._lock:
+            self._entries[fingerprint].append(entry)
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with gzip.open(self.path, "at", encoding="utf-8") as f:
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+    def next(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Return the next recorded response for a fingerprint, repeating the last one."""
+        with self._lock:
+            entries = self._entries.get(fingerprint)
+            if not entries:
+                return None
+            index = min(self._cursor[fingerprint], len(entries) - 1)
+            self._cursor[fingerprint] += 1
+            return entries[index]
+
+
+class ModelRecorder:
+    """Model hooks that record to or replay from a FixtureStore."""
+
+    def __init__(self, mode: str, store: FixtureStore, speed: float = 0.0):
+        self.mode = mode
+        self.store = store
+        self.speed = speed
+        self.missing = 0
+        self._pending: Dict[Tuple[str, str], Tuple[str, float]] = {}
+
+    async def before_model(self, callback_context: Any, llm_request: Any) -> Optional[Any]:
+        from google.adk.models.llm_response import LlmResponse
+
+        agent_name = callback_context.agent_name
+        fingerprint = request_fingerprint(agent_name, llm_request)
+        if self.mode == RECORD:
+            key = (callback_context.invocation_id, agent_name)
+            self._pending[key] = (fingerprint, time.perf_counter())
+            return None
+
+        entry = self.store.next(fingerprint)
+        if entry is None:
+            self.missing += 1
+            error = FixtureMissingError(agent_name, fingerprint, self.store.path)
+            logger.error(str(error))
+            raise error
+        if self.speed > 0:
+            # Reproduce the recorded latency, optionally accelerated
+            await asyncio.sleep(entry["latency"] / self.speed)
+        return LlmResponse.model_validate_json(json.dumps(entry["response"]))
+
+    async def after_model(self, callback_context: Any, llm_response: Any) -> None:
+        if self.mode != RECORD or getattr(llm_response, "partial", False):
+            return None
+        key = (callback_context.invocation_id, callback_context.agent_name)
+        pending = self._pending.pop(key, None)
+        if pending is None:
+            return None
+        fingerprint, started = pending
+        self.store.add(
+            fingerprint,
+            callback_context.agent_name,
+            time.perf_counter() - started,
+            json.loads(llm_response.model_dump_json(exclude_none=True)),
+        )
+        return None
+
+
+_recorder: Optional[ModelRecorder] = None
+
+
+def install(mode: str, path: str = DEFAULT_FIXTURE_PATH, speed: float = 0.0) -> Optional[ModelRecorder]:
+    """
+    Enable fixture recording or replay for all agents.
+
+    Args:
+        mode: OFF, RECORD or REPLAY
+        path: Fixture file
+        speed: Replay speed multiplier; 0 answers instantly, 1 reproduces the
+            recorded latency
+
+    Returns:
+        The active recorder, or None when mode is OFF
+    """
+    global _recorder
+    if _recorder is not None:
+        callbacks.unregister_model_hooks(_recorder.before_model, _recorder.after_model)
+        _recorder = None
+    if mode == OFF:
+        return None
+    if mode not in (RECORD, REPLAY):
+        raise ValueError(f"Unknown fixture mode: {mode}")
+    if mode == REPLAY and not os.path.exists(path):
+        raise FileNotFoundError(f"Fixture file {path} does not exist; record it first")
+    _recorder = ModelRecorder(mode, FixtureStore(path), speed)
+    callbacks.register_model_hooks(_recorder.before_model, _recorder.after_model)
+    logger.info(f"Model fixtures: {mode} ({path})")
+    return _recorder
+
+
+def install_from_env() -> Optional[ModelRecorder]:
+    """Configure record/replay from LLM_FIXTURE_MODE, LLM_FIXTURE_PATH and LLM_REPLAY_SPEED."""
+    return install(
+        mode=os.getenv("LLM_FIXTURE_MODE", OFF).lower(),
+        path=os.getenv("LLM_FIXTURE_PATH", DEFAULT_FIXTURE_PATH),
+        speed=float(os.getenv("LLM_REPLAY_SPEED", "0")),
+    )
+
+
+def is_replaying() -> bool:
+    """True when model calls are served from fixtures instead of upstream."""
+    return _recorder is not None and _recorder.mode == REPLAY
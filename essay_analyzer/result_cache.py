@@ -0,0 +1,80 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Replica-local cache of completed analyses.
+
+Resubmitting the same essay (a page reload, a client retry, a student
+sending the same draft again) is answered from memory instead of the model.
+Essays are keyed by a fingerprint that ignores reflowed whitespace but keeps
+paragraph breaks, which the router also hashes on, so repeats of an essay
+reach the replica holding its result.
+"""
+
+import hashlib
+import re
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from .metrics import metrics
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_WHITESPACE = re.compile(r"\s+")
+
+CacheKey = Tuple[str, Tuple[str, ...], str]
+
+
+def essay_fingerprint(text: str) -> str:
+    """
+    Hash of an essay with whitespace within paragraphs normalized.
+
+    Paragraph breaks (blank lines) are kept, since the analysis of an
+    essay's structure depends on them.
+    """
+    paragraphs = (_WHITESPACE.sub(" ", p).strip() for p in _PARAGRAPH_BREAK.split(text.strip()))
+    normalized = "\n\n".join(p for p in paragraphs if p)
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """LRU cache of analysis results per essay, dimensions and output budget."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[CacheKey, Dict[str, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(text: str, dimensions: Tuple[str, ...], preset_name: str) -> CacheKey:
+        return (essay_fingerprint(text), dimensions, preset_name)
+
+    def get(self, key: CacheKey) -> Optional[Dict[str, Any]]:
+        """The cached result, or None; counts the hit or miss."""
+        result = self._entries.get(key)
+        if result is None:
+            metrics.increment("result_cache", outcome="miss")
+            return None
+        self._entries.move_to_end(key)
+        metrics.increment("result_cache", outcome="hit")
+        return dict(result)
+
+    def put(self, key: CacheKey, result: Dict[str, Any]) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = dict(result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -0,0 +1,282 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Columnar store of analysis results for corpus-scale analytics.
+
+Every finished analysis is appended to a SQLite table, which is the durable
+log shared by all server processes. In memory the results are held as one
+NumPy array per column (timestamps, dictionary-encoded user and cohort ids,
+ratings, overall score and text features), so aggregates over tens of
+thousands of essays are a handful of vectorized operations. Rows are kept in
+insertion order, which makes the timestamp column a sorted date index; user
+and cohort ids have per-value row indexes.
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .prompt import DIMENSIONS
+
+logger = logging.getLogger(__name__)
+
+RATING_COLUMNS = tuple(f"{dimension}Rating" for dimension in DIMENSIONS)
+FEATURE_COLUMNS = (
+    "word_count",
+    "sentence_count",
+    "paragraph_count",
+    "avg_sentence_length",
+    "lexical_diversity",
+    "flesch_reading_ease",
+    "transition_count",
+)
+NUMERIC_COLUMNS = ("overallScore",) + RATING_COLUMNS + FEATURE_COLUMNS
+
+_INITIAL_CAPACITY = 1024
+
+
+class _Dictionary:
+    """Dictionary encoding of a string column, with a row index per value."""
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+        self.values: List[str] = []
+        self._rows: List[List[int]] = []
+        self._cache: Dict[int, np.ndarray] = {}
+
+    def encode(self, value: str, row: int) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+            self._rows.append([])
+        self._rows[code].append(row)
+        self._cache.pop(code, None)
+        return code
+
+    def rows(self, value: str) -> np.ndarray:
+        """Row positions holding value, in insertion order."""
+        code = self.codes.get(value)
+        if code is None:
+            return np.empty(0, dtype=np.int64)
+        cached = self._cache.get(code)
+        if cached is None:
+            cached = self._cache[code] = np.asarray(self._rows[code], dtype=np.int64)
+        return cached
+
+
+class ResultsStore:
+    """Append-only SQLite log of results mirrored into NumPy columns."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            db_path, timeout=10, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        numeric = ", ".join(f"{name} REAL" for name in NUMERIC_COLUMNS)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "id INTEGER PRIMARY KEY, "
+            "created_at REAL NOT NULL, "
+            "user_id TEXT NOT NULL, "
+            "cohort TEXT NOT NULL, "
+            "degraded INTEGER NOT NULL, "
+            f"{numeric})"
+        )
+        self._size = 0
+        self._last_id = 0
+        self._sorted = True
+        self.created_at = np.empty(_INITIAL_CAPACITY, dtype=np.float64)
+        self.user_code = np.empty(_INITIAL_CAPACITY, dtype=np.int32)
+        self.cohort_code = np.empty(_INITIAL_CAPACITY, dtype=np.int32)
+        self.degraded = np.empty(_INITIAL_CAPACITY, dtype=bool)
+        self.numeric = {name: np.empty(_INITIAL_CAPACITY, dtype=np.float32) for name in NUMERIC_COLUMNS}
+        self.users = _Dictionary()
+        self.cohorts = _Dictionary()
+        self.refresh()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _reserve(self, extra: int) -> None:
+        needed = self._size + extra
+        capacity = len(self.created_at)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        self.created_at = np.resize(self.created_at, capacity)
+        self.user_code = np.resize(self.user_code, capacity)
+        self.cohort_code = np.resize(self.cohort_code, capacity)
+        self.degraded = np.resize(self.degraded, capacity)
+        for name in NUMERIC_COLUMNS:
+            self.numeric[name] = np.resize(self.numeric[name], capacity)
+
+    def _append_rows(self, rows: List[tuple]) -> None:
+        """Mirror (id, created_at, user_id, cohort, degraded, *numeric) rows into the columns."""
+        if not rows:
+            return
+        self._reserve(len(rows))
+        start, end = self._size, self._size + len(rows)
+        self.created_at[start:end] = [row[1] for row in rows]
+        self.user_code[start:end] = [self.users.encode(row[2], start + i) for i, row in enumerate(rows)]
+        self.cohort_code[start:end] = [self.cohorts.encode(row[3], start + i) for i, row in enumerate(rows)]
+        self.degraded[start:end] = [bool(row[4]) for row in rows]
+        for offset, name in enumerate(NUMERIC_COLUMNS, start=5):
+            self.numeric[name][start:end] = [np.nan if row[offset] is None else row[offset] for row in rows]
+        previous = self.created_at[start - 1] if start else -np.inf
+        if self._sorted and (previous > rows[0][1] or np.any(np.diff(self.created_at[start:end]) < 0)):
+            self._sorted = False
+        self._size = end
+        self._last_id = rows[-1][0]
+
+    def refresh(self) -> int:
+        """Load rows appended since the last refresh (including by other processes)."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, created_at, user_id, cohort, degraded, {', '.join(NUMERIC_COLUMNS)} "
+                "FROM results WHERE id > ? ORDER BY id",
+                (self._last_id,),
+            ).fetchall()
+            self._append_rows(rows)
+        return len(rows)
+
+    def add(self, record: Dict[str, Any]) -> None:
+        """Append one result; see add_many."""
+        self.add_many([record])
+
+    def add_many(self, records: Iterable[Dict[str, Any]]) -> int:
+        """
+        Append results in one transaction.
+
+        Args:
+            records: Dicts with user_id, optional cohort, created_at and
+                degraded, plus any of NUMERIC_COLUMNS (missing ones are NULL)
+
+        Returns:
+            Number of rows added
+        """
+        now = time.time()
+        values = [
+            (
+                record.get("created_at") or now,
+                record.get("user_id") or "anonymous",
+                record.get("cohort") or "",
+                int(bool(record.get("degraded"))),
+                *(record.get(name) for name in NUMERIC_COLUMNS),
+            )
+            for record in records
+        ]
+        placeholders = ", ".join("?" * (4 + len(NUMERIC_COLUMNS)))
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    f"INSERT INTO results (created_at, user_id, cohort, degraded, "
+                    f"{', '.join(NUMERIC_COLUMNS)}) VALUES ({placeholders})",
+                    values,
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        # Pick up our rows, and any other process's, in id order
+        self.refresh()
+        return len(values)
+
+    def column(self, name: str) -> np.ndarray:
+        """View of a numeric column over all stored rows."""
+        return self.numeric[name][: self._size]
+
+    def select(
+        self,
+        user_id: Optional[str] = None,
+        cohort: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        include_degraded: bool = False,
+    ) -> np.ndarray:
+        """
+        Row positions matching the filters.
+
+        The date range is resolved by binary search on the timestamp column,
+        user and cohort through their row indexes; the rest is masked.
+
+        Args:
+            user_id: Only this user's results
+            cohort: Only this cohort's (class's) results
+            since: Earliest created_at (epoch seconds), inclusive
+            until: Latest created_at (epoch seconds), exclusive
+            include_degraded: Include results from the local fallback analyzer
+
+        Returns:
+            Sorted int64 array of row positions
+        """
+        with self._lock:
+            size = self._size
+            created_at = self.created_at[:size]
+            if self._sorted:
+                lo = 0 if since is None else int(np.searchsorted(created_at, since, side="left"))
+                hi = size if until is None else int(np.searchsorted(created_at, until, side="left"))
+                rows = np.arange(lo, hi, dtype=np.int64)
+            else:
+                mask = np.ones(size, dtype=bool)
+                if since is not None:
+                    mask &= created_at >= since
+                if until is not None:
+                    mask &= created_at < until
+                rows = np.flatnonzero(mask)
+            for index, value in ((self.users, user_id), (self.cohorts, cohort)):
+                if value is not None:
+                    rows = np.intersect1d(rows, index.rows(value), assume_unique=True)
+            if not include_degraded and len(rows):
+                rows = rows[~self.degraded[rows]]
+        return rows
+
+
+def result_record(
+    result: Dict[str, Any],
+    features: Dict[str, Any],
+    user_id: Optional[str],
+    cohort: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Build a store record from an analysis result and the essay's text features.
+
+    Args:
+        result: Parsed analysis (ratings, overallScore, degraded)
+        features: Output of simple_analyzer.extract_features
+        user_id: User the analysis was for
+        cohort: Optional class or group id
+
+    Returns:
+        Record for ResultsStore.add
+    """
+    record: Dict[str, Any] = {
+        "user_id": user_id,
+        "cohort": cohort,
+        "degraded": result.get("degraded", False),
+    }
+    for name in ("overallScore",) + RATING_COLUMNS:
+        record[name] = result.get(name)
+    for name in FEATURE_COLUMNS:
+        record[name] = features.get(name)
+    return record
@@ -0,0 +1,289 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Affinity routing across analyzer replicas.
+
+Requests are consistent-hashed on a routing key (the essay fingerprint or
+the user id) onto a ring of replicas, each placed at many virtual points so
+load stays even. The same essay or user therefore keeps landing on the same
+replica, whose result cache, agent graphs and batching window are warm for
+it. When a replica joins or leaves only the keys on its arcs move. A replica
+that fails is skipped: its keys go to the next replica clockwise, which is
+exactly where they would live if it had left the ring.
+"""
+
+import asyncio
+import bisect
+import hashlib
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Mapping, Optional
+
+import httpx
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Points per replica; fewer leave the load noticeably uneven
+DEFAULT_VNODES = 160
+
+# Replica responses that mean "try another replica"
+RETRY_STATUSES = (503,)
+
+# Transport errors that mean the replica is gone; a read timeout does not
+# (the analysis may still be running) and is not retried elsewhere
+FAILOVER_ERRORS = (
+    httpx.ConnectError,
+    httpx.ConnectTimeout,
+    httpx.RemoteProtocolError,
+    httpx.ReadError,
+    httpx.WriteError,
+)
+
+# Headers that describe one connection and are not passed through
+HOP_BY_HOP_HEADERS = frozenset({
+    "connection", "keep-alive", "transfer-encoding", "content-length", "host", "upgrade",
+})
+
+
+@dataclass
+class Forwarded:
+    """A replica's response, read in full."""
+
+    replica: str
+    status_code: int
+    headers: Dict[str, str]
+    body: bytes
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hash ring with virtual nodes."""
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = DEFAULT_VNODES):
+        self.vnodes = vnodes
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        self._nodes: List[str] = []
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self) -> List[str]:
+        return list(self._nodes)
+
+    def add(self, node: str) -> None:
+        """Place a node on the ring; a no-op if it is already there."""
+        if node in self._nodes:
+            return
+        self._nodes.append(node)
+        for replica in range(self.vnodes):
+            point = _hash(f"{node}#{replica}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node: str) -> None:
+        """Take a node off the ring."""
+        if node not in self._nodes:
+            return
+        self._nodes.remove(node)
+        kept = [(p, o) for p, o in zip(self._points, self._owners) if o != node]
+        self._points = [p for p, _ in kept]
+        self._owners = [o for _, o in kept]
+
+    def lookup(self, key: str) -> Optional[str]:
+        """The node owning a key, or None for an empty ring."""
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[index]
+
+    def preference(self, key: str) -> List[str]:
+        """Every node in the order a key falls back to them, owner first."""
+        if not self._points:
+            return []
+        start = bisect.bisect(self._points, _hash(key))
+        order: List[str] = []
+        for offset in range(len(self._points)):
+            owner = self._owners[(start + offset) % len(self._points)]
+            if owner not in order:
+                order.append(owner)
+                if len(order) == len(self._nodes):
+                    break
+        return order
+
+
+class ReplicaRouter:
+    """Forwards requests to the replica owning their key, failing over clockwise."""
+
+    def __init__(
+        self,
+        replicas: Iterable[str],
+        vnodes: int = DEFAULT_VNODES,
+        down_seconds: float = 10.0,
+        timeout: float = 120.0,
+        client: Optional[httpx.AsyncClient] = None,
+    ):
+        """
+        Args:
+            replicas: Base URLs of the replicas, e.g. http://adk-api-1:8000
+            vnodes: Virtual points per replica on the ring
+            down_seconds: How long a failed replica is skipped before it is
+                tried again (health checks may restore it sooner)
+            timeout: Seconds a forwarded request may take
+            client: HTTP client to forward with; one with keep-alive pooling
+                is created if None
+        """
+        self.ring = HashRing((r.rstrip("/") for r in replicas), vnodes)
+        self.down_seconds = down_seconds
+        self.client = client or httpx.AsyncClient(timeout=timeout)
+        self._down_until: Dict[str, float] = {}
+
+    @property
+    def replicas(self) -> List[str]:
+        return self.ring.nodes
+
+    def add_replica(self, replica: str) -> None:
+        """A replica joins; only the keys on its new arcs move to it."""
+        self.ring.add(replica.rstrip("/"))
+        logger.info(f"Replica joined: {replica}")
+
+    def remove_replica(self, replica: str) -> None:
+        """A replica leaves; its keys move to their next replica clockwise."""
+        replica = replica.rstrip("/")
+        self.ring.remove(replica)
+        self._down_until.pop(replica, None)
+        logger.info(f"Replica left: {replica}")
+
+    def is_up(self, replica: str) -> bool:
+        return self._down_until.get(replica, 0.0) <= time.monotonic()
+
+    def mark_down(self, replica: str, reason: str) -> None:
+        if self.is_up(replica):
+            logger.warning(f"Replica {replica} marked down: {reason}")
+        self._down_until[replica] = time.monotonic() + self.down_seconds
+        metrics.increment("router_replica_failures", replica=replica, reason=reason)
+
+    def mark_up(self, replica: str) -> None:
+        if self._down_until.pop(replica, None) is not None:
+            logger.info(f"Replica {replica} is back up")
+
+    def candidates(self, key: str) -> List[str]:
+        """Replicas to try for a key: healthy ones in ring order, then the rest."""
+        order = self.ring.preference(key)
+        return [r for r in order if self.is_up(r)] + [r for r in order if not self.is_up(r)]
+
+    async def forward(
+        self,
+        key: str,
+        method: str,
+        path: str,
+        content: bytes = b"",
+        headers: Optional[Mapping[str, str]] = None,
+        params: Optional[Mapping[str, str]] = None,
+    ) -> Forwarded:
+        """
+        Send a request to the replica owning key, failing over on errors.
+
+        Lost connections and 503 (draining, warming up or out of
+        capacity) move on to the next replica; any other response, errors
+        included, is returned as is so an analysis is never run twice.
+
+        Returns:
+            Forwarded response with its body still content-encoded
+
+        Raises:
+            httpx.TransportError: If no replica could be reached
+        """
+        candidates = self.candidates(key)
+        if not candidates:
+            raise httpx.ConnectError("No replicas configured")
+        last_error: Optional[Exception] = None
+        # A 503 is kept in case no replica does better
+        unavailable: Optional[Forwarded] = None
+        for attempt, replica in enumerate(candidates):
+            try:
+                forwarded = await self.forward_to(replica, method, path, content, headers, params)
+            except FAILOVER_ERRORS as e:
+                last_error = e
+                self.mark_down(replica, type(e).__name__)
+                continue
+            if forwarded.status_code in RETRY_STATUSES:
+                # Without Retry-After the replica is draining or warming up;
+                # with it, it is only out of capacity right now
+                if "retry-after" not in forwarded.headers:
+                    self.mark_down(replica, f"status_{forwarded.status_code}")
+                unavailable = forwarded
+                continue
+            metrics.increment(
+                "router_requests", outcome="owner" if attempt == 0 else "failover"
+            )
+            return forwarded
+        if unavailable is not None:
+            metrics.increment("router_requests", outcome="unavailable")
+            return unavailable
+        raise last_error
+
+    async def forward_to(
+        self,
+        replica: str,
+        method: str,
+        path: str,
+        content: bytes = b"",
+        headers: Optional[Mapping[str, str]] = None,
+        params: Optional[Mapping[str, str]] = None,
+    ) -> Forwarded:
+        """Send a request to one replica, without failover."""
+        request = self.client.build_request(
+            method, f"{replica}{path}", content=content, headers=headers, params=params
+        )
+        response = await self.client.send(request, stream=True)
+        try:
+            # Raw bytes: a compressed body is passed on without recompressing
+            body = b"".join([chunk async for chunk in response.aiter_raw()])
+        finally:
+            await response.aclose()
+        headers = {
+            name: value for name, value in response.headers.items()
+            if name.lower() not in HOP_BY_HOP_HEADERS
+        }
+        return Forwarded(replica, response.status_code, headers, body)
+
+    async def check_health(self, path: str = "/health") -> Dict[str, bool]:
+        """Probe every replica once and update which ones are skipped."""
+        async def probe(replica: str) -> bool:
+            try:
+                response = await self.client.get(f"{replica}{path}", timeout=5.0)
+            except httpx.TransportError as e:
+                self.mark_down(replica, type(e).__name__)
+                return False
+            if response.status_code == 200:
+                self.mark_up(replica)
+                return True
+            self.mark_down(replica, f"status_{response.status_code}")
+            return False
+
+        replicas = self.replicas
+        results = await asyncio.gather(*(probe(r) for r in replicas))
+        return dict(zip(replicas, results))
+
+    async def close(self) -> None:
+        await self.client.aclose()
@@ -0,0 +1,179 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Response encoding for analysis payloads.
+
+Responses are serialized once, straight to bytes: pydantic models are
+dumped to plain data and encoded with orjson, or with MessagePack when the
+caller asks for it. Bodies above a size threshold are compressed with the
+best encoding the caller accepts (brotli, then gzip). MessagePack and
+brotli are optional; without their packages they are simply not offered.
+"""
+
+import gzip
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import numpy as np
+import orjson
+from pydantic import BaseModel
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+_MSGPACK_TYPES = (MSGPACK, "application/x-msgpack")
+
+GZIP = "gzip"
+BROTLI = "br"
+
+_ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+@dataclass(frozen=True)
+class EncodingSettings:
+    """Compression threshold and levels."""
+
+    # Smaller bodies are sent uncompressed; 0 disables compression
+    min_size: int = 1024
+    gzip_level: int = 6
+    brotli_quality: int = 4
+
+
+@dataclass
+class EncodedBody:
+    """A serialized, possibly compressed response body and its headers."""
+
+    body: bytes
+    media_type: str
+    content_encoding: Optional[str] = None
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        headers = {"Vary": "Accept, Accept-Encoding"}
+        if self.content_encoding:
+            headers["Content-Encoding"] = self.content_encoding
+        return headers
+
+
+def _default(value: Any) -> Any:
+    # Called by the encoders only for values they cannot handle natively, so
+    # plain dicts and lists are never walked in Python
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Type is not serializable: {type(value).__name__}")
+
+
+def dumps_json(content: Any) -> bytes:
+    """Compact UTF-8 JSON of models and plain data; NaN and infinities become null."""
+    return orjson.dumps(content, default=_default, option=_ORJSON_OPTIONS)
+
+
+def dumps_msgpack(content: Any) -> bytes:
+    """MessagePack encoding of the same data as dumps_json."""
+    if msgpack is None:
+        raise RuntimeError("MessagePack support requires the msgpack package")
+    return msgpack.packb(content, default=_default, use_bin_type=True)
+
+
+def _quality(header: Optional[str]) -> Dict[str, float]:
+    """Map each value of an Accept-style header to its q-value."""
+    qualities: Dict[str, float] = {}
+    for item in (header or "").split(","):
+        value, *params = item.split(";")
+        value = value.strip().lower()
+        if not value:
+            continue
+        q = 1.0
+        for param in params:
+            key, _, number = param.strip().partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(number)
+                except ValueError:
+                    q = 0.0
+        qualities[value] = q
+    return qualities
+
+
+def negotiate_media_type(accept: Optional[str]) -> str:
+    """MessagePack if the caller prefers it (and it is installed), otherwise JSON."""
+    if msgpack is None:
+        return JSON
+    qualities = _quality(accept)
+    packed = max((qualities.get(t, 0.0) for t in _MSGPACK_TYPES), default=0.0)
+    # Only an explicit preference selects the binary format
+    json_q = qualities.get(JSON, qualities.get("application/*", qualities.get("*/*", 0.0)))
+    return MSGPACK if packed > 0 and packed >= json_q else JSON
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Best supported content coding the caller accepts; brotli wins ties."""
+    qualities = _quality(accept_encoding)
+    wildcard = qualities.get("*", 0.0)
+    candidates = [BROTLI, GZIP] if brotli is not None else [GZIP]
+    best, best_q = None, 0.0
+    for coding in candidates:
+        q = qualities.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(body: bytes, coding: str, settings: EncodingSettings = EncodingSettings()) -> bytes:
+    """Compress a body with gzip or brotli."""
+    if coding == BROTLI:
+        return brotli.compress(body, quality=settings.brotli_quality)
+    return gzip.compress(body, compresslevel=settings.gzip_level, mtime=0)
+
+
+def encode_body(
+    content: Any,
+    accept: Optional[str] = None,
+    accept_encoding: Optional[str] = None,
+    settings: EncodingSettings = EncodingSettings(),
+) -> EncodedBody:
+    """
+    Serialize and, above the size threshold, compress a response.
+
+    Args:
+        content: Pydantic model, or plain data possibly containing models
+        accept: The request's Accept header
+        accept_encoding: The request's Accept-Encoding header
+        settings: Compression threshold and levels
+
+    Returns:
+        EncodedBody with the bytes to send and their media type and encoding
+    """
+    media_type = negotiate_media_type(accept)
+    body = dumps_msgpack(content) if media_type == MSGPACK else dumps_json(content)
+    coding = None
+    if settings.min_size and len(body) >= settings.min_size:
+        coding = negotiate_encoding(accept_encoding)
+        if coding is not None:
+            body = compress(body, coding, settings)
+    return EncodedBody(body, media_type, coding)
@@ -16,16 +16,13 @@
 
 from google.adk.agents.llm_agent import LlmAgent
 
+from .. import callbacks
+from ..budgets import DEFAULT_PRESET, PRESETS, OutputBudget, agent_config, length_instruction
+from ..models import shared_model
+
 MODEL = "gemini-2.5-flash"
 
-content_analyzer_agent = LlmAgent(
-    name="content_analyzer",
-    model=MODEL,
-    description=(
-        "Specialized agent for analyzing essay content quality, "
-        "argumentation, evidence usage, and critical thinking"
-    ),
-    instruction="""
+INSTRUCTION = """
 You are a Content and Argumentation Specialist. Your role is to analyze essays specifically for:
 
 1. **Argument Quality and Logic**:
@@ -66,6 +63,26 @@ Provide specific feedback that helps the writer strengthen their arguments and d
 Focus on substance over surface-level issues, and suggest ways to deepen analysis and improve argumentation.
 
 Respond with detailed content analysis that guides the writer toward more effective and persuasive writing.
-    """,
-    output_key="content_analysis"
-)
+"""
+
+
+def build_content_analyzer(budget: OutputBudget = PRESETS[DEFAULT_PRESET].content) -> LlmAgent:
+    """Build the content analyzer with the given output budget."""
+    return LlmAgent(
+        name="content_analyzer",
+        model=shared_model(MODEL),
+        description=(
+            "Specialized agent for analyzing essay content quality, "
+            "argumentation, evidence usage, and critical thinking"
+        ),
+        instruction=INSTRUCTION + length_instruction(budget),
+        output_key="content_analysis",
+        before_model_callback=callbacks.before_model,
+        after_model_callback=callbacks.after_model,
+        before_agent_callback=callbacks.before_agent,
+        after_agent_callback=callbacks.after_agent,
+        **agent_config(budget),
+    )
+
+
+content_analyzer_agent = build_content_analyzer()
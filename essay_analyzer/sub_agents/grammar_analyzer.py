@@ -14,18 +14,49 @@
 
 """Grammar and Language Mechanics Analyzer Sub-agent."""
 
+from typing import Any, Optional
+
 from google.adk.agents.llm_agent import LlmAgent
 
+from .. import callbacks, tracing
+from ..budgets import DEFAULT_PRESET, PRESETS, OutputBudget, agent_config, length_instruction
+from ..grammar_rules import check_grammar, format_findings
+from ..models import shared_model
+
 MODEL = "gemini-2.5-flash"
 
-grammar_analyzer_agent = LlmAgent(
-    name="grammar_analyzer",
-    model=MODEL,
-    description=(
-        "Specialized agent for analyzing grammar, sentence structure, "
-        "punctuation, word choice, and language mechanics in essays"
-    ),
-    instruction="""
+async def before_model(callback_context: Any, llm_request: Any) -> Optional[Any]:
+    """
+    Run the deterministic rule pre-pass over the text the agent was given and
+    add its findings to the instruction, then dispatch to the shared hooks.
+    """
+    essay_text = "\n".join(
+        part.text
+        for content in llm_request.contents
+        if content.role == "user"
+        for part in (content.parts or [])
+        if part.text
+    )
+    findings = check_grammar(essay_text)
+    tracing.set_attribute("grammar.rule_findings", len(findings))
+    if findings:
+        llm_request.append_instructions([
+            "Automated rule checks already found these mechanical issues:\n"
+            f"{format_findings(findings)}\n"
+            "Summarize them in one or two sentences instead of repeating each one, and "
+            "spend your feedback on what the rules cannot judge: agreement, tense, "
+            "modifiers, parallelism, clarity and word choice."
+        ])
+    else:
+        llm_request.append_instructions([
+            "Automated rule checks found no mechanical issues (doubled words, "
+            "confused words, a/an, spacing, serial commas, run-ons, quotes). Focus on "
+            "agreement, tense, modifiers, parallelism, clarity and word choice."
+        ])
+    return await callbacks.before_model(callback_context, llm_request)
+
+
+INSTRUCTION = """
 You are a Grammar and Language Mechanics Specialist. Your role is to analyze essays specifically for:
 
 1. **Grammatical Errors**:
@@ -60,6 +91,26 @@ Focus on the most significant issues first and explain why they matter for clari
 Be encouraging while being thorough in your analysis.
 
 Respond with detailed feedback that can help the writer understand and correct these issues.
-    """,
-    output_key="grammar_analysis"
-)
+"""
+
+
+def build_grammar_analyzer(budget: OutputBudget = PRESETS[DEFAULT_PRESET].grammar) -> LlmAgent:
+    """Build the grammar analyzer with the given output budget."""
+    return LlmAgent(
+        name="grammar_analyzer",
+        model=shared_model(MODEL),
+        description=(
+            "Specialized agent for analyzing grammar, sentence structure, "
+            "punctuation, word choice, and language mechanics in essays"
+        ),
+        instruction=INSTRUCTION + length_instruction(budget),
+        output_key="grammar_analysis",
+        before_model_callback=before_model,
+        after_model_callback=callbacks.after_model,
+        before_agent_callback=callbacks.before_agent,
+        after_agent_callback=callbacks.after_agent,
+        **agent_config(budget),
+    )
+
+
+grammar_analyzer_agent = build_grammar_analyzer()
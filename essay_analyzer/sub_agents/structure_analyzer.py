@@ -16,16 +16,13 @@
 
 from google.adk.agents.llm_agent import LlmAgent
 
+from .. import callbacks
+from ..budgets import DEFAULT_PRESET, PRESETS, OutputBudget, agent_config, length_instruction
+from ..models import shared_model
+
 MODEL = "gemini-2.5-flash"
 
-structure_analyzer_agent = LlmAgent(
-    name="structure_analyzer",
-    model=MODEL,
-    description=(
-        "Specialized agent for analyzing essay structure, organization, "
-        "flow, transitions, and overall coherence"
-    ),
-    instruction="""
+INSTRUCTION = """
 You are a Structure and Organization Specialist. Your role is to analyze essays specifically for:
 
 1. **Overall Structure**:
@@ -67,6 +64,26 @@ Suggest concrete organizational improvements and explain how they would enhance
 Consider the essay's purpose and audience when evaluating structure.
 
 Respond with detailed structural analysis that helps the writer improve organization and flow.
-    """,
-    output_key="structure_analysis"
-)
+"""
+
+
+def build_structure_analyzer(budget: OutputBudget = PRESETS[DEFAULT_PRESET].structure) -> LlmAgent:
+    """Build the structure analyzer with the given output budget."""
+    return LlmAgent(
+        name="structure_analyzer",
+        model=shared_model(MODEL),
+        description=(
+            "Specialized agent for analyzing essay structure, organization, "
+            "flow, transitions, and overall coherence"
+        ),
+        instruction=INSTRUCTION + length_instruction(budget),
+        output_key="structure_analysis",
+        before_model_callback=callbacks.before_model,
+        after_model_callback=callbacks.after_model,
+        before_agent_callback=callbacks.before_agent,
+        after_agent_callback=callbacks.after_agent,
+        **agent_config(budget),
+    )
+
+
+structure_analyzer_agent = build_structure_analyzer()
@@ -0,0 +1,367 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Lightweight OpenTelemetry-compatible tracing for the analysis pipeline.
+
+Spans are kept in a context variable so nesting follows the asyncio call
+graph: request -> runner -> tool call -> sub-agent -> model call. Finished
+traces are written as OTLP/JSON (one ExportTraceServiceRequest per line) to
+the file named by TRACE_EXPORT_PATH, and the most recent spans are also kept
+in an in-process collector. adk_trace_summary.py reads the file back.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from . import callbacks
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "adk-essay-analyzer"
+SCOPE_NAME = "essay_analyzer"
+
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+@dataclass
+class Span:
+    """One timed operation within a trace."""
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: Optional[str]
+    start_ns: int
+    end_ns: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    events: List[Tuple[str, int, Dict[str, Any]]] = field(default_factory=list)
+    status: int = STATUS_UNSET
+    status_message: str = ""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def add_event(self, name: str, **attributes: Any) -> None:
+        self.events.append((name, time.time_ns(), attributes))
+
+    def record_error(self, exc: BaseException) -> None:
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(exc).__name__}: {exc}"
+
+    @property
+    def duration(self) -> float:
+        """Duration in seconds (0 while the span is still open)."""
+        return ((self.end_ns or self.start_ns) - self.start_ns) / 1e9
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(v) for v in value]}}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items()]
+
+
+def span_to_otlp(span: Span) -> Dict[str, Any]:
+    """Convert a span to its OTLP/JSON representation."""
+    encoded = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": 1,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns or span.start_ns),
+        "attributes": _otlp_attributes(span.attributes),
+        "status": {"code": span.status},
+    }
+    if span.parent_span_id:
+        encoded["parentSpanId"] = span.parent_span_id
+    if span.status_message:
+        encoded["status"]["message"] = span.status_message
+    if span.events:
+        encoded["events"] = [
+            {"name": name, "timeUnixNano": str(ts), "attributes": _otlp_attributes(attrs)}
+            for name, ts, attrs in span.events
+        ]
+    return encoded
+
+
+def export_request(spans: List[Span]) -> Dict[str, Any]:
+    """Wrap spans in an OTLP ExportTraceServiceRequest."""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+            "scopeSpans": [{
+                "scope": {"name": SCOPE_NAME},
+                "spans": [span_to_otlp(span) for span in spans],
+            }],
+        }]
+    }
+
+
+class Tracer:
+    """Creates spans, groups them per trace and exports finished traces."""
+
+    def __init__(self, export_path: Optional[str] = None, keep_spans: int = 10000):
+        self.export_path = export_path
+        self.collected: Deque[Span] = deque(maxlen=keep_spans)
+        self._traces: Dict[str, List[Span]] = {}
+        self._lock = threading.Lock()
+
+    def start_span(self, name: str, parent: Optional[Span] = None, **attributes: Any) -> Span:
+        """Start a span under parent (or a new trace when parent is None)."""
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id if parent else secrets.token_hex(16),
+            span_id=secrets.token_hex(8),
+            parent_span_id=parent.span_id if parent else None,
+            start_ns=time.time_ns(),
+        )
+        for key, value in attributes.items():
+            span.set_attribute(key, value)
+        with self._lock:
+            self._traces.setdefault(span.trace_id, []).append(span)
+        return span
+
+    def end_span(self, span: Span) -> None:
+        """
+        Finish a span. Ending a root span exports its whole trace; spans of
+        that trace still open (e.g. a cancelled model call) are closed as errors.
+        """
+        if span.end_ns is not None:
+            return
+        span.end_ns = time.time_ns()
+        if span.status == STATUS_UNSET:
+            span.status = STATUS_OK
+        if span.parent_span_id is not None:
+            return
+        with self._lock:
+            spans = self._traces.pop(span.trace_id, [])
+            for unfinished in spans:
+                if unfinished.end_ns is None:
+                    unfinished.end_ns = span.end_ns
+                    unfinished.status = STATUS_ERROR
+                    unfinished.status_message = "Span not finished when its trace ended"
+            self.collected.extend(spans)
+        _discard_callback_spans(span.trace_id)
+        if spans and self.export_path:
+            self._export(spans)
+
+    def _export(self, spans: List[Span]) -> None:
+        line = json.dumps(export_request(spans), separators=(",", ":"))
+        try:
+            with self._lock:
+                with open(self.export_path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+        except OSError as e:
+            logger.warning(f"Failed to export trace to {self.export_path}: {e}")
+
+
+_tracer: Optional[Tracer] = None
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "essay_analyzer_current_span", default=None
+)
+
+
+def get_tracer() -> Optional[Tracer]:
+    """The configured tracer, or None when tracing is disabled."""
+    return _tracer
+
+
+def current_span() -> Optional[Span]:
+    """The innermost active span in this context."""
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """
+    Trace a block as a child of the current span.
+
+    Yields None (and records nothing) when tracing is disabled.
+    """
+    tracer = _tracer
+    if tracer is None:
+        yield None
+        return
+    active = tracer.start_span(name, parent=_current_span.get(), **attributes)
+    token = _current_span.set(active)
+    try:
+        yield active
+    except BaseException as e:
+        active.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        tracer.end_span(active)
+
+
+def set_attribute(key: str, value: Any) -> None:
+    """Set an attribute on the current span, if any."""
+    active = _current_span.get()
+    if active is not None:
+        active.set_attribute(key, value)
+
+
+def add_event(name: str, **attributes: Any) -> None:
+    """Add a timestamped event to the current span, if any."""
+    active = _current_span.get()
+    if active is not None:
+        active.add_event(name, **attributes)
+
+
+# Spans opened by ADK callbacks, closed by the matching after-callback.
+# Values are (span, span that was current before it was opened).
+_callback_spans: Dict[Any, Tuple[Span, Optional[Span]]] = {}
+
+
+def _discard_callback_spans(trace_id: str) -> None:
+    for key, (opened, _) in list(_callback_spans.items()):
+        if opened.trace_id == trace_id:
+            _callback_spans.pop(key, None)
+
+
+def _open_callback_span(key: Any, name: str, make_current: bool, **attributes: Any) -> None:
+    tracer = _tracer
+    if tracer is None:
+        return
+    parent = _current_span.get()
+    opened = tracer.start_span(name, parent=parent, **attributes)
+    _callback_spans[key] = (opened, parent)
+    if make_current:
+        _current_span.set(opened)
+
+
+def _close_callback_span(key: Any, restore: bool) -> Optional[Span]:
+    entry = _callback_spans.pop(key, None)
+    if entry is None or _tracer is None:
+        return None
+    closed, parent = entry
+    if restore:
+        _current_span.set(parent)
+    _tracer.end_span(closed)
+    return closed
+
+
+def _before_model(callback_context: Any, llm_request: Any) -> None:
+    key = ("model", callback_context.invocation_id, callback_context.agent_name)
+    _open_callback_span(
+        key,
+        f"model_call {callback_context.agent_name}",
+        make_current=False,
+        **{
+            "agent.name": callback_context.agent_name,
+            "llm.model": llm_request.model,
+            "llm.request.contents": len(llm_request.contents),
+        },
+    )
+
+
+def _after_model(callback_context: Any, llm_response: Any) -> None:
+    if getattr(llm_response, "partial", False):
+        return
+    key = ("model", callback_context.invocation_id, callback_context.agent_name)
+    entry = _callback_spans.get(key)
+    if entry is not None:
+        usage = getattr(llm_response, "usage_metadata", None)
+        if usage is not None:
+            entry[0].set_attribute("llm.usage.prompt_tokens", usage.prompt_token_count)
+            entry[0].set_attribute("llm.usage.output_tokens", usage.candidates_token_count)
+            entry[0].set_attribute("llm.usage.thoughts_tokens", getattr(usage, "thoughts_token_count", None))
+        if getattr(llm_response, "error_code", None):
+            entry[0].status = STATUS_ERROR
+            entry[0].status_message = str(llm_response.error_code)
+    _close_callback_span(key, restore=False)
+
+
+def _before_agent(callback_context: Any) -> None:
+    key = ("agent", callback_context.invocation_id, callback_context.agent_name)
+    _open_callback_span(
+        key,
+        f"agent {callback_context.agent_name}",
+        make_current=True,
+        **{"agent.name": callback_context.agent_name},
+    )
+
+
+def _after_agent(callback_context: Any) -> None:
+    key = ("agent", callback_context.invocation_id, callback_context.agent_name)
+    _close_callback_span(key, restore=True)
+
+
+def _before_tool(tool: Any, args: Dict[str, Any], tool_context: Any) -> None:
+    key = ("tool", tool_context.function_call_id)
+    _open_callback_span(
+        key,
+        f"tool {tool.name}",
+        make_current=True,
+        **{"tool.name": tool.name, "tool.args.chars": len(json.dumps(args, default=str))},
+    )
+
+
+def _after_tool(tool: Any, args: Dict[str, Any], tool_context: Any, tool_response: Any) -> None:
+    key = ("tool", tool_context.function_call_id)
+    closed = _close_callback_span(key, restore=True)
+    if closed is not None:
+        closed.set_attribute("tool.response.chars", len(json.dumps(tool_response, default=str)))
+
+
+def configure(export_path: Optional[str], keep_spans: int = 10000) -> Tracer:
+    """
+    Enable tracing and hook it into every agent's callbacks.
+
+    Args:
+        export_path: OTLP/JSON lines file to append finished traces to, or
+            None to only keep spans in memory
+        keep_spans: Size of the in-process span collector
+
+    Returns:
+        The active tracer
+    """
+    global _tracer
+    _tracer = Tracer(export_path, keep_spans)
+    callbacks.register_model_hooks(_before_model, _after_model)
+    callbacks.register_agent_hooks(_before_agent, _after_agent)
+    callbacks.register_tool_hooks(_before_tool, _after_tool)
+    logger.info(f"Tracing enabled{f', exporting to {export_path}' if export_path else ''}")
+    return _tracer
+
+
+def configure_from_env() -> Optional[Tracer]:
+    """Enable tracing when TRACE_EXPORT_PATH (or TRACE_IN_MEMORY=1) is set."""
+    export_path = os.getenv("TRACE_EXPORT_PATH")
+    if export_path or os.getenv("TRACE_IN_MEMORY") == "1":
+        return configure(export_path or None)
+    return None
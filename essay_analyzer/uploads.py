@@ -0,0 +1,366 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Streaming essay uploads.
+
+Request bodies (plain text or a multipart file) are consumed chunk by chunk:
+bytes are decoded incrementally, whitespace and line endings are normalized
+and words are counted as they arrive, so byte and word limits reject an
+oversize upload as soon as it crosses them. Only the normalized text is
+kept, as a list of pieces joined once at the end.
+"""
+
+import codecs
+import re
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+# Characters other than \n and \t that never belong in an essay
+_CONTROL_CHARS = r"\x00-\x08\x0b\x0c\x0e-\x1f\x7f\u200b\ufeff"
+_CONTROL = re.compile(f"[{_CONTROL_CHARS}]")
+# Matched against a reversed chunk: its partial last word, then the run of
+# whitespace (or control characters) before it
+_REVERSED_TAIL = re.compile(f"[^\\s{_CONTROL_CHARS}]*[\\s{_CONTROL_CHARS}]*")
+# Line breaks other than \n (after \r\n has been replaced)
+_LINE_BREAKS = "\r\u2028\u2029\x85"
+_NEWLINES = re.compile(f"[{_LINE_BREAKS}]")
+
+# Carry-over past this many characters is collapsed (whitespace) or emitted
+# as the start of a word the next piece continues
+_MAX_CARRY = 4096
+_MAX_HEADER_BYTES = 16 * 1024
+
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+
+# Multipart fields that may carry the essay when no part has a filename
+TEXT_FIELDS = ("file", "essay", "text")
+
+
+class UploadTooLarge(Exception):
+    """Raised as soon as an upload crosses the byte or word limit."""
+
+    def __init__(self, limit: str, maximum: int):
+        super().__init__(f"Upload exceeds the {maximum} {limit} limit")
+        self.limit = limit
+        self.maximum = maximum
+
+
+class UnsupportedUpload(ValueError):
+    """Raised for a content type the upload endpoint does not accept."""
+
+
+@dataclass
+class Upload:
+    """Normalized essay text and what it took to read it."""
+
+    text: str
+    bytes_read: int
+    words: int
+    filename: Optional[str] = None
+
+
+def _normalize_newlines(text: str) -> str:
+    text = text.replace("\r\n", "\n")
+    # Substring checks are far cheaper than a regex scan of clean text
+    if any(c in text for c in _LINE_BREAKS):
+        text = _NEWLINES.sub("\n", text)
+    return text
+
+
+def _collapse_whitespace(text: str) -> str:
+    newlines = text.count("\n")
+    return "\n\n" if newlines > 1 else "\n" if newlines else " "
+
+
+class TextNormalizer:
+    """
+    Incremental decoder and whitespace normalizer with a running word count.
+
+    Line endings become \\n, runs of spaces and tabs a single space, more than
+    one blank line a single blank line; control characters are dropped and
+    the text is stripped. Each chunk's trailing whitespace and partial word is
+    carried into the next, so no run is split across pieces; a word longer
+    than the carry limit is emitted in parts that the pieces join up again.
+    """
+
+    def __init__(self, encoding: str = "utf-8", max_words: int = 0):
+        self.encoding = encoding
+        self.max_words = max_words
+        self.words = 0
+        self.pieces: List[str] = []
+        self._decoder = None
+        self._head = b""
+        self._carry = ""
+
+    @property
+    def started(self) -> bool:
+        """Whether decoding has begun, after which the encoding is fixed."""
+        return self._decoder is not None
+
+    def _start(self, data: bytes) -> bytes:
+        # A byte order mark overrides the declared charset
+        encoding = self.encoding
+        for bom, name in _BOMS:
+            if data.startswith(bom):
+                encoding, data = name, data[len(bom):]
+                break
+        try:
+            self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        except LookupError:
+            raise UnsupportedUpload(f"Unknown charset: {encoding}") from None
+        return data
+
+    def feed(self, data: bytes) -> None:
+        """Decode and normalize the next chunk of the upload."""
+        if self._decoder is None:
+            # Wait for enough bytes to recognize a byte order mark
+            self._head += data
+            if len(self._head) < 3:
+                return
+            data, self._head = self._start(self._head), b""
+        self._emit(self._decoder.decode(data), final=False)
+
+    def finish(self) -> str:
+        """Flush the decoder and return the normalized text."""
+        if self._decoder is None:
+            data, self._head = self._start(self._head), b""
+            text = self._decoder.decode(data, final=True)
+        else:
+            text = self._decoder.decode(b"", final=True)
+        self._emit(text, final=True)
+        return "".join(self.pieces)
+
+    def _hold_back(self, text: str) -> str:
+        """
+        Carry the trailing run of whitespace (or control characters) and any
+        partial word of a decoded chunk into the next; return the rest.
+
+        Only the new chunk is scanned, and the carry stays bounded, so input
+        without whitespace is still read in linear time.
+        """
+        end = len(text) - _REVERSED_TAIL.match(text[::-1]).end()
+        if end:
+            text, self._carry = self._carry + text[:end], text[end:]
+            return text
+        carry = self._carry + text
+        if len(carry) <= _MAX_CARRY:
+            self._carry = carry
+            return ""
+        end = len(carry) - _REVERSED_TAIL.match(carry[::-1]).end()
+        text, carry = carry[:end], carry[end:]
+        if len(carry) > _MAX_CARRY:
+            if not carry.strip():
+                carry = _collapse_whitespace(_normalize_newlines(carry))
+            else:
+                # An overlong word: the next piece carries on from this one
+                text, carry = text + carry, ""
+        self._carry = carry
+        return text
+
+    def _emit(self, text: str, final: bool) -> None:
+        if final:
+            text, self._carry = self._carry + text, ""
+        else:
+            text = self._hold_back(text)
+        if not text:
+            return
+        # Each line is rebuilt from its words, which collapses every kind of
+        # horizontal whitespace in C; a regex per rule is several times slower
+        lines: List[str] = []
+        lead = ""
+        for line in _normalize_newlines(text).split("\n"):
+            if not line.isprintable():
+                # Tabs, odd spaces or control characters
+                line = _CONTROL.sub("", line)
+            words = line.split()
+            if words:
+                if not lines and line[0].isspace():
+                    lead = lead or " "
+                self.words += len(words)
+                lines.append(" ".join(words))
+            elif lines:
+                if lines[-1]:
+                    lines.append("")
+            else:
+                # Line breaks before the first word of this piece
+                lead = "\n\n" if lead else "\n"
+        while lines and not lines[-1]:
+            lines.pop()
+        if not lines:
+            return
+        text = "\n".join(lines)
+        if self.pieces:
+            # Whitespace carried over from the previous piece separates the
+            # two; without any, this piece's first word continues the last one
+            text = lead + text
+            if not lead:
+                self.words -= 1
+        if self.max_words and self.words > self.max_words:
+            raise UploadTooLarge("words", self.max_words)
+        self.pieces.append(text)
+
+
+def parse_content_type(value: str) -> Tuple[str, Dict[str, str]]:
+    """Split a Content-Type (or Content-Disposition) header into its value and parameters."""
+    value, *params = value.split(";")
+    parsed = {}
+    for param in params:
+        key, _, item = param.strip().partition("=")
+        if key:
+            parsed[key.strip().lower()] = item.strip().strip('"')
+    return value.strip().lower(), parsed
+
+
+class MultipartReader:
+    """
+    Streaming multipart/form-data parser that passes on the essay part only.
+
+    The essay is the first part that has a filename or is named file, essay
+    or text. Everything else is skipped without being stored.
+    """
+
+    def __init__(self, boundary: str):
+        self._delimiter = b"--" + boundary.encode("latin-1")
+        self._separator = b"\r\n" + self._delimiter
+        self._buffer = bytearray()
+        self._state = "preamble"
+        self._selected = False
+        self.done = False
+        self.filename: Optional[str] = None
+        self.charset: Optional[str] = None
+        self.found = False
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """Consume a chunk and return the essay bytes it completed."""
+        self._buffer += data
+        out: List[bytes] = []
+        while True:
+            if self._state == "preamble":
+                index = self._buffer.find(self._delimiter)
+                if index < 0:
+                    del self._buffer[: max(0, len(self._buffer) - len(self._delimiter))]
+                    return out
+                del self._buffer[: index + len(self._delimiter)]
+                self._state = "after_delimiter"
+            elif self._state == "after_delimiter":
+                if len(self._buffer) < 2:
+                    return out
+                if self._buffer[:2] == b"--":
+                    self._state = "epilogue"
+                    self.done = True
+                    self._buffer.clear()
+                    return out
+                del self._buffer[:2]
+                self._state = "headers"
+            elif self._state == "headers":
+                index = self._buffer.find(b"\r\n\r\n")
+                if index < 0:
+                    if len(self._buffer) > _MAX_HEADER_BYTES:
+                        raise ValueError("Multipart part headers too large")
+                    return out
+                self._select(bytes(self._buffer[:index]))
+                del self._buffer[: index + 4]
+                self._state = "body"
+            elif self._state == "body":
+                index = self._buffer.find(self._separator)
+                if index < 0:
+                    keep = len(self._separator) - 1
+                    if len(self._buffer) > keep:
+                        if self._selected:
+                            out.append(bytes(self._buffer[:-keep]))
+                        del self._buffer[:-keep]
+                    return out
+                if self._selected:
+                    out.append(bytes(self._buffer[:index]))
+                    self._selected = False
+                del self._buffer[: index + len(self._separator)]
+                self._state = "after_delimiter"
+            else:
+                self._buffer.clear()
+                return out
+
+    def _select(self, raw_headers: bytes) -> None:
+        headers = {}
+        for line in raw_headers.decode("latin-1").split("\r\n"):
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        _, disposition = parse_content_type(headers.get("content-disposition", ""))
+        filename = disposition.get("filename")
+        if self.found or not (filename is not None or disposition.get("name") in TEXT_FIELDS):
+            return
+        _, params = parse_content_type(headers.get("content-type", "text/plain"))
+        self.found = self._selected = True
+        self.filename = filename
+        self.charset = params.get("charset")
+
+
+async def read_upload(
+    stream: AsyncIterator[bytes],
+    content_type: str,
+    max_bytes: int,
+    max_words: int,
+) -> Upload:
+    """
+    Read and normalize an essay upload without buffering the raw body.
+
+    Args:
+        stream: Request body chunks
+        content_type: The request's Content-Type header
+        max_bytes: Largest accepted body in bytes (0 = unlimited)
+        max_words: Most words accepted after normalization (0 = unlimited)
+
+    Returns:
+        Upload with the normalized text
+
+    Raises:
+        UploadTooLarge: As soon as a limit is crossed
+        UnsupportedUpload: For other content types or unknown charsets
+        ValueError: For malformed multipart bodies or uploads without an essay
+    """
+    media_type, params = parse_content_type(content_type or "text/plain")
+    reader: Optional[MultipartReader] = None
+    if media_type == "multipart/form-data":
+        if "boundary" not in params:
+            raise ValueError("Multipart upload without a boundary")
+        reader = MultipartReader(params["boundary"])
+    elif not (media_type.startswith("text/") or media_type == "application/octet-stream"):
+        raise UnsupportedUpload(f"Unsupported upload type: {media_type}")
+
+    normalizer = TextNormalizer(params.get("charset", "utf-8"), max_words)
+    bytes_read = 0
+    async for chunk in stream:
+        bytes_read += len(chunk)
+        if max_bytes and bytes_read > max_bytes:
+            raise UploadTooLarge("bytes", max_bytes)
+        if reader is None:
+            normalizer.feed(chunk)
+            continue
+        for data in reader.feed(chunk):
+            if reader.charset and not normalizer.started:
+                normalizer.encoding = reader.charset
+            normalizer.feed(data)
+    if reader is not None and not reader.found:
+        raise ValueError(f"Multipart upload has no file or {'/'.join(TEXT_FIELDS)} field")
+    text = normalizer.finish()
+    return Upload(
+        text=text,
+        bytes_read=bytes_read,
+        words=normalizer.words,
+        filename=reader.filename if reader else None,
+    )
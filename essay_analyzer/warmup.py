@@ -0,0 +1,137 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Startup warm-up.
+
+Work that would otherwise land on the first live requests (building agent
+graphs and runners, compiling the grammar rules, opening TLS connections to
+the model backend, optionally a small synthetic analysis) runs as a sequence
+of named steps before the server reports itself ready. A failing step is
+logged and skipped: warm-up makes the instance faster, never unavailable.
+"""
+
+import asyncio
+import inspect
+import itertools
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+READY = "ready"
+
+Step = Callable[[], Union[Any, Awaitable[Any]]]
+
+# Essay for warming the analyzers (and the optional synthetic model analysis)
+WARMUP_ESSAY = (
+    "Reading every day helps students learn new words. It also improves their "
+    "focus, and it can be be fun when they choose their own books."
+)
+
+
+class WarmUp:
+    """Ordered warm-up steps and the readiness they gate."""
+
+    def __init__(self):
+        self.status = PENDING
+        self._steps: List[Tuple[str, Step]] = []
+        self.durations: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self.timed_out = False
+        self.total_seconds = 0.0
+        metrics.set_gauge("server_warm", 0)
+
+    @property
+    def ready(self) -> bool:
+        return self.status == READY
+
+    def add(self, name: str, step: Step) -> None:
+        """Append a step; it may be a plain or async callable."""
+        self._steps.append((name, step))
+
+    def skip(self) -> None:
+        """Mark the instance ready without warming up."""
+        self.status = READY
+        metrics.set_gauge("server_warm", 1)
+
+    async def run(self, timeout: Optional[float] = None) -> None:
+        """
+        Run every step in order, then mark the instance ready.
+
+        Args:
+            timeout: Seconds the whole warm-up may take; steps still running
+                at the deadline are abandoned
+        """
+        self.status = RUNNING
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._run_steps(), timeout)
+        except asyncio.TimeoutError:
+            self.timed_out = True
+            logger.warning(f"Warm-up did not finish within {timeout:.0f}s; serving anyway")
+        self.total_seconds = time.perf_counter() - started
+        self.status = READY
+        metrics.set_gauge("server_warm", 1)
+        logger.info(
+            f"Warm-up finished in {self.total_seconds:.2f}s: "
+            + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.durations.items())
+        )
+
+    async def _run_steps(self) -> None:
+        for name, step in self._steps:
+            started = time.perf_counter()
+            try:
+                result = step()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                self.errors[name] = str(e)
+                logger.warning(f"Warm-up step {name} failed: {e}")
+            self.durations[name] = time.perf_counter() - started
+            metrics.set_gauge("warmup_step_seconds", self.durations[name], step=name)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Status and per-step timings, for health reporting."""
+        return {
+            "status": self.status,
+            "total_seconds": round(self.total_seconds, 3),
+            "steps": {name: round(seconds, 3) for name, seconds in self.durations.items()},
+            "errors": self.errors,
+            "timed_out": self.timed_out,
+        }
+
+
+def prebuild_agents(presets) -> int:
+    """
+    Build the coordinator graph for every dimension combination and preset.
+
+    Returns:
+        Number of coordinators built
+    """
+    from .agent import build_coordinator
+    from .prompt import DIMENSIONS
+
+    built = 0
+    for preset in presets:
+        for size in range(1, len(DIMENSIONS) + 1):
+            for combo in itertools.combinations(DIMENSIONS, size):
+                build_coordinator(combo, preset)
+                built += 1
+    return built
@@ -13,50 +13,219 @@
 # limitations under the License.
 
 """
-Simple essay analyzer that works without ADK initially.
-This will be upgraded to use ADK once dependencies are installed.
+Simple essay analyzer that works without ADK.
+
+Computes local text features and heuristic ratings in a few milliseconds. It
+is the fallback the API server serves, marked as degraded, when the upstream
+model is slow or unavailable.
 """
 
 import json
+import math
+import re
 import sys
-from typing import Dict, Any
+from collections import Counter
+from typing import Any, Dict, List
+
+_SENTENCE_RE = re.compile(r"[^.!?]+(?:[.!?]+|$)")
+_WORD_RE = re.compile(r"[A-Za-z]+(?:'[A-Za-z]+)?")
+_DOUBLED_WORD_RE = re.compile(r"\b(\w+)\s+\1\b", re.IGNORECASE)
+_LOWERCASE_I_RE = re.compile(r"(?<![\w'])i(?![\w'])")
+_MISSING_SPACE_RE = re.compile(r"[a-z][,.;:!?][A-Za-z]")
+_DOUBLE_SPACE_RE = re.compile(r"[^\S\n]{2,}")
+
+TRANSITION_WORDS = {
+    "however", "therefore", "furthermore", "moreover", "consequently", "additionally",
+    "finally", "first", "second", "third", "meanwhile", "nevertheless", "similarly",
+    "conversely", "thus", "hence", "instead", "ultimately", "overall", "although",
+    "because", "since", "while", "whereas", "also", "besides", "indeed", "specifically",
+}
+
+EVIDENCE_MARKERS = {
+    "example", "instance", "according", "research", "study", "studies", "evidence",
+    "data", "percent", "survey", "shows", "demonstrates", "suggests", "report",
+}
+
+COMMON_MISSPELLINGS = {
+    "teh": "the", "recieve": "receive", "definately": "definitely", "seperate": "separate",
+    "occured": "occurred", "untill": "until", "wich": "which", "alot": "a lot",
+    "becuase": "because", "thier": "their", "beleive": "believe", "goverment": "government",
+    "enviroment": "environment", "arguement": "argument", "occurence": "occurrence",
+    "neccessary": "necessary", "accomodate": "accommodate", "begining": "beginning",
+    "existance": "existence", "independant": "independent", "tommorow": "tomorrow",
+    "wierd": "weird", "truely": "truly", "publically": "publicly",
+    "acheive": "achieve", "concious": "conscious", "foriegn": "foreign", "grammer": "grammar",
+    "occassion": "occasion", "posession": "possession", "realy": "really", "succesful": "successful",
+    "suprise": "surprise", "tounge": "tongue", "writting": "writing", "freind": "friend",
+}
+
+
+def _syllables(word: str) -> int:
+    word = word.lower()
+    groups = re.findall(r"[aeiouy]+", word)
+    count = len(groups)
+    if word.endswith("e") and count > 1 and not word.endswith("le"):
+        count -= 1
+    return max(1, count)
+
+
+def extract_features(essay_text: str) -> Dict[str, Any]:
+    """
+    Compute local text features used for heuristic scoring and analytics.
+
+    Args:
+        essay_text: The essay text
+
+    Returns:
+        Dictionary of counts, ratios and detected issues
+    """
+    words = _WORD_RE.findall(essay_text)
+    lowered = [w.lower() for w in words]
+    sentences = [s.strip() for s in _SENTENCE_RE.findall(essay_text) if _WORD_RE.search(s)]
+    paragraphs = [p for p in re.split(r"\n\s*\n", essay_text) if p.strip()]
+    sentence_lengths = [len(_WORD_RE.findall(s)) for s in sentences] or [0]
+
+    word_count = len(words)
+    sentence_count = len(sentences)
+    mean_length = sum(sentence_lengths) / len(sentence_lengths)
+    variance = sum((n - mean_length) ** 2 for n in sentence_lengths) / len(sentence_lengths)
+    syllables = sum(_syllables(w) for w in words)
+
+    if word_count and sentence_count:
+        flesch = 206.835 - 1.015 * (word_count / sentence_count) - 84.6 * (syllables / word_count)
+    else:
+        flesch = 0.0
+
+    counts = Counter(lowered)
+    misspellings = sorted({w for w in lowered if w in COMMON_MISSPELLINGS})
+
+    return {
+        "word_count": word_count,
+        "sentence_count": sentence_count,
+        "paragraph_count": len(paragraphs),
+        "avg_sentence_length": round(mean_length, 2),
+        "sentence_length_stdev": round(math.sqrt(variance), 2),
+        "long_sentences": sum(1 for n in sentence_lengths if n > 35),
+        "short_sentences": sum(1 for n in sentence_lengths if 0 < n < 5),
+        "lexical_diversity": round(len(counts) / word_count, 3) if word_count else 0.0,
+        "transition_count": sum(counts[w] for w in TRANSITION_WORDS),
+        "evidence_markers": sum(counts[w] for w in EVIDENCE_MARKERS),
+        "flesch_reading_ease": round(flesch, 1),
+        "doubled_words": [m.group(0) for m in _DOUBLED_WORD_RE.finditer(essay_text)],
+        "lowercase_i": len(_LOWERCASE_I_RE.findall(essay_text)),
+        "lowercase_sentence_starts": sum(1 for s in sentences if s[0].islower()),
+        "missing_spaces": len(_MISSING_SPACE_RE.findall(essay_text)),
+        "double_spaces": len(_DOUBLE_SPACE_RE.findall(essay_text)),
+        "misspellings": misspellings,
+    }
+
+
+def _clamp_rating(value: float) -> int:
+    return max(1, min(5, int(round(value))))
+
+
+def _join(points: List[str]) -> str:
+    return " ".join(points)
+
 
 def analyze_essay_simple(essay_text: str) -> Dict[str, Any]:
     """
-    Simple essay analysis that provides basic feedback.
-    This is a fallback when ADK is not available.
+    Heuristic essay analysis with per-dimension feedback and 1-5 ratings.
+
+    Returns the same fields as the ADK analysis, plus the raw features.
     """
-    word_count = len(essay_text.split())
-    sentence_count = essay_text.count('.') + essay_text.count('!') + essay_text.count('?')
-    paragraph_count = len([p for p in essay_text.split('\n\n') if p.strip()])
-    
-    # Simple scoring based on length and structure
-    score = 50  # Base score
-    
-    if word_count >= 250:
-        score += 15
-    elif word_count >= 150:
-        score += 10
-    elif word_count >= 100:
-        score += 5
-    
-    if paragraph_count >= 3:
-        score += 10
-    elif paragraph_count >= 2:
-        score += 5
-    
-    if sentence_count >= 5:
-        score += 10
-    
-    # Cap at 100
-    score = min(score, 100)
-    
+    f = extract_features(essay_text)
+    word_count = f["word_count"]
+    sentence_count = f["sentence_count"]
+    paragraph_count = f["paragraph_count"]
+
+    # Grammar: sentence control and mechanical slips
+    grammar_issues = len(f["doubled_words"]) + f["lowercase_i"] + f["missing_spaces"]
+    grammar = 4.5 - 0.5 * grammar_issues - 0.5 * f["long_sentences"]
+    if f["sentence_length_stdev"] < 3 and sentence_count >= 5:
+        grammar -= 0.5
+    grammar_points = [
+        f"Your essay has {sentence_count} sentences averaging {f['avg_sentence_length']} words."
+    ]
+    if f["long_sentences"]:
+        grammar_points.append(
+            f"{f['long_sentences']} sentence(s) run past 35 words; consider splitting them for clarity."
+        )
+    if f["sentence_length_stdev"] < 3 and sentence_count >= 5:
+        grammar_points.append("Sentence lengths are very uniform; vary them to improve rhythm.")
+    if f["doubled_words"]:
+        grammar_points.append(f"Repeated words found: {', '.join(repr(w) for w in f['doubled_words'][:3])}.")
+    if f["missing_spaces"]:
+        grammar_points.append("Some punctuation marks are not followed by a space.")
+    if grammar_issues == 0 and not f["long_sentences"]:
+        grammar_points.append("No mechanical grammar issues were detected automatically.")
+
+    # Structure: paragraphing, length and signposting
+    structure = 1.5
+    structure += min(paragraph_count, 5) * 0.5
+    structure += 0.5 if word_count >= 250 else 0.0
+    structure += 0.5 if f["transition_count"] >= max(2, sentence_count // 5) else 0.0
+    structure_points = [f"Your essay has {paragraph_count} paragraph(s) and {word_count} words."]
+    if paragraph_count < 3:
+        structure_points.append(
+            "Aim for a clear introduction, body paragraphs with supporting details, and a conclusion."
+        )
+    if f["transition_count"] < 2:
+        structure_points.append("Add transitions (however, therefore, for example) to connect ideas.")
+    else:
+        structure_points.append(f"You use {f['transition_count']} transition words to guide the reader.")
+
+    # Content: development, evidence and vocabulary range
+    content = 2.0
+    content += 1.0 if word_count >= 150 else 0.0
+    content += 0.5 if word_count >= 300 else 0.0
+    content += 0.5 if f["evidence_markers"] >= 2 else 0.0
+    content += 0.5 if f["lexical_diversity"] >= 0.5 else 0.0
+    content_points = []
+    if word_count < 150:
+        content_points.append("Develop your ideas further; the essay is brief for a full argument.")
+    if f["evidence_markers"] < 2:
+        content_points.append("Support your claims with specific examples, data or sources.")
+    else:
+        content_points.append("You refer to evidence or examples to support your points.")
+    content_points.append(
+        f"Vocabulary diversity is {f['lexical_diversity']:.2f} "
+        f"and reading ease is {f['flesch_reading_ease']:.0f} (Flesch)."
+    )
+
+    # Spelling: known misspellings and capitalization
+    spelling_issues = len(f["misspellings"]) + f["lowercase_sentence_starts"] + f["double_spaces"]
+    spelling = 5.0 - 0.75 * len(f["misspellings"]) - 0.5 * (f["lowercase_sentence_starts"] + f["lowercase_i"])
+    spelling_points = []
+    if f["misspellings"]:
+        fixes = ", ".join(f"{w} -> {COMMON_MISSPELLINGS[w]}" for w in f["misspellings"][:5])
+        spelling_points.append(f"Possible misspellings: {fixes}.")
+    if f["lowercase_sentence_starts"] or f["lowercase_i"]:
+        spelling_points.append("Check capitalization at sentence starts and of the pronoun 'I'.")
+    if f["double_spaces"]:
+        spelling_points.append("Remove extra spaces between words.")
+    if not spelling_issues:
+        spelling_points.append("No common misspellings were detected; still proofread for typos.")
+
+    ratings = {
+        "grammarRating": _clamp_rating(grammar),
+        "structureRating": _clamp_rating(structure),
+        "contentRating": _clamp_rating(content),
+        "spellingRating": _clamp_rating(spelling),
+    }
+    score = int(round(sum(ratings.values()) / len(ratings) * 20))
+
     return {
-        "grammarFeedback": f"Your essay has {sentence_count} sentences. Consider varying sentence length and structure for better flow. Check for proper punctuation and grammar throughout.",
-        "structureFeedback": f"Your essay has {paragraph_count} paragraphs and {word_count} words. Ensure you have a clear introduction, body paragraphs with supporting details, and a strong conclusion.",
-        "contentFeedback": f"Your essay demonstrates engagement with the topic. Consider adding more specific examples and evidence to support your arguments. Develop your ideas more thoroughly.",
-        "spellingFeedback": "Please review your essay for any spelling errors or typos. Consider using a spell-checker to catch any mistakes.",
-        "overallScore": score
+        "grammarFeedback": _join(grammar_points),
+        "grammarRating": ratings["grammarRating"],
+        "structureFeedback": _join(structure_points),
+        "structureRating": ratings["structureRating"],
+        "contentFeedback": _join(content_points),
+        "contentRating": ratings["contentRating"],
+        "spellingFeedback": _join(spelling_points),
+        "spellingRating": ratings["spellingRating"],
+        "overallScore": min(score, 100),
+        "features": f,
     }
 
 def main():
@@ -7,10 +7,15 @@ Analyzes essays based on writing quality, structure, and content pillars.
 import sys
 import json
 import os
+from pathlib import Path
 from typing import Dict, Any, List
 from dotenv import load_dotenv
 import google.generativeai as genai
 
+# Share the upstream rate limits with the ADK API server and CLI
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from essay_analyzer.rate_limiter import estimate_tokens, get_scheduler
+
 # Load environment variables
 load_dotenv()
 
@@ -82,7 +87,8 @@ def analyze_essay(essay_text: str) -> Dict[str, Any]:
         Please provide constructive, specific feedback that helps improve writing quality. Return ONLY the JSON object, no additional text.
         """
         
-        # Get response from Gemini
+        # Get response from Gemini once the shared rate limits allow it
+        get_scheduler().acquire_sync(estimate_tokens(prompt))
         response = model.generate_content(prompt)
         
         # Parse the JSON response
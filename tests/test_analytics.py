@@ -0,0 +1,92 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the columnar results store and cohort analytics."""
+
+import pytest
+
+from essay_analyzer import analytics
+from essay_analyzer.results_store import ResultsStore
+
+DAY = 86400
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultsStore(str(tmp_path / "results.sqlite3"))
+    store.add_many([
+        {"created_at": 10 * DAY, "user_id": "ann", "cohort": "7a", "overallScore": 60, "grammarRating": 3},
+        {"created_at": 10 * DAY + 5, "user_id": "bob", "cohort": "7a", "overallScore": 80, "grammarRating": 4},
+        {"created_at": 11 * DAY, "user_id": "ann", "cohort": "7b", "overallScore": 90, "grammarRating": 5},
+        {"created_at": 12 * DAY, "user_id": "cat", "cohort": "7b", "overallScore": 10, "degraded": True},
+    ])
+    return store
+
+
+def test_select_filters(store):
+    assert list(store.select()) == [0, 1, 2]
+    assert list(store.select(include_degraded=True)) == [0, 1, 2, 3]
+    assert list(store.select(user_id="ann")) == [0, 2]
+    assert list(store.select(cohort="7b", include_degraded=True)) == [2, 3]
+    assert list(store.select(since=10 * DAY + 1, until=12 * DAY)) == [1, 2]
+    assert list(store.select(user_id="nobody")) == []
+
+
+def test_cohort_report(store):
+    report = analytics.cohort_report(
+        store, metrics=["overallScore"], group_by="cohort", bins=4
+    )
+    assert report["count"] == 3
+    assert report["statistics"]["overallScore"]["mean"] == pytest.approx(230 / 3)
+    assert [p["count"] for p in report["trend"]["points"]] == [2, 1]
+    groups = {g["cohort"]: g["mean"] for g in report["breakdown"]["groups"]}
+    assert groups == {"7a": pytest.approx(70), "7b": pytest.approx(90)}
+    assert sum(report["histograms"]["overallScore"]["counts"]) == 3
+    assert len(report["histograms"]["overallScore"]["counts"]) == 4
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"metrics": ["nope"]},
+    {"interval": "year"},
+    {"group_by": "school"},
+    {"bins": 0},
+    {"bins": analytics.MAX_HISTOGRAM_BINS + 1},
+])
+def test_cohort_report_rejects_bad_parameters(store, kwargs):
+    with pytest.raises(ValueError):
+        analytics.cohort_report(store, **{"metrics": ["overallScore"], **kwargs})
+
+
+def test_month_trend_follows_calendar_months(tmp_path):
+    store = ResultsStore(str(tmp_path / "results.sqlite3"))
+    # 2026-01-01, 2026-01-31 23:00, 2026-02-01 and 2026-03-02 (UTC); fixed
+    # 30-day windows would split January and put January 31 with February 1
+    jan_1, feb_1 = 1767225600, 1769904000
+    store.add_many([
+        {"created_at": jan_1, "user_id": "ann", "overallScore": 60},
+        {"created_at": feb_1 - 3600, "user_id": "ann", "overallScore": 80},
+        {"created_at": feb_1, "user_id": "ann", "overallScore": 90},
+        {"created_at": feb_1 + 29 * DAY, "user_id": "ann", "overallScore": 50},
+    ])
+    points = analytics.trend(store, store.select(), "overallScore", "month")
+    assert [(p["period"], p["count"]) for p in points] == [("2026-01", 2), ("2026-02", 1), ("2026-03", 1)]
+    assert points[0]["period_start"] == jan_1
+    assert points[1]["period_start"] == feb_1
+    assert points[0]["mean"] == pytest.approx(70)
+
+
+def test_day_trend_periods(store):
+    points = analytics.trend(store, store.select(), "overallScore", "day")
+    assert [p["period"] for p in points] == ["1970-01-11", "1970-01-12"]
+    assert [p["period_start"] for p in points] == [10 * DAY, 11 * DAY]
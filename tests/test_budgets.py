@@ -0,0 +1,75 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for output budget presets and their environment overrides."""
+
+import pytest
+
+pytest.importorskip("google.adk")
+
+from essay_analyzer import budgets  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fresh_presets():
+    budgets.presets.cache_clear()
+    yield
+    budgets.presets.cache_clear()
+
+
+def test_builtin_presets_by_default(monkeypatch):
+    monkeypatch.delenv("OUTPUT_BUDGETS", raising=False)
+    monkeypatch.delenv("OUTPUT_BUDGET_PRESET", raising=False)
+    assert budgets.presets() is budgets.PRESETS
+    assert budgets.get_preset().name == "standard"
+    assert budgets.get_preset("brief") is budgets.PRESETS["brief"]
+
+
+def test_overrides_from_environment(monkeypatch):
+    monkeypatch.setenv(
+        "OUTPUT_BUDGETS",
+        '{"brief": {"content": {"max_output_tokens": 800}}, "tiny": {"grammar": {"target_words": 20}}}',
+    )
+    monkeypatch.setenv("OUTPUT_BUDGET_PRESET", "tiny")
+    brief = budgets.get_preset("brief")
+    assert brief.content.max_output_tokens == 800
+    assert brief.content.target_words == budgets.PRESETS["brief"].content.target_words
+    assert brief.grammar == budgets.PRESETS["brief"].grammar
+    # Unknown presets start from standard
+    tiny = budgets.get_preset()
+    assert tiny.name == "tiny"
+    assert tiny.grammar.target_words == 20
+    assert tiny.structure == budgets.PRESETS["standard"].structure
+
+
+def test_unknown_preset_and_agent_are_rejected(monkeypatch):
+    monkeypatch.delenv("OUTPUT_BUDGETS", raising=False)
+    with pytest.raises(ValueError, match="Choose from"):
+        budgets.get_preset("verbose")
+    with pytest.raises(ValueError, match="Unknown agent"):
+        budgets.load_overrides('{"brief": {"summary": {"target_words": 10}}}')
+
+
+def test_total_output_tokens_counts_coordinator_twice_with_sub_agents():
+    standard = budgets.PRESETS["standard"]
+    assert standard.total_output_tokens(("grammar",)) == 2 * 3072 + 1536
+    assert standard.total_output_tokens(()) == 3072
+
+
+@pytest.mark.parametrize("name", sorted(budgets.PRESETS))
+def test_grammar_budget_is_smallest(name):
+    preset = budgets.PRESETS[name]
+    for agent in ("structure", "content"):
+        assert preset.grammar.max_output_tokens < preset.for_agent(agent).max_output_tokens
+        assert preset.grammar.target_words < preset.for_agent(agent).target_words
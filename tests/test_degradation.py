@@ -0,0 +1,124 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the upstream circuit breaker's state transitions."""
+
+import pytest
+
+from essay_analyzer.degradation import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker(
+        window=10,
+        min_samples=4,
+        error_rate_threshold=0.5,
+        latency_threshold=5.0,
+        cooldown=30.0,
+        half_open_probes=2,
+        clock=clock,
+    )
+
+
+def trip(breaker):
+    for _ in range(4):
+        breaker.record_failure(1.0)
+    assert breaker.state == OPEN
+
+
+def test_stays_closed_below_min_samples(breaker):
+    for _ in range(3):
+        breaker.record_failure(1.0)
+    assert breaker.state == CLOSED
+    assert breaker.allow_request()
+
+
+def test_opens_on_error_rate(breaker):
+    breaker.record_success(1.0)
+    breaker.record_success(1.0)
+    breaker.record_failure(1.0)
+    assert breaker.state == CLOSED
+    breaker.record_failure(1.0)
+    assert breaker.state == OPEN
+    assert breaker.snapshot()["last_trip_reason"] == "error rate 50%"
+    assert not breaker.allow_request()
+
+
+def test_opens_on_tail_latency(breaker):
+    for _ in range(4):
+        breaker.record_success(6.0)
+    assert breaker.state == OPEN
+    assert breaker.last_trip_reason.startswith("p95 latency")
+
+
+def test_half_opens_after_cooldown_and_limits_probes(breaker, clock):
+    trip(breaker)
+    clock.now = 29.9
+    assert not breaker.allow_request()
+    clock.now = 30.0
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow_request()
+    assert breaker.allow_request()
+    # Only half_open_probes requests at a time
+    assert not breaker.allow_request()
+
+
+def test_successful_probes_close_it(breaker, clock):
+    trip(breaker)
+    clock.now = 30.0
+    breaker.allow_request()
+    breaker.allow_request()
+    breaker.record_success(1.0)
+    assert breaker.state == HALF_OPEN
+    breaker.record_success(1.0)
+    assert breaker.state == CLOSED
+    # The window starts over after closing
+    assert breaker.snapshot()["samples"] == 0
+
+
+def test_failed_probe_reopens_it(breaker, clock):
+    trip(breaker)
+    clock.now = 30.0
+    assert breaker.allow_request()
+    breaker.record_failure(1.0, "unparseable_response")
+    assert breaker.state == OPEN
+    assert breaker.last_trip_reason == "probe failed: unparseable_response"
+    # A fresh cooldown from the reopen
+    clock.now = 59.0
+    assert breaker.state == OPEN
+    clock.now = 60.0
+    assert breaker.state == HALF_OPEN
+
+
+def test_released_probe_frees_its_slot(breaker, clock):
+    trip(breaker)
+    clock.now = 30.0
+    assert breaker.allow_request()
+    assert breaker.allow_request()
+    breaker.release()
+    assert breaker.allow_request()
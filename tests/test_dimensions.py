@@ -0,0 +1,78 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for dimension selection and validation of partial analyses."""
+
+import pytest
+
+pytest.importorskip("google.adk")
+
+from essay_analyzer.agent import normalize_dimensions, overall_score_from_ratings  # noqa: E402
+from essay_analyzer.prompt import DIMENSIONS  # noqa: E402
+
+
+def test_all_dimensions_by_default():
+    assert normalize_dimensions() == DIMENSIONS
+
+
+def test_canonical_order_case_and_duplicates():
+    assert normalize_dimensions([" Content", "grammar", "GRAMMAR"]) == ("grammar", "content")
+
+
+def test_unknown_dimension_is_rejected():
+    with pytest.raises(ValueError, match="Unknown dimensions: style"):
+        normalize_dimensions(["grammar", "style"])
+
+
+def test_empty_selection_is_rejected():
+    with pytest.raises(ValueError, match="At least one dimension"):
+        normalize_dimensions([" ", ""])
+
+
+def test_overall_score_from_analyzed_ratings():
+    assert overall_score_from_ratings({"grammarRating": 4, "contentRating": 3}, ("grammar", "content")) == 70
+
+
+@pytest.fixture
+def server():
+    for module in ("dotenv", "fastapi", "pydantic"):
+        pytest.importorskip(module)
+    import adk_api_server
+    return adk_api_server
+
+
+def test_request_with_unknown_dimension_is_rejected(server):
+    from pydantic import ValidationError
+
+    with pytest.raises(ValidationError, match="Unknown dimensions"):
+        server.EssayAnalysisRequest(text="An essay.", dimensions=["tone"])
+
+
+def test_validate_analysis_keeps_only_requested_dimensions(server):
+    result = server.validate_analysis(
+        {
+            "grammarFeedback": "ok",
+            "grammarRating": 9,
+            "contentFeedback": "unrequested",
+            "contentRating": 2,
+            "overallScore": 55,
+        },
+        ("grammar",),
+    )
+    assert result == {"grammarFeedback": "ok", "grammarRating": 5, "overallScore": 100}
+
+
+def test_validate_analysis_requires_requested_fields(server):
+    with pytest.raises(ValueError, match="Missing required field: structureRating"):
+        server.validate_analysis({"structureFeedback": "ok"}, ("structure",))
@@ -0,0 +1,113 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the runner event stream consumer."""
+
+import asyncio
+from types import SimpleNamespace
+
+from essay_analyzer.events import JsonObjectTracker, collect_analysis
+
+
+class FakeEvent:
+    """The parts of an ADK event the collector reads."""
+
+    def __init__(self, author, text=None, final=True, partial=False, state_delta=None, thought=False):
+        self.author = author
+        self.partial = partial
+        self._final = final
+        parts = [SimpleNamespace(text=text, thought=thought)] if text is not None else []
+        self.content = SimpleNamespace(parts=parts) if parts else None
+        self.actions = SimpleNamespace(state_delta=state_delta or {})
+
+    def get_function_calls(self):
+        return []
+
+    def get_function_responses(self):
+        return []
+
+    def is_final_response(self):
+        return self._final
+
+
+class EventSource:
+    """An async generator over events that records how far it was read."""
+
+    def __init__(self, events):
+        self.events = events
+        self.yielded = 0
+        self.closed = False
+
+    async def stream(self):
+        try:
+            for event in self.events:
+                self.yielded += 1
+                yield event
+        finally:
+            self.closed = True
+
+
+def collect(events, **kwargs):
+    source = EventSource(events)
+    stream = asyncio.run(collect_analysis(source.stream(), "coordinator", **kwargs))
+    return source, stream
+
+
+def test_stops_once_final_json_is_complete():
+    source, stream = collect([
+        FakeEvent("coordinator", '{"score": ', final=True),
+        FakeEvent("coordinator", '7, "note": "a } in text"}'),
+        FakeEvent("coordinator", "trailing chatter"),
+        FakeEvent("coordinator", "never read"),
+    ])
+    assert stream.json_complete
+    assert stream.text == '{"score": 7, "note": "a } in text"}'
+    assert source.yielded == 2
+    assert source.closed
+
+
+def test_ignores_partial_thought_and_other_authors():
+    _, stream = collect([
+        FakeEvent("grammar_analyzer", '{"grammar": 1}'),
+        FakeEvent("coordinator", '{"draft": ', partial=True),
+        FakeEvent("coordinator", "thinking...", thought=True),
+        FakeEvent("coordinator", "not yet", final=False),
+        FakeEvent("coordinator", '{"score": 5}'),
+    ])
+    assert stream.text == '{"score": 5}'
+    assert stream.event_count == 5
+
+
+def test_incomplete_json_reads_whole_stream():
+    source, stream = collect([FakeEvent("coordinator", '{"score": 5')])
+    assert not stream.json_complete
+    assert source.yielded == 1 and source.closed
+
+
+def test_captures_sub_agent_outputs():
+    _, stream = collect(
+        [
+            FakeEvent("grammar_analyzer", state_delta={"grammar_analysis": "ok", "other": 1}),
+            FakeEvent("coordinator", "{}"),
+        ],
+        output_keys=["grammar_analysis", "structure_analysis"],
+    )
+    assert stream.sub_agent_outputs == {"grammar_analysis": "ok"}
+
+
+def test_tracker_skips_braces_in_strings_and_escapes():
+    tracker = JsonObjectTracker()
+    assert not tracker.feed('prefix {"a": "}\\"}", "b": {')
+    assert tracker.feed('}}')
+    assert tracker.feed("anything")
@@ -0,0 +1,280 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for weighted fair queueing, concurrency caps and daily quotas."""
+
+import asyncio
+import sqlite3
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from essay_analyzer.fair_queue import (
+    FairScheduler,
+    QuotaExceeded,
+    TenantLimits,
+    UsageLedger,
+    _record_model_usage,
+    _utc_day,
+    load_config,
+    metered_usage,
+)
+from essay_analyzer.rate_limiter import RateLimitTimeout
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return UsageLedger(str(tmp_path / "usage.sqlite3"))
+
+
+def make_scheduler(ledger, slots=1, **kwargs):
+    return FairScheduler(slots, ledger, TenantLimits(max_concurrency=slots), **kwargs)
+
+
+def today():
+    return _utc_day()[0]
+
+
+def test_bulk_user_does_not_starve_others(ledger):
+    scheduler = make_scheduler(ledger)
+    order = []
+
+    async def analysis(user_id):
+        ticket = await scheduler.acquire(user_id, 100)
+        order.append(user_id)
+        await asyncio.sleep(0)
+        scheduler.release(ticket)
+
+    async def main():
+        holder = await scheduler.acquire("holder", 100)
+        tasks = [asyncio.ensure_future(analysis("bulk")) for _ in range(6)]
+        await asyncio.sleep(0)
+        tasks += [asyncio.ensure_future(analysis("light")) for _ in range(2)]
+        await asyncio.sleep(0)
+        scheduler.release(holder)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    # The light user's requests interleave with the bulk user's instead of
+    # waiting behind all six of them
+    assert order.index("light") <= 2
+    assert order.count("light") == 2 and order[-1] == "bulk"
+
+
+def test_weight_buys_a_larger_share(ledger):
+    scheduler = make_scheduler(ledger, tenants={"heavy": TenantLimits(weight=3, max_concurrency=1)})
+    order = []
+
+    async def analysis(user_id):
+        ticket = await scheduler.acquire(user_id, 100)
+        order.append(user_id)
+        await asyncio.sleep(0)
+        scheduler.release(ticket)
+
+    async def main():
+        holder = await scheduler.acquire("holder", 100)
+        tasks = [asyncio.ensure_future(analysis(u)) for u in ["heavy"] * 6 + ["plain"] * 6]
+        await asyncio.sleep(0)
+        scheduler.release(holder)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order[:8].count("heavy") == 6
+
+
+def test_concurrency_cap_per_user(ledger):
+    scheduler = FairScheduler(4, ledger, TenantLimits(max_concurrency=2))
+
+    async def main():
+        first = await scheduler.acquire("ann", 1)
+        await scheduler.acquire("ann", 1)
+        with pytest.raises(RateLimitTimeout):
+            await scheduler.acquire("ann", 1, max_wait=0.05)
+        # Other users still get the free slots
+        await scheduler.acquire("bob", 1)
+        scheduler.release(first)
+        await asyncio.wait_for(scheduler.acquire("ann", 1), timeout=1)
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_gives_up_its_place(ledger):
+    scheduler = make_scheduler(ledger)
+
+    async def main():
+        holder = await scheduler.acquire("holder", 1)
+        cancelled = asyncio.ensure_future(scheduler.acquire("ann", 1))
+        waiting = asyncio.ensure_future(scheduler.acquire("bob", 1))
+        await asyncio.sleep(0)
+        assert scheduler.waiting == 2
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        assert scheduler.waiting == 1
+        scheduler.release(holder)
+        ticket = await asyncio.wait_for(waiting, timeout=1)
+        assert ticket.tenant == "bob"
+        scheduler.release(ticket)
+        assert scheduler._in_flight == 0
+
+    asyncio.run(main())
+
+
+def test_idle_tenants_are_evicted(ledger):
+    scheduler = FairScheduler(2, ledger, TenantLimits(max_concurrency=2))
+
+    async def main():
+        for n in range(50):
+            scheduler.release(await scheduler.acquire(f"user{n}", 1))
+        holder = await scheduler.acquire("holder", 1)
+        await scheduler.acquire("holder", 1)
+        timed_out = asyncio.ensure_future(scheduler.acquire("late", 1, max_wait=0.01))
+        with pytest.raises(RateLimitTimeout):
+            await timed_out
+        await scheduler.check_quota("someone", 1)
+        return holder
+
+    holder = asyncio.run(main())
+    assert set(scheduler._tenants) == {"holder"}
+    scheduler.release(holder)
+    assert scheduler._tenants["holder"].in_flight == 1
+
+
+def test_quota_is_checked_before_queueing(ledger):
+    scheduler = FairScheduler(1, ledger, TenantLimits(daily_token_quota=1000))
+
+    async def main():
+        scheduler.release(await scheduler.acquire("ann", 600))
+        with pytest.raises(QuotaExceeded) as raised:
+            await scheduler.acquire("ann", 600)
+        return raised.value
+
+    error = asyncio.run(main())
+    assert (error.used, error.requested, error.limit) == (600, 600, 1000)
+    assert ledger.used("ann", today()) == (600, 1)
+
+
+def test_quota_is_rechecked_atomically_with_the_charge(ledger):
+    scheduler = FairScheduler(1, ledger, TenantLimits(daily_token_quota=1000))
+
+    async def main():
+        holder = await scheduler.acquire("ann", 400)
+        # Passes the early check (400 + 500 <= 1000), then queues
+        queued = asyncio.ensure_future(scheduler.acquire("ann", 500))
+        await asyncio.sleep(0)
+        # Meanwhile another process spends the rest of the quota
+        ledger.charge("ann", today(), 300)
+        scheduler.release(holder)
+        with pytest.raises(QuotaExceeded):
+            await queued
+        # The refused request's slot went back
+        assert scheduler._in_flight == 0
+
+    asyncio.run(main())
+    assert ledger.used("ann", today()) == (700, 2)
+
+
+def test_ledger_charge_respects_limit(ledger):
+    assert ledger.charge("ann", "2025-01-01", 600, limit=1000) == (True, 0)
+    assert ledger.charge("ann", "2025-01-01", 600, limit=1000) == (False, 600)
+    assert ledger.charge("ann", "2025-01-01", 600) == (True, 600)
+    assert ledger.used("ann", "2025-01-01") == (1200, 2)
+
+
+def test_release_reconciles_the_estimate(ledger):
+    scheduler = make_scheduler(ledger)
+
+    async def main():
+        ticket = await scheduler.acquire("ann", 5000)
+        scheduler.release(ticket, actual_tokens=3200)
+        ticket = await scheduler.acquire("ann", 1000)
+        scheduler.release(ticket)
+
+    asyncio.run(main())
+    assert ledger.used("ann", today()) == (4200, 2)
+
+
+def test_locked_ledger_does_not_block_the_event_loop(ledger):
+    scheduler = FairScheduler(1, ledger, TenantLimits(daily_token_quota=1000))
+    # Another replica holds the shared ledger's write lock
+    other = sqlite3.connect(ledger.db_path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    ticks = []
+
+    async def ticker():
+        while True:
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.01)
+
+    async def main():
+        ticking = asyncio.ensure_future(ticker())
+        acquiring = asyncio.ensure_future(scheduler.acquire("ann", 100))
+        await asyncio.sleep(0.3)
+        assert not acquiring.done()
+        other.execute("COMMIT")
+        scheduler.release(await acquiring)
+        ticking.cancel()
+        return await scheduler.usage("ann")
+
+    usage = asyncio.run(main())
+    other.close()
+    assert len(ticks) > 10
+    assert usage["tenants"][0]["tokens"] == 100
+
+
+def test_cancelled_charge_is_refunded(ledger):
+    scheduler = FairScheduler(1, ledger, TenantLimits(daily_token_quota=1000))
+    other = sqlite3.connect(ledger.db_path, isolation_level=None)
+
+    async def main():
+        other.execute("BEGIN IMMEDIATE")
+        acquiring = asyncio.ensure_future(scheduler.acquire("ann", 100))
+        await asyncio.sleep(0.1)
+        acquiring.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await acquiring
+        assert scheduler._in_flight == 0
+        other.execute("COMMIT")
+        # The charge lands once the lock is free, then the refund follows
+        for _ in range(500):
+            if ledger.used("ann", today()) == (0, 1) and not scheduler._background:
+                break
+            await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    other.close()
+    assert ledger.used("ann", today()) == (0, 1)
+
+
+def test_usage_meter_counts_model_calls_in_context():
+    response = SimpleNamespace(
+        partial=False,
+        usage_metadata=SimpleNamespace(total_token_count=None, prompt_token_count=70, candidates_token_count=30),
+    )
+    _record_model_usage(None, response)
+    with metered_usage() as meter:
+        _record_model_usage(None, response)
+        _record_model_usage(None, SimpleNamespace(partial=True, usage_metadata=response.usage_metadata))
+        _record_model_usage(None, SimpleNamespace(partial=False, usage_metadata=SimpleNamespace(total_token_count=5)))
+    _record_model_usage(None, response)
+    assert (meter.tokens, meter.calls) == (105, 2)
+
+
+def test_load_config_groups_users():
+    tenants, members = load_config(
+        '{"tenants": {"school": {"weight": 2, "daily_token_quota": 10, "users": ["ann", "bob"]}}}'
+    )
+    assert tenants["school"] == TenantLimits(weight=2, max_concurrency=2, daily_token_quota=10)
+    assert members == {"ann": "school", "bob": "school"}
+    assert load_config("") == ({}, {})
@@ -0,0 +1,129 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the deterministic grammar pre-pass."""
+
+import pytest
+
+from essay_analyzer.grammar_rules import check_grammar, format_findings
+
+
+def found(text):
+    return [(f.rule, f.text, f.suggestion) for f in check_grammar(text)]
+
+
+def test_overlapping_matches_are_both_reported():
+    assert found("its a apple") == [
+        ("usage", "its a", "it's a"),
+        ("article", "a apple", "an"),
+    ]
+
+
+def test_doubled_words_chain():
+    assert found("the the the end") == [
+        ("doubled_word", "the the", "the"),
+        ("doubled_word", "the the", "the"),
+    ]
+
+
+def test_longer_phrase_does_not_also_report_its_tail():
+    # "the fact that" is a rule of its own, inside "due to the fact that"
+    assert found("We stayed in due to the fact that it rained.") == [
+        ("wordiness", "due to the fact that", "because"),
+    ]
+
+
+@pytest.mark.parametrize("text, suggestion", [
+    ("I saw a apple.", "an"),
+    ("She is an teacher.", "a"),
+    ("It was an unicorn.", "a"),
+    ("We waited a hour.", "an"),
+    ("He is a honest man.", "an"),
+    ("It was an one-time offer.", "a"),
+    ("A apple fell.", "An"),
+])
+def test_wrong_article_is_flagged(text, suggestion):
+    assert [f.suggestion for f in check_grammar(text) if f.rule == "article"] == [suggestion]
+
+
+@pytest.mark.parametrize("text", [
+    "It was a unicorn.",
+    "We waited an hour.",
+    "He is an honest man.",
+    "She went to a university.",
+    "An unimportant detail.",
+    "It was a one-time offer.",
+    "He is an FBI agent.",
+    "She held an umbrella.",
+])
+def test_correct_article_is_not_flagged(text):
+    assert [f for f in check_grammar(text) if f.rule == "article"] == []
+
+
+@pytest.mark.parametrize("text, suggestion", [
+    ("Its a good day.", "It's a"),
+    ("ITS A good day.", "IT'S A"),
+    ("Teh end.", "The"),
+    ("Me and him went home.", "He and I"),
+    ("I could of gone.", "could have"),
+])
+def test_suggestions_keep_capitalization(text, suggestion):
+    assert check_grammar(text)[0].suggestion == suggestion
+
+
+def test_pattern_rules():
+    rules = {f.rule for f in check_grammar("Then i left , and it ended!! Then,we ate.")}
+    assert {"lowercase_i", "space_before_punctuation", "repeated_punctuation", "missing_space"} <= rules
+
+
+def test_sentence_and_paragraph_rules():
+    long_sentence = " ".join(f"word{n}" for n in range(45)) + "."
+    text = f'We bought apples, pears, figs and plums. {long_sentence}\n\nShe said "hello.'
+    rules = [f.rule for f in check_grammar(text)]
+    assert rules.count("serial_comma") == 1
+    assert rules.count("run_on") == 1
+    assert rules.count("unbalanced_quotes") == 1
+
+
+@pytest.mark.parametrize("text, listed", [
+    ("I like apples, pears and bananas.", "apples, pears and bananas"),
+    ("Red, white and blue.", "Red, white and blue"),
+    ("We visited Paris, Rome and Berlin last year.", "Paris, Rome and Berlin"),
+])
+def test_three_item_lists_without_serial_comma(text, listed):
+    assert [f.text for f in check_grammar(text) if f.rule == "serial_comma"] == [listed]
+
+
+@pytest.mark.parametrize("text", [
+    "In 2020, however, we went home and slept.",
+    "First, of course, she left and he stayed.",
+    "We bought apples, pears, and plums.",
+])
+def test_parenthetical_commas_and_serial_commas_are_not_flagged(text):
+    assert "serial_comma" not in {f.rule for f in check_grammar(text)}
+
+
+def test_findings_are_ordered_and_located():
+    text = "Teh cat sat. I could of gone."
+    findings = check_grammar(text)
+    assert [f.start for f in findings] == sorted(f.start for f in findings)
+    for finding in findings:
+        assert text[finding.start:finding.end] == finding.text
+
+
+def test_format_findings_truncates():
+    findings = check_grammar("teh " * 5)
+    lines = format_findings(findings, limit=2).splitlines()
+    assert len(lines) == 3
+    assert lines[-1] == "- ... and 3 more"
@@ -0,0 +1,140 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for cancellation and graceful drain of in-flight analyses."""
+
+import asyncio
+import os
+import signal
+
+import pytest
+
+from essay_analyzer.lifecycle import ClientDisconnected, InFlightTracker, ServerDraining, install_drain_signal
+
+posix_signals = pytest.mark.skipif(not hasattr(signal, "SIGUSR1"), reason="needs POSIX signals")
+
+
+@pytest.fixture
+def server_handler():
+    """A stand-in for uvicorn's SIGUSR1 handler, recording what it receives."""
+    received = []
+    original = signal.signal(signal.SIGUSR1, lambda signum, frame: received.append(signum))
+    yield received
+    signal.signal(signal.SIGUSR1, original)
+
+
+@posix_signals
+def test_signal_drains_before_server_shutdown(server_handler):
+    async def scenario():
+        tracker = InFlightTracker()
+        assert install_drain_signal(tracker, 0.05, signal.SIGUSR1)
+        os.kill(os.getpid(), signal.SIGUSR1)
+        await asyncio.sleep(0.01)
+        # Draining, but the server has not started its shutdown yet
+        assert tracker.draining
+        assert server_handler == []
+        await asyncio.sleep(0.1)
+        assert server_handler == [signal.SIGUSR1]
+
+    asyncio.run(scenario())
+
+
+@posix_signals
+def test_second_signal_passes_on_at_once(server_handler):
+    async def scenario():
+        tracker = InFlightTracker()
+        install_drain_signal(tracker, 0.2, signal.SIGUSR1)
+        os.kill(os.getpid(), signal.SIGUSR1)
+        await asyncio.sleep(0.01)
+        os.kill(os.getpid(), signal.SIGUSR1)
+        await asyncio.sleep(0.01)
+        assert server_handler == [signal.SIGUSR1]
+        # The notice timer does not pass it on a second time
+        await asyncio.sleep(0.3)
+        assert server_handler == [signal.SIGUSR1]
+
+    asyncio.run(scenario())
+
+
+@posix_signals
+def test_not_installed_without_handler_to_chain():
+    original = signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+    try:
+        async def scenario():
+            return install_drain_signal(InFlightTracker(), 1, signal.SIGUSR1)
+
+        assert not asyncio.run(scenario())
+        assert signal.getsignal(signal.SIGUSR1) is signal.SIG_DFL
+    finally:
+        signal.signal(signal.SIGUSR1, original)
+
+
+def test_drain_lets_quick_runs_finish_and_cancels_the_rest():
+    async def scenario():
+        tracker = InFlightTracker(poll_interval=0.01)
+        quick = asyncio.ensure_future(tracker.run(asyncio.sleep(0.01, result="done")))
+        slow = asyncio.ensure_future(tracker.run(asyncio.sleep(10)))
+        await asyncio.sleep(0)
+        assert tracker.in_flight == 2
+        cancelled = await tracker.drain(0.1)
+        assert cancelled == 1
+        assert await quick == "done"
+        with pytest.raises(ServerDraining):
+            await slow
+        assert tracker.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_no_new_runs_while_draining():
+    async def scenario():
+        tracker = InFlightTracker()
+        await tracker.drain(0)
+        with pytest.raises(ServerDraining):
+            await tracker.run(asyncio.sleep(0))
+
+    asyncio.run(scenario())
+
+
+def test_client_disconnect_cancels_run():
+    async def scenario():
+        tracker = InFlightTracker(poll_interval=0.01)
+        started = asyncio.Event()
+
+        async def analysis():
+            started.set()
+            await asyncio.sleep(10)
+
+        async def is_disconnected():
+            return started.is_set()
+
+        with pytest.raises(ClientDisconnected):
+            await tracker.run(analysis(), is_disconnected)
+        assert tracker.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_health_is_unavailable_while_draining(monkeypatch):
+    for module in ("dotenv", "fastapi", "google.adk"):
+        pytest.importorskip(module)
+    import adk_api_server as server
+    from fastapi import Response
+
+    monkeypatch.setattr(server, "in_flight", InFlightTracker())
+    server.in_flight.draining = True
+    response = Response()
+    health = asyncio.run(server.health_check(response))
+    assert response.status_code == 503
+    assert health.status == "draining"
@@ -0,0 +1,125 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the debounced per-paragraph live feedback session."""
+
+import asyncio
+
+from essay_analyzer.live import LiveSession, combine_ratings, paragraph_fingerprint, split_paragraphs
+
+FIRST = "The first paragraph has more than enough words to be analyzed by the model."
+SECOND = "A second paragraph also has more than enough words to reach the model too."
+
+
+class Recorder:
+    def __init__(self, degraded=()):
+        self.calls = []
+        self.sent = []
+        self.degraded = set(degraded)
+        self.gate = None
+
+    async def analyze(self, paragraph):
+        self.calls.append(paragraph)
+        if self.gate is not None:
+            await self.gate.wait()
+        return {"grammarRating": 4, "overallScore": 80, "degraded": paragraph in self.degraded}
+
+    async def send(self, message):
+        self.sent.append(message)
+
+    def last_analysis(self):
+        return [m for m in self.sent if m["type"] == "analysis"][-1]
+
+
+def make_session(recorder):
+    return LiveSession(recorder.analyze, recorder.send, lambda text: {}, ("grammar",), debounce=60)
+
+
+async def settle(session):
+    # Runs what the debounce timer would, without waiting for it
+    await session.schedule()
+    while session._running:
+        await asyncio.gather(*session._running.values(), return_exceptions=True)
+
+
+def test_paragraphs_and_fingerprints():
+    assert split_paragraphs("one\n\n  \n\ntwo\nlines\n\n") == ["one", "two\nlines"]
+    assert paragraph_fingerprint("a  b\nc") == paragraph_fingerprint("a b c")
+
+
+def test_unchanged_paragraphs_are_not_reanalyzed():
+    recorder = Recorder()
+    session = make_session(recorder)
+
+    async def main():
+        await session.update(FIRST)
+        await settle(session)
+        await session.update(FIRST + "\n\n" + SECOND)
+        await settle(session)
+        await session.close()
+
+    asyncio.run(main())
+    assert recorder.calls == [FIRST, SECOND]
+    analysis = recorder.last_analysis()
+    assert [p["status"] for p in analysis["paragraphs"]] == ["ready", "ready"]
+    assert analysis["overallScore"] == 80
+
+
+def test_degraded_results_are_shown_but_not_cached():
+    recorder = Recorder(degraded={FIRST})
+    session = make_session(recorder)
+
+    async def main():
+        await session.update(FIRST)
+        await settle(session)
+        assert recorder.last_analysis()["paragraphs"][0]["status"] == "degraded"
+        recorder.degraded.clear()
+        await session.update(FIRST)
+        await settle(session)
+        await session.close()
+
+    asyncio.run(main())
+    assert recorder.calls == [FIRST, FIRST]
+    assert recorder.last_analysis()["paragraphs"][0]["status"] == "ready"
+    assert not session._degraded
+
+
+def test_edited_paragraphs_cancel_their_runs():
+    recorder = Recorder()
+    session = make_session(recorder)
+
+    async def main():
+        recorder.gate = asyncio.Event()
+        await session.update(FIRST)
+        await session.schedule()
+        await asyncio.sleep(0)
+        running = list(session._running.values())
+        await session.update(SECOND)
+        await session.schedule()
+        assert running[0].cancelled() or running[0].cancelling()
+        recorder.gate.set()
+        await settle(session)
+        await session.close()
+
+    asyncio.run(main())
+    paragraphs = recorder.last_analysis()["paragraphs"]
+    assert [p["fingerprint"] for p in paragraphs] == [paragraph_fingerprint(SECOND)]
+
+
+def test_combine_ratings_weights_by_words():
+    combined = combine_ratings(
+        [(10, {"grammarRating": 5, "overallScore": 100}), (30, {"grammarRating": 1, "overallScore": 20})],
+        ("grammar",),
+    )
+    assert combined == {"grammarRating": 2.0, "overallScore": 40}
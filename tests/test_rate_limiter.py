@@ -0,0 +1,101 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the shared upstream token-bucket scheduler."""
+
+import asyncio
+
+import pytest
+
+from essay_analyzer.rate_limiter import (
+    BATCH,
+    REQUESTS_BUCKET,
+    RateLimitTimeout,
+    UpstreamScheduler,
+    estimate_tokens,
+    is_quota_error,
+)
+
+
+@pytest.fixture
+def scheduler(tmp_path):
+    return UpstreamScheduler(60, 6000, str(tmp_path / "ratelimit.sqlite3"))
+
+
+def level(scheduler, name=REQUESTS_BUCKET):
+    return scheduler._conn.execute("SELECT tokens FROM buckets WHERE name = ?", (name,)).fetchone()[0]
+
+
+def test_try_acquire_takes_from_every_bucket(scheduler):
+    granted, wait = scheduler.try_acquire({REQUESTS_BUCKET: 2, "tokens": 1000})
+    assert granted and wait == 0.0
+    assert level(scheduler) == pytest.approx(58, abs=0.1)
+    assert level(scheduler, "tokens") == pytest.approx(5000, abs=1)
+
+
+def test_batch_lane_leaves_reserve(scheduler):
+    granted, _ = scheduler.try_acquire({REQUESTS_BUCKET: 50, "tokens": 1})
+    assert granted
+    # 10 requests left, but the batch lane must leave 20% (12) untouched
+    granted, wait = scheduler.try_acquire({REQUESTS_BUCKET: 1, "tokens": 1}, lane=BATCH)
+    assert not granted and wait > 0
+    granted, _ = scheduler.try_acquire({REQUESTS_BUCKET: 1, "tokens": 1})
+    assert granted
+
+
+def test_penalize_drains_remaining_capacity(scheduler):
+    scheduler.penalize(10)
+    # One request per second: ten seconds of debt
+    assert level(scheduler) == pytest.approx(-10, abs=0.1)
+
+
+def test_penalties_accumulate(scheduler):
+    scheduler.penalize(10)
+    scheduler.penalize(20)
+    assert level(scheduler) == pytest.approx(-30, abs=0.1)
+
+
+def test_async_acquire_times_out_while_penalized(scheduler):
+    scheduler.penalize(30)
+    with pytest.raises(RateLimitTimeout) as raised:
+        asyncio.run(scheduler.acquire(1, max_wait=0.5))
+    assert raised.value.retry_after > 0
+
+
+def test_async_acquire_does_not_block_the_loop(scheduler):
+    ticks = []
+
+    async def ticker():
+        for _ in range(3):
+            ticks.append(None)
+            await asyncio.sleep(0)
+
+    async def main():
+        await asyncio.gather(scheduler.acquire(100), ticker())
+
+    asyncio.run(main())
+    assert len(ticks) == 3
+    assert level(scheduler) == pytest.approx(59, abs=0.1)
+
+
+def test_estimate_tokens_counts_each_call():
+    essay = "x" * 400
+    assert estimate_tokens(essay, ["p" * 400, "q" * 400], output_tokens=10) == 2 * (200 + 10)
+    assert estimate_tokens(essay, output_tokens=10) == 110
+
+
+def test_is_quota_error():
+    assert is_quota_error(Exception("429 Too Many Requests"))
+    assert is_quota_error(Exception("RESOURCE_EXHAUSTED: quota"))
+    assert not is_quota_error(Exception("500 internal, retry after 429 ms"))
@@ -0,0 +1,113 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for record/replay fixtures of model calls."""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from essay_analyzer import callbacks, replay
+from essay_analyzer.replay import FixtureMissingError, FixtureStore, request_fingerprint
+
+
+class FakeContent:
+    def __init__(self, data):
+        self.data = data
+
+    def model_dump_json(self, exclude_none=True):
+        return json.dumps(self.data)
+
+
+def llm_request(text, call_id="call-1"):
+    return SimpleNamespace(
+        model="gemini-2.5-flash",
+        config=SimpleNamespace(system_instruction="Analyze the essay."),
+        contents=[FakeContent({"role": "user", "parts": [{"text": text, "id": call_id}]})],
+    )
+
+
+@pytest.fixture(autouse=True)
+def replay_off():
+    yield
+    replay.install(replay.OFF)
+
+
+def test_fingerprint_ignores_call_ids():
+    assert request_fingerprint("grammar", llm_request("Essay", "a")) == request_fingerprint(
+        "grammar", llm_request("Essay", "b")
+    )
+    assert request_fingerprint("grammar", llm_request("Essay")) != request_fingerprint(
+        "content", llm_request("Essay")
+    )
+    assert request_fingerprint("grammar", llm_request("Essay")) != request_fingerprint(
+        "grammar", llm_request("Another essay")
+    )
+
+
+def test_store_persists_and_replays_in_order(tmp_path):
+    path = str(tmp_path / "fixtures.jsonl.gz")
+    store = FixtureStore(path)
+    store.add("f1", "grammar", 0.5, {"text": "first"})
+    store.add("f1", "grammar", 0.2, {"text": "second"})
+    reloaded = FixtureStore(path)
+    assert len(reloaded) == 2
+    assert [reloaded.next("f1")["response"]["text"] for _ in range(3)] == ["first", "second", "second"]
+    assert reloaded.next("unknown") is None
+
+
+def test_replay_needs_fixture_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        replay.install(replay.REPLAY, str(tmp_path / "missing.jsonl.gz"))
+    assert not replay.is_replaying()
+
+
+async def call_model(context, request, upstream):
+    """Drive a model call through the shared hooks the way ADK does."""
+    response = await callbacks.before_model(context, request)
+    if response is not None:
+        return response
+    response = upstream()
+    return await callbacks.after_model(context, response) or response
+
+
+def test_replayed_fixture_returns_recorded_output_without_upstream(tmp_path):
+    pytest.importorskip("google.adk")
+    from google.adk.models.llm_response import LlmResponse
+    from google.genai import types
+
+    path = str(tmp_path / "fixtures.jsonl.gz")
+    context = SimpleNamespace(agent_name="grammar_analyzer", invocation_id="inv-1")
+    recorded = LlmResponse(content=types.Content(role="model", parts=[types.Part(text='{"grammarRating": 4}')]))
+    upstream_calls = []
+
+    def upstream():
+        upstream_calls.append(1)
+        return recorded
+
+    replay.install(replay.RECORD, path)
+    asyncio.run(call_model(context, llm_request("My essay."), upstream))
+    assert len(upstream_calls) == 1
+
+    replay.install(replay.REPLAY, path)
+    assert replay.is_replaying()
+    replayed = asyncio.run(call_model(context, llm_request("My essay.", "other-id"), upstream))
+    assert len(upstream_calls) == 1
+    assert replayed.content.parts[0].text == '{"grammarRating": 4}'
+
+    with pytest.raises(FixtureMissingError):
+        asyncio.run(call_model(context, llm_request("A new essay."), upstream))
+    assert len(upstream_calls) == 1
@@ -0,0 +1,49 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for essay fingerprints and the replica-local result cache."""
+
+from essay_analyzer.result_cache import ResultCache, essay_fingerprint
+
+
+def test_fingerprint_ignores_reflowed_whitespace():
+    assert essay_fingerprint("One  two\nthree.\n\nFour") == essay_fingerprint(" One two three.\r\n \r\n\tFour \n")
+
+
+def test_fingerprint_keeps_paragraph_breaks():
+    one_paragraph = "First sentence. Second sentence."
+    two_paragraphs = "First sentence.\n\nSecond sentence."
+    assert essay_fingerprint(one_paragraph) != essay_fingerprint(two_paragraphs)
+    assert essay_fingerprint(two_paragraphs) == essay_fingerprint("First sentence.\n\n\n\nSecond sentence.")
+
+
+def test_cache_is_lru_and_returns_copies():
+    cache = ResultCache(max_entries=2)
+    first = cache.key("essay one", ("grammar",), "standard")
+    second = cache.key("essay two", ("grammar",), "standard")
+    third = cache.key("essay one", ("grammar",), "brief")
+    cache.put(first, {"overallScore": 80})
+    cache.put(second, {"overallScore": 70})
+    cache.get(first)["overallScore"] = 0
+    cache.put(third, {"overallScore": 60})
+    assert cache.get(first) == {"overallScore": 80}
+    assert cache.get(second) is None
+    assert len(cache) == 2
+
+
+def test_disabled_cache_stores_nothing():
+    cache = ResultCache(max_entries=0)
+    key = cache.key("essay", ("grammar",), "standard")
+    cache.put(key, {"overallScore": 80})
+    assert cache.get(key) is None
@@ -0,0 +1,125 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the consistent hash ring behind affinity routing."""
+
+from collections import Counter
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from essay_analyzer.routing import HashRing  # noqa: E402
+
+REPLICAS = [f"http://replica-{n}:8000" for n in range(4)]
+KEYS = [f"essay-{n}" for n in range(5000)]
+
+
+def owners(ring):
+    return {key: ring.lookup(key) for key in KEYS}
+
+
+def test_adding_a_replica_only_moves_keys_to_it():
+    ring = HashRing(REPLICAS)
+    before = owners(ring)
+    ring.add("http://replica-new:8000")
+    after = owners(ring)
+    moved = [key for key in KEYS if before[key] != after[key]]
+    assert all(after[key] == "http://replica-new:8000" for key in moved)
+    # About a fifth of the keys, not a reshuffle
+    assert 0.1 < len(moved) / len(KEYS) < 0.3
+
+
+def test_removing_a_replica_only_moves_its_keys():
+    ring = HashRing(REPLICAS)
+    before = owners(ring)
+    ring.remove(REPLICAS[1])
+    after = owners(ring)
+    for key in KEYS:
+        if before[key] != REPLICAS[1]:
+            assert after[key] == before[key]
+        else:
+            assert after[key] != REPLICAS[1]
+            # The key falls to the next replica in its preference order
+            assert after[key] == HashRing(REPLICAS).preference(key)[1]
+
+
+def test_add_then_remove_restores_every_owner():
+    ring = HashRing(REPLICAS)
+    before = owners(ring)
+    ring.add("http://replica-new:8000")
+    ring.add(REPLICAS[0])  # Already present: no-op
+    ring.remove("http://replica-new:8000")
+    assert owners(ring) == before
+    assert ring.nodes == REPLICAS
+
+
+def test_load_is_roughly_even_and_independent_of_insertion_order():
+    ring = HashRing(REPLICAS)
+    load = Counter(owners(ring).values())
+    assert max(load.values()) / min(load.values()) < 1.5
+    assert owners(HashRing(reversed(REPLICAS))) == owners(ring)
+
+
+def test_preference_lists_every_replica_once_owner_first():
+    ring = HashRing(REPLICAS)
+    for key in KEYS[:50]:
+        preference = ring.preference(key)
+        assert preference[0] == ring.lookup(key)
+        assert sorted(preference) == sorted(REPLICAS)
+    assert HashRing().lookup("essay") is None
+    assert HashRing().preference("essay") == []
+
+
+@pytest.fixture
+def router_app():
+    for module in ("dotenv", "fastapi", "orjson"):
+        pytest.importorskip(module)
+    import adk_router
+    return adk_router
+
+
+def make_request(client=None, headers=()):
+    from starlette.requests import Request
+
+    return Request({
+        "type": "http",
+        "method": "POST",
+        "path": "/analyze/upload",
+        "query_string": b"",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers],
+        "client": client,
+    })
+
+
+def test_anonymous_requests_hash_on_their_client(router_app):
+    keys = {router_app.client_key(make_request((f"10.0.0.{n}", 5000))) for n in range(20)}
+    assert len(keys) == 20
+    assert router_app.client_key(make_request(("10.0.0.1", 1))) == router_app.client_key(
+        make_request(("10.0.0.1", 2))
+    )
+    ring = HashRing(REPLICAS)
+    assert len({ring.lookup(key) for key in keys}) > 1
+
+
+def test_request_id_without_client_address(router_app):
+    request = make_request(headers=[("X-Request-ID", "abc")])
+    assert router_app.client_key(request) == "request:abc"
+    assert router_app.client_key(make_request()) != router_app.client_key(make_request())
+
+
+def test_json_without_user_uses_anonymous_key(router_app, monkeypatch):
+    monkeypatch.setattr(router_app, "ROUTER_KEY", "user")
+    assert router_app.routing_key(b'{"text": "An essay."}', None, anonymous="client:10.0.0.1") == "client:10.0.0.1"
+    assert router_app.routing_key(b'{"user_id": "ann"}', None, anonymous="client:10.0.0.1") == "ann"
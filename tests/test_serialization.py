@@ -0,0 +1,121 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for response serialization and content negotiation."""
+
+import gzip
+import json
+
+import pytest
+
+pytest.importorskip("pydantic")
+
+import numpy as np  # noqa: E402
+from pydantic import BaseModel  # noqa: E402
+
+from essay_analyzer import serialization  # noqa: E402
+from essay_analyzer.serialization import (  # noqa: E402
+    BROTLI,
+    GZIP,
+    JSON,
+    MSGPACK,
+    EncodingSettings,
+    encode_body,
+    negotiate_encoding,
+    negotiate_media_type,
+)
+
+
+class Analysis(BaseModel):
+    grammarRating: int
+    overallScore: float
+
+
+PAYLOAD = {"analysis": Analysis(grammarRating=4, overallScore=80.0), "scores": np.array([1, 2]), "mean": np.float64(1.5)}
+PLAIN = {"analysis": {"grammarRating": 4, "overallScore": 80.0}, "scores": [1, 2], "mean": 1.5}
+
+
+def test_json_handles_models_and_numpy():
+    body = encode_body(PAYLOAD, settings=EncodingSettings(min_size=0))
+    assert body.media_type == JSON and body.content_encoding is None
+    assert json.loads(body.body) == PLAIN
+    assert body.headers == {"Vary": "Accept, Accept-Encoding"}
+
+
+def test_json_nan_becomes_null():
+    assert json.loads(serialization.dumps_json({"score": float("nan")})) == {"score": None}
+
+
+@pytest.mark.parametrize("accept, expected", [
+    ("application/msgpack", MSGPACK),
+    ("application/x-msgpack, application/json;q=0.5", MSGPACK),
+    ("application/json, application/msgpack;q=0.5", JSON),
+    ("*/*", JSON),
+    (None, JSON),
+])
+def test_msgpack_only_when_preferred(accept, expected):
+    pytest.importorskip("msgpack")
+    assert negotiate_media_type(accept) == expected
+
+
+def test_msgpack_round_trip():
+    msgpack = pytest.importorskip("msgpack")
+    body = encode_body(PAYLOAD, accept="application/msgpack", settings=EncodingSettings(min_size=0))
+    assert body.media_type == MSGPACK
+    assert msgpack.unpackb(body.body) == PLAIN
+
+
+def test_json_without_msgpack(monkeypatch):
+    monkeypatch.setattr(serialization, "msgpack", None)
+    body = encode_body(PAYLOAD, accept="application/msgpack")
+    assert body.media_type == JSON
+    assert json.loads(body.body) == PLAIN
+    with pytest.raises(RuntimeError, match="msgpack"):
+        serialization.dumps_msgpack(PLAIN)
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    ("gzip, br", BROTLI),
+    ("gzip;q=1.0, br;q=0.5", GZIP),
+    ("br;q=0", None),
+    ("*", BROTLI),
+    ("identity", None),
+    (None, None),
+])
+def test_encoding_negotiation(accept_encoding, expected):
+    pytest.importorskip("brotli")
+    assert negotiate_encoding(accept_encoding) == expected
+
+
+def test_brotli_round_trip():
+    brotli = pytest.importorskip("brotli")
+    body = encode_body(PLAIN, accept_encoding="br", settings=EncodingSettings(min_size=1))
+    assert body.content_encoding == BROTLI
+    assert body.headers["Content-Encoding"] == BROTLI
+    assert json.loads(brotli.decompress(body.body)) == PLAIN
+
+
+def test_gzip_without_brotli(monkeypatch):
+    monkeypatch.setattr(serialization, "brotli", None)
+    assert negotiate_encoding("br") is None
+    body = encode_body(PLAIN, accept_encoding="br, gzip", settings=EncodingSettings(min_size=1))
+    assert body.content_encoding == GZIP
+    assert json.loads(gzip.decompress(body.body)) == PLAIN
+
+
+def test_small_bodies_are_not_compressed():
+    body = encode_body(PLAIN, accept_encoding="gzip", settings=EncodingSettings(min_size=10_000))
+    assert body.content_encoding is None
+    disabled = encode_body(PLAIN, accept_encoding="gzip", settings=EncodingSettings(min_size=0))
+    assert disabled.content_encoding is None
@@ -0,0 +1,145 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for span nesting and OTLP/JSON export."""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from essay_analyzer import callbacks, tracing
+
+
+@pytest.fixture
+def tracer(tmp_path, monkeypatch):
+    # The hooks stay registered but do nothing once the tracer is gone
+    monkeypatch.setattr(tracing, "_tracer", None)
+    return tracing.configure(str(tmp_path / "traces.jsonl"))
+
+
+def exported(tracer):
+    with open(tracer.export_path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def by_name(spans):
+    return {span.name: span for span in spans}
+
+
+def test_nested_spans_link_parent_and_child(tracer):
+    with tracing.span("request") as root:
+        with tracing.span("runner.run") as runner:
+            with tracing.span("rate_limit.wait"):
+                pass
+        with tracing.span("cache.store"):
+            pass
+    spans = by_name(tracer.collected)
+    assert root.parent_span_id is None
+    assert spans["runner.run"].parent_span_id == root.span_id
+    assert spans["rate_limit.wait"].parent_span_id == runner.span_id
+    assert spans["cache.store"].parent_span_id == root.span_id
+    assert {span.trace_id for span in spans.values()} == {root.trace_id}
+    assert tracing.current_span() is None
+
+
+def test_sibling_tasks_do_not_nest_under_each_other(tracer):
+    async def child(name):
+        with tracing.span(name):
+            await asyncio.sleep(0.01)
+
+    async def scenario():
+        with tracing.span("request") as root:
+            await asyncio.gather(child("grammar"), child("content"))
+        return root
+
+    root = asyncio.run(scenario())
+    spans = by_name(tracer.collected)
+    assert spans["grammar"].parent_span_id == root.span_id
+    assert spans["content"].parent_span_id == root.span_id
+
+
+def test_model_call_hooks_open_child_spans(tracer):
+    context = SimpleNamespace(agent_name="grammar_analyzer", invocation_id="inv-1")
+    request = SimpleNamespace(model="gemini-2.5-flash", contents=[1, 2])
+    usage = SimpleNamespace(prompt_token_count=120, candidates_token_count=30, thoughts_token_count=None)
+
+    async def scenario():
+        with tracing.span("request") as root:
+            await callbacks.before_agent(context)
+            await callbacks.before_model(context, request)
+            await callbacks.after_model(context, SimpleNamespace(partial=False, usage_metadata=usage, error_code=None))
+            await callbacks.after_agent(context)
+        return root
+
+    root = asyncio.run(scenario())
+    spans = by_name(tracer.collected)
+    agent = spans["agent grammar_analyzer"]
+    model = spans["model_call grammar_analyzer"]
+    assert agent.parent_span_id == root.span_id
+    assert model.parent_span_id == agent.span_id
+    assert model.attributes["llm.usage.output_tokens"] == 30
+    assert "llm.usage.thoughts_tokens" not in model.attributes
+
+
+def test_export_is_one_otlp_request_per_trace(tracer):
+    with tracing.span("request", **{"http.route": "/analyze", "cached": False}):
+        with tracing.span("runner.run", attempts=2, ratio=0.5):
+            tracing.add_event("adk.event", author="coordinator")
+    with pytest.raises(ValueError):
+        with tracing.span("request"):
+            raise ValueError("bad essay")
+
+    first, second = exported(tracer)
+    resource_spans = first["resourceSpans"][0]
+    assert resource_spans["resource"]["attributes"] == [
+        {"key": "service.name", "value": {"stringValue": tracing.SERVICE_NAME}}
+    ]
+    scope_spans = resource_spans["scopeSpans"][0]
+    assert scope_spans["scope"] == {"name": tracing.SCOPE_NAME}
+    spans = {span["name"]: span for span in scope_spans["spans"]}
+    root, child = spans["request"], spans["runner.run"]
+    assert "parentSpanId" not in root
+    assert child["parentSpanId"] == root["spanId"]
+    assert child["traceId"] == root["traceId"]
+    assert len(root["traceId"]) == 32 and len(root["spanId"]) == 16
+    assert int(root["endTimeUnixNano"]) >= int(root["startTimeUnixNano"])
+    assert root["attributes"] == [
+        {"key": "http.route", "value": {"stringValue": "/analyze"}},
+        {"key": "cached", "value": {"boolValue": False}},
+    ]
+    assert child["attributes"] == [
+        {"key": "attempts", "value": {"intValue": "2"}},
+        {"key": "ratio", "value": {"doubleValue": 0.5}},
+    ]
+    assert child["events"][0]["name"] == "adk.event"
+    assert root["status"] == {"code": tracing.STATUS_OK}
+
+    failed = second["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+    assert failed["status"] == {"code": tracing.STATUS_ERROR, "message": "ValueError: bad essay"}
+
+
+def test_open_spans_are_closed_as_errors_with_their_trace(tracer):
+    with tracing.span("request") as root:
+        orphan = tracer.start_span("model_call", parent=root)
+    assert orphan.end_ns == root.end_ns
+    assert orphan.status == tracing.STATUS_ERROR
+
+
+def test_disabled_tracing_records_nothing(monkeypatch):
+    monkeypatch.setattr(tracing, "_tracer", None)
+    with tracing.span("request") as active:
+        tracing.set_attribute("ignored", 1)
+    assert active is None
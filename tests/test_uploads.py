@@ -0,0 +1,170 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for streaming upload normalization and the multipart parser."""
+
+import asyncio
+import codecs
+import time
+
+import pytest
+
+from essay_analyzer.uploads import (
+    MultipartReader,
+    TextNormalizer,
+    UnsupportedUpload,
+    UploadTooLarge,
+    read_upload,
+)
+
+RAW = (
+    "﻿  Title of\tthe  essay\r\n\r\n\r\n\r\n"
+    "First  paragraph,​with a  sentence.\rSecond line third line.\n"
+    " \n \t\n"
+    "Last paragraph\x00 ends here.   \n\n"
+)
+EXPECTED = (
+    "Title of the essay\n\n"
+    "First paragraph,with a sentence.\nSecond line\nthird line.\n\n"
+    "Last paragraph ends here."
+)
+CHUNK_SIZES = (1, 2, 3, 5, 7, 64, 10_000)
+
+
+def chunks(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def normalize(data, size, encoding="utf-8", max_words=0):
+    normalizer = TextNormalizer(encoding, max_words)
+    for chunk in chunks(data, size):
+        normalizer.feed(chunk)
+    return normalizer.finish(), normalizer.words
+
+
+async def stream(data, size):
+    for chunk in chunks(data, size):
+        yield chunk
+
+
+def upload(data, content_type, size=64, max_bytes=0, max_words=0):
+    return asyncio.run(read_upload(stream(data, size), content_type, max_bytes, max_words))
+
+
+@pytest.mark.parametrize("size", CHUNK_SIZES)
+def test_normalization_does_not_depend_on_chunking(size):
+    text, words = normalize(RAW.encode("utf-8"), size)
+    assert text == EXPECTED
+    assert words == len(EXPECTED.split())
+
+
+@pytest.mark.parametrize("size", CHUNK_SIZES)
+def test_byte_order_mark_overrides_the_charset(size):
+    data = codecs.BOM_UTF16_LE + "Café au  lait\n\n\n\nfin".encode("utf-16-le")
+    assert normalize(data, size, encoding="latin-1") == ("Café au lait\n\nfin", 4)
+
+
+def test_long_whitespace_runs_are_collapsed_while_streaming():
+    text, words = normalize(b"one" + b" " * 20_000 + b"\n" * 5 + b"\t" * 20_000 + b"two", 1024)
+    assert (text, words) == ("one\n\ntwo", 2)
+
+
+@pytest.mark.parametrize("size", (1000, 64 * 1024))
+def test_overlong_words_are_split_and_joined_again(size):
+    word = "a" * 20_000
+    text, words = normalize(f"one {word}\t\n{word} two".encode(), size)
+    assert (text, words) == (f"one {word}\n{word} two", 4)
+
+
+def test_input_without_whitespace_is_read_in_linear_time():
+    data = b"a" * (8 << 20)
+    started = time.perf_counter()
+    text, words = normalize(data, 64 * 1024)
+    # Rescanning the whole carried word on every chunk took over a minute here
+    assert time.perf_counter() - started < 5
+    assert (len(text), words) == (len(data), 1)
+
+
+def test_short_and_empty_uploads():
+    assert normalize(b"", 1) == ("", 0)
+    assert normalize(b"  \n\n ", 1) == ("", 0)
+    assert normalize(b"hi", 1) == ("hi", 1)
+
+
+def test_word_limit_is_enforced_while_streaming():
+    normalizer = TextNormalizer(max_words=3)
+    normalizer.feed(b"one two three ")
+    with pytest.raises(UploadTooLarge) as raised:
+        normalizer.feed(b"four five ")
+    assert raised.value.limit == "words"
+
+
+def test_unknown_charset():
+    with pytest.raises(UnsupportedUpload):
+        normalize(b"text", 64, encoding="no-such-charset")
+
+
+def multipart(*parts, boundary="XyZ"):
+    body = b"preamble\r\n"
+    for headers, content in parts:
+        body += b"--" + boundary.encode() + b"\r\n" + headers.encode() + b"\r\n\r\n" + content + b"\r\n"
+    return body + b"--" + boundary.encode() + b"--\r\nepilogue"
+
+
+ESSAY_PARTS = (
+    ('Content-Disposition: form-data; name="cohort"', b"grade-9"),
+    (
+        'Content-Disposition: form-data; name="upload"; filename="essay.txt"\r\n'
+        "Content-Type: text/plain; charset=latin-1",
+        "Café essay\r\n\r\nSee --XyZ mid-line, not a boundary.".encode("latin-1"),
+    ),
+    ('Content-Disposition: form-data; name="text"', b"ignored second essay"),
+)
+
+
+@pytest.mark.parametrize("size", CHUNK_SIZES)
+def test_multipart_picks_the_essay_part(size):
+    result = upload(multipart(*ESSAY_PARTS), "multipart/form-data; boundary=XyZ", size)
+    assert result.text == "Café essay\n\nSee --XyZ mid-line, not a boundary."
+    assert result.filename == "essay.txt"
+    assert result.words == 8
+    assert result.bytes_read == len(multipart(*ESSAY_PARTS))
+
+
+def test_multipart_reader_stops_at_the_closing_delimiter():
+    reader = MultipartReader("XyZ")
+    out = reader.feed(multipart(('Content-Disposition: form-data; name="essay"', b"body")))
+    assert out == [b"body"] and reader.done and reader.found
+
+
+def test_multipart_without_essay_or_boundary():
+    with pytest.raises(ValueError, match="no file"):
+        upload(multipart(ESSAY_PARTS[0]), "multipart/form-data; boundary=XyZ")
+    with pytest.raises(ValueError, match="boundary"):
+        upload(b"", "multipart/form-data")
+
+
+def test_oversized_part_headers_are_rejected():
+    reader = MultipartReader("XyZ")
+    with pytest.raises(ValueError, match="headers too large"):
+        reader.feed(b"--XyZ\r\nX-Padding: " + b"a" * 20_000)
+
+
+def test_byte_limit_and_content_type():
+    with pytest.raises(UploadTooLarge) as raised:
+        upload(b"word " * 100, "text/plain", size=64, max_bytes=100)
+    assert raised.value.limit == "bytes"
+    with pytest.raises(UnsupportedUpload):
+        upload(b"{}", "application/json")
+    assert upload(b"plain  text", "application/octet-stream").text == "plain text"
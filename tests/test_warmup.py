@@ -0,0 +1,70 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for startup warm-up and the readiness it gates."""
+
+import asyncio
+
+from essay_analyzer.warmup import PENDING, READY, WarmUp
+
+
+def test_steps_run_in_order_before_ready():
+    ran = []
+
+    async def connections():
+        await asyncio.sleep(0)
+        ran.append("connections")
+
+    warmup = WarmUp()
+    warmup.add("agents", lambda: ran.append("agents"))
+    warmup.add("connections", connections)
+    assert warmup.status == PENDING and not warmup.ready
+    asyncio.run(warmup.run(5))
+    assert ran == ["agents", "connections"]
+    assert warmup.ready
+    assert set(warmup.snapshot()["steps"]) == {"agents", "connections"}
+
+
+def test_failed_step_is_reported_and_skipped():
+    ran = []
+
+    def broken():
+        raise ConnectionError("backend unreachable")
+
+    warmup = WarmUp()
+    warmup.add("connections", broken)
+    warmup.add("grammar_rules", lambda: ran.append("grammar_rules"))
+    asyncio.run(warmup.run(5))
+    snapshot = warmup.snapshot()
+    assert snapshot["status"] == READY
+    assert snapshot["errors"] == {"connections": "backend unreachable"}
+    assert "connections" in snapshot["steps"]
+    assert ran == ["grammar_rules"]
+
+
+def test_timeout_is_reported_and_serves_anyway():
+    warmup = WarmUp()
+    warmup.add("synthetic_analysis", lambda: asyncio.sleep(10))
+    asyncio.run(warmup.run(0.05))
+    snapshot = warmup.snapshot()
+    assert snapshot["timed_out"]
+    assert snapshot["status"] == READY
+    assert "synthetic_analysis" not in snapshot["steps"]
+
+
+def test_skip_marks_ready_without_steps():
+    warmup = WarmUp()
+    warmup.skip()
+    assert warmup.ready
+    assert warmup.snapshot()["steps"] == {}